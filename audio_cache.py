@@ -0,0 +1,276 @@
+"""
+Local content-addressed cache of dataset WAVs.
+Files are prefetched in the background as soon as the listing sees them, so
+by scoring time the audio is already on local disk. Blobs are stored under
+the SHA-256 of their bytes (identical uploads share one file), read through
+memory maps, and evicted least-recently-used once the cache outgrows its
+size budget. The path -> blob map is saved next to the blobs, so a restart
+keeps serving them without downloading anything again. Blobs a caller has pinned (see pin()) are never evicted until
+released, so a path handed to a reader stays valid for as long as it reads.
+"""
+import hashlib
+import json
+import mmap
+import os
+import shutil
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import Future, ThreadPoolExecutor
+from typing import BinaryIO, Callable, Dict, Iterable, Optional
+
+
+class AudioCache:
+    """
+    Dataset path -> local file, with background prefetch.
+
+    `fetch(path, out)` writes the file's bytes to the binary file object
+    `out`; it runs on the cache's own thread pool, at most `max_concurrency`
+    at a time, and each path is fetched at most once at a time.
+    """
+
+    def __init__(self, directory: str, fetch: Callable[[str, BinaryIO], None],
+                 max_bytes: int = 512 * 1024 * 1024, max_concurrency: int = 4):
+        """
+        Args:
+            directory (str): Where blobs live; created if missing
+            fetch (callable): Downloads one dataset path into a file object
+            max_bytes (int): Total blob size above which LRU blobs are removed
+            max_concurrency (int): Parallel downloads
+        """
+        self.directory = directory
+        self.max_bytes = max_bytes
+        self._fetch = fetch
+        self._pool = ThreadPoolExecutor(max_workers=max_concurrency, thread_name_prefix="audio-cache")
+        self._lock = threading.Lock()
+        self._paths: Dict[str, str] = {}  # dataset path -> digest
+        self._blobs: "OrderedDict[str, int]" = OrderedDict()  # digest -> size, LRU order
+        self._bytes = 0
+        self._inflight: Dict[str, Future] = {}
+        self._pins: Dict[str, int] = {}  # digest -> readers holding it
+        self.hits = 0
+        self.misses = 0
+        self.prefetched = 0
+        os.makedirs(directory, exist_ok=True)
+        self._load_index()
+
+    def _blob(self, digest: str) -> str:
+        return os.path.join(self.directory, f"{digest}.wav")
+
+    @property
+    def _index_path(self) -> str:
+        return os.path.join(self.directory, "paths.json")
+
+    def _load_index(self) -> None:
+        # Blobs and the path -> digest map survive restarts
+        found = []
+        for name in os.listdir(self.directory):
+            if name.endswith(".wav"):
+                st = os.stat(os.path.join(self.directory, name))
+                found.append((st.st_mtime, name[:-4], st.st_size))
+            elif name.endswith(".part") and os.stat(os.path.join(self.directory, name)).st_mtime < time.time() - 3600:
+                os.remove(os.path.join(self.directory, name))  # left behind by a crash
+        for _, digest, size in sorted(found):
+            self._blobs[digest] = size
+            self._bytes += size
+        try:
+            with open(self._index_path) as f:
+                saved = json.load(f)
+        except (FileNotFoundError, ValueError):
+            saved = {}  # first start, or a crash mid-write: paths are fetched again
+        self._paths = {p: d for p, d in saved.items() if d in self._blobs}
+
+    def _save_index(self) -> None:
+        # Called with the lock held, after the map changed
+        tmp = f"{self._index_path}.{os.getpid()}.tmp"
+        with open(tmp, "w") as f:
+            json.dump(self._paths, f)
+        os.replace(tmp, self._index_path)
+
+    def __contains__(self, path: str) -> bool:
+        with self._lock:
+            digest = self._paths.get(path)
+            return digest is not None and digest in self._blobs
+
+    def digest(self, path: str) -> Optional[str]:
+        """SHA-256 of a cached dataset file's bytes, or None if it is not cached."""
+        with self._lock:
+            digest = self._paths.get(path)
+            return digest if digest in self._blobs else None
+
+    def prefetch(self, paths: Iterable[str]) -> int:
+        """
+        Start background downloads for paths not cached or in flight.
+        Cheap and thread-safe, so it can run inside listing callbacks.
+
+        Returns:
+            int: How many downloads were started
+        """
+        started = 0
+        for path in paths:
+            if self._start(path, prefetch=True) is not None:
+                started += 1
+        return started
+
+    def _start(self, path: str, prefetch: bool = False) -> Optional[Future]:
+        with self._lock:
+            digest = self._paths.get(path)
+            if (digest is not None and digest in self._blobs) or path in self._inflight:
+                return None
+            fut = self._pool.submit(self._download, path)
+            self._inflight[path] = fut
+            if prefetch:
+                self.prefetched += 1
+        return fut
+
+    def _download(self, path: str) -> str:
+        tmp = os.path.join(self.directory, f"{os.getpid()}-{threading.get_ident()}.part")
+        try:
+            h = hashlib.sha256()
+            with open(tmp, "wb") as raw:
+                out = _HashingWriter(raw, h)
+                self._fetch(path, out)
+            return self._commit(path, tmp, h.hexdigest())
+        finally:
+            with self._lock:
+                self._inflight.pop(path, None)
+            if os.path.exists(tmp):
+                os.remove(tmp)
+
+    def _commit(self, path: str, tmp: str, digest: str) -> str:
+        # Move a finished file in the cache directory into place as `path`'s blob
+        size = os.path.getsize(tmp)
+        with self._lock:
+            if digest in self._blobs:
+                os.remove(tmp)  # same bytes under another path
+            else:
+                os.replace(tmp, self._blob(digest))
+                self._blobs[digest] = size
+                self._bytes += size
+            self._blobs.move_to_end(digest)
+            self._paths[path] = digest
+            self._evict(keep=digest)
+            self._save_index()
+        return self._blob(digest)
+
+    def put(self, path: str, local: str) -> str:
+        """
+        Adopt a local file as the content of a dataset path, e.g. a recording
+        this server has just published. The file is moved into the cache, so
+        later reads and prefetches of `path` never download it. Only use it
+        with the exact bytes stored under `path`.
+
+        Returns:
+            str: The blob it became
+        """
+        h = hashlib.sha256()
+        with open(local, "rb") as f:
+            for block in iter(lambda: f.read(1 << 20), b""):
+                h.update(block)
+        tmp = os.path.join(self.directory, f"{os.getpid()}-{threading.get_ident()}.part")
+        try:
+            shutil.move(local, tmp)  # may cross filesystems, so not under the lock
+            return self._commit(path, tmp, h.hexdigest())
+        finally:
+            if os.path.exists(tmp):
+                os.remove(tmp)
+
+    def fetch(self, path: str) -> Future:
+        """
+        Future of the local file for a dataset path: already done if it was
+        prefetched, else the download in flight (joined or started now).
+        Async callers can await it with asyncio.wrap_future instead of
+        blocking a thread on it.
+        """
+        with self._lock:
+            digest = self._paths.get(path)
+            if digest is not None and digest in self._blobs:
+                self._blobs.move_to_end(digest)
+                self.hits += 1
+                done: Future = Future()
+                done.set_result(self._blob(digest))
+                return done
+            self.misses += 1
+            fut = self._inflight.get(path)
+        if fut is None:
+            fut = self._start(path) or self._inflight.get(path)
+            if fut is None:  # finished between the two lookups
+                return self.fetch(path)
+        return fut
+
+    def get(self, path: str, timeout: Optional[float] = None) -> str:
+        """
+        Local file for a dataset path. Returns at once if it was prefetched,
+        joins the download if it is in flight, else downloads it now.
+        The file may be evicted later; readers that hold on to it use pin().
+        """
+        return self.fetch(path).result(timeout)
+
+    def pin(self, path: str) -> Optional[str]:
+        """
+        Local file for a cached dataset path, kept on disk until release();
+        None if the path is not cached (fetch it first).
+        """
+        with self._lock:
+            digest = self._paths.get(path)
+            if digest is None or digest not in self._blobs:
+                return None
+            self._blobs.move_to_end(digest)
+            self._pins[digest] = self._pins.get(digest, 0) + 1
+            return self._blob(digest)
+
+    def release(self, local: str) -> None:
+        """Drop one pin taken by pin() on this local file."""
+        digest = os.path.basename(local)[:-4]
+        with self._lock:
+            n = self._pins.pop(digest, 0) - 1
+            if n > 0:
+                self._pins[digest] = n
+
+    def open(self, path: str, timeout: Optional[float] = None) -> mmap.mmap:
+        """Read-only memory map of a dataset file's bytes."""
+        with open(self.get(path, timeout), "rb") as f:
+            return mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+
+    def _evict(self, keep: str) -> None:
+        # Unlinking a blob that a reader has mapped is safe: the mapping keeps it
+        # alive. Pinned blobs are skipped, so the cache can stay over budget
+        # while they are being read.
+        for digest, size in list(self._blobs.items()):
+            if self._bytes <= self.max_bytes:
+                break
+            if digest == keep or digest in self._pins:
+                continue
+            del self._blobs[digest]
+            self._bytes -= size
+            self._paths = {p: d for p, d in self._paths.items() if d != digest}
+            try:
+                os.remove(self._blob(digest))
+            except FileNotFoundError:
+                pass
+
+    def stats(self) -> Dict[str, float]:
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_ratio": self.hits / lookups if lookups else 0.0,
+                "prefetched": self.prefetched,
+                "in_flight": len(self._inflight),
+                "pinned": len(self._pins),
+                "blobs": len(self._blobs),
+                "bytes": self._bytes,
+            }
+
+
+class _HashingWriter:
+    """File wrapper that hashes everything written through it."""
+
+    def __init__(self, raw: BinaryIO, h):
+        self._raw = raw
+        self._h = h
+
+    def write(self, data) -> int:
+        self._h.update(data)
+        return self._raw.write(data)
@@ -0,0 +1,175 @@
+"""
+WAV helpers shared by the transcription and analysis code:
+decode/encode PCM WAV and find silences to split long recordings on.
+"""
+import io
+import wave
+from typing import List, Tuple
+
+import numpy as np
+
+FRAME_S = 0.02  # analysis frame for silence detection (20 ms)
+
+
+def decode_wav(data: bytes) -> Tuple[np.ndarray, int]:
+    """
+    Decode a PCM WAV file.
+
+    Returns:
+        (samples, sample_rate): float32 array of shape (n, channels) in [-1, 1]
+    """
+    with wave.open(io.BytesIO(data), "rb") as w:
+        channels, width, rate = w.getnchannels(), w.getsampwidth(), w.getframerate()
+        raw = w.readframes(w.getnframes())
+
+    if width == 1:
+        samples = (np.frombuffer(raw, dtype=np.uint8).astype(np.float32) - 128.0) / 128.0
+    elif width == 2:
+        samples = np.frombuffer(raw, dtype="<i2").astype(np.float32) / 32768.0
+    elif width == 3:
+        b = np.frombuffer(raw, dtype=np.uint8).reshape(-1, 3).astype(np.int32)
+        ints = b[:, 0] | (b[:, 1] << 8) | (b[:, 2] << 16)
+        ints = np.where(ints & 0x800000, ints - 0x1000000, ints)
+        samples = ints.astype(np.float32) / 8388608.0
+    elif width == 4:
+        samples = np.frombuffer(raw, dtype="<i4").astype(np.float32) / 2147483648.0
+    else:
+        raise ValueError(f"Unsupported WAV sample width: {width} bytes")
+    return samples.reshape(-1, channels), rate
+
+
+def to_mono(samples: np.ndarray) -> np.ndarray:
+    """Average channels: (n, channels) -> (n,)."""
+    return samples if samples.ndim == 1 else samples.mean(axis=1, dtype=np.float32)
+
+
+def encode_wav(samples: np.ndarray, sample_rate: int) -> bytes:
+    """Encode mono float samples in [-1, 1] as 16-bit PCM WAV."""
+    pcm = (np.clip(samples, -1.0, 1.0) * 32767.0).astype("<i2")
+    buf = io.BytesIO()
+    with wave.open(buf, "wb") as w:
+        w.setnchannels(1)
+        w.setsampwidth(2)
+        w.setframerate(sample_rate)
+        w.writeframes(pcm.tobytes())
+    return buf.getvalue()
+
+
+def frame_energy_db(samples: np.ndarray, sample_rate: int, frame_s: float = FRAME_S) -> np.ndarray:
+    """RMS energy in dBFS of consecutive non-overlapping frames (trailing partial frame dropped)."""
+    hop = max(1, int(sample_rate * frame_s))
+    n = len(samples) // hop
+    if n == 0:
+        return np.zeros(0, dtype=np.float32)
+    frames = samples[: n * hop].reshape(n, hop)
+    rms = np.sqrt(np.mean(frames * frames, axis=1) + 1e-12)
+    return 20.0 * np.log10(rms)
+
+
+def silent_frames(energy_db: np.ndarray, margin_db: float = 12.0, floor_db: float = -60.0) -> np.ndarray:
+    """
+    Boolean mask of silent frames. The threshold adapts to the recording: a
+    frame is silent if it is within `margin_db` of the noise floor (10th
+    percentile energy), or below `floor_db` outright.
+    """
+    if len(energy_db) == 0:
+        return np.zeros(0, dtype=bool)
+    noise = np.percentile(energy_db, 10)
+    return (energy_db < noise + margin_db) | (energy_db < floor_db)
+
+
+def split_on_silence(samples: np.ndarray, sample_rate: int, max_segment_s: float = 15.0,
+                     min_silence_s: float = 0.3) -> List[Tuple[int, int]]:
+    """
+    Split a mono recording into speech segments of at most `max_segment_s`.
+
+    Leading and trailing silence is dropped. Segments are cut in the middle
+    of the latest pause of at least `min_silence_s` that keeps them under the
+    limit; a stretch with no usable pause is hard-cut at the limit.
+
+    Returns:
+        list[(start, end)]: Sample offsets, in order
+    """
+    hop = max(1, int(sample_rate * FRAME_S))
+    silent = silent_frames(frame_energy_db(samples, sample_rate))
+    voiced = np.flatnonzero(~silent)
+    if len(voiced) == 0:
+        return []
+    first, last = int(voiced[0]), int(voiced[-1]) + 1
+
+    # Midpoints of pauses long enough to cut on
+    min_run = max(1, int(round(min_silence_s / FRAME_S)))
+    padded = np.concatenate(([False], silent[first:last], [False])).astype(np.int8)
+    edges = np.diff(padded)
+    run_starts = np.flatnonzero(edges == 1) + first
+    run_ends = np.flatnonzero(edges == -1) + first
+    long_runs = (run_ends - run_starts) >= min_run
+    cuts = ((run_starts[long_runs] + run_ends[long_runs]) // 2).tolist()
+
+    max_frames = max(1, int(max_segment_s / FRAME_S))
+    segments = []
+    start = first
+    while last - start > max_frames:
+        limit = start + max_frames
+        usable = [c for c in cuts if start < c <= limit]
+        end = usable[-1] if usable else limit
+        segments.append((start, end))
+        start = end
+    segments.append((start, last))
+    return [(s * hop, min(e * hop, len(samples))) for s, e in segments]
+
+
+def resample(samples: np.ndarray, from_rate: int, to_rate: int, taps: int = 63) -> np.ndarray:
+    """
+    Resample a mono signal. When downsampling, a windowed-sinc low-pass at
+    the new Nyquist is applied first so speech doesn't alias.
+
+    Integer ratios (48 kHz -> 16 kHz) are decimated polyphase-style: the
+    filter is only evaluated at the kept samples, one vector op per tap.
+    Other ratios filter with np.convolve and read the new samples off by
+    linear interpolation (np.interp).
+    """
+    if from_rate == to_rate or len(samples) == 0:
+        return samples.astype(np.float32, copy=False)
+    n_out = int(round(len(samples) * to_rate / from_rate))
+    if to_rate < from_rate:
+        cutoff = 0.5 * to_rate / from_rate  # cycles per input sample
+        n = np.arange(taps) - (taps - 1) / 2
+        kernel = 2 * cutoff * np.sinc(2 * cutoff * n) * np.hamming(taps)
+        kernel = (kernel / kernel.sum()).astype(np.float32)
+        if from_rate % to_rate == 0:
+            step = from_rate // to_rate
+            padded = np.pad(samples.astype(np.float32, copy=False), (taps // 2, taps // 2 + step))
+            out = np.zeros(n_out, dtype=np.float32)
+            for j, h in enumerate(kernel):
+                out += h * padded[j : j + n_out * step : step]
+            return out
+        samples = np.convolve(samples, kernel, mode="same")
+    positions = np.arange(n_out) * (from_rate / to_rate)
+    return np.interp(positions, np.arange(len(samples)), samples).astype(np.float32)
+
+
+def is_compact_wav(data: bytes, target_rate: int) -> bool:
+    """True if `data` is already mono 16-bit PCM at `target_rate` (header check only)."""
+    try:
+        with wave.open(io.BytesIO(data), "rb") as w:
+            return w.getnchannels() == 1 and w.getsampwidth() == 2 and w.getframerate() == target_rate
+    except (wave.Error, EOFError):
+        return False
+
+
+def shrink_wav(data: bytes, target_rate: int = 16000) -> bytes:
+    """
+    Re-encode a WAV as mono 16-bit PCM at `target_rate`, which is all speech
+    recognition needs. Browser recordings at 44.1/48 kHz come out about 3x
+    smaller. Non-WAV input and already-compact WAVs are returned unchanged.
+    """
+    if is_compact_wav(data, target_rate):
+        return data
+    try:
+        samples, rate = decode_wav(data)
+    except (wave.Error, EOFError, ValueError):
+        return data
+    mono = resample(to_mono(samples), rate, target_rate)
+    out = encode_wav(mono, target_rate)
+    return out if len(out) < len(data) else data
@@ -0,0 +1,73 @@
+"""
+Per-player baseline voice profiles.
+The three baseline answers are reduced once to a fixed-size summary
+(mean and variance per acoustic feature), so scoring a round answer is a
+distance against that summary instead of a re-analysis of the baseline audio.
+"""
+from typing import Any, Dict, Optional, Sequence
+
+import numpy as np
+
+import voice_features
+
+# Variance floor per feature, as a fraction of the baseline mean (plus an
+# absolute minimum): three clips underestimate spread, and a near-zero
+# variance would turn tiny differences into huge z-scores.
+REL_SPREAD = 0.1
+MIN_STD = 1e-3
+
+Profile = Dict[str, Any]
+
+
+def build_profile(features: np.ndarray) -> Profile:
+    """
+    Summarize a (clips, features) matrix from voice_features into a profile.
+
+    Returns:
+        dict: {"features": names, "n": clips, "mean": [...], "var": [...]},
+              JSON-able so it can live in the session store
+    """
+    features = np.asarray(features, dtype=np.float64)
+    mean = features.mean(axis=0)
+    var = features.var(axis=0)
+    floor = (REL_SPREAD * np.abs(mean) + MIN_STD) ** 2
+    return {
+        "features": list(voice_features.FEATURE_NAMES),
+        "n": int(features.shape[0]),
+        "mean": mean.tolist(),
+        "var": np.maximum(var, floor).tolist(),
+    }
+
+
+def profile_from_paths(paths: Sequence[str], known: Optional[Sequence[Optional[Dict[str, float]]]] = None) -> Profile:
+    """
+    Extract features for the baseline WAVs and summarize them. `known` holds
+    features already computed per path (e.g. while the clip was streamed),
+    or None; only the WAVs without them are read.
+    """
+    known = list(known) if known is not None else [None] * len(paths)
+    todo = [i for i, f in enumerate(known) if f is None]
+    done = [i for i, f in enumerate(known) if f is not None]
+    features = np.zeros((len(paths), len(voice_features.FEATURE_NAMES)), dtype=np.float32)
+    if todo:
+        features[todo] = voice_features.extract_batch([paths[i] for i in todo])
+    if done:
+        features[done] = voice_features.from_dicts([known[i] for i in done])
+    return build_profile(features)
+
+
+def zscores(features: np.ndarray, profile: Profile) -> np.ndarray:
+    """Per-feature z-scores of one or more answers against a profile."""
+    mean = np.asarray(profile["mean"])
+    std = np.sqrt(np.asarray(profile["var"]))
+    return (np.atleast_2d(features) - mean) / std
+
+
+def distance(features: np.ndarray, profile: Profile) -> np.ndarray:
+    """
+    RMS z-score of each answer against the player's baseline; 0 means
+    "sounds exactly like their baseline". Cost is O(features) per answer,
+    whatever the number of baseline clips.
+    """
+    z = zscores(features, profile)
+    return np.sqrt(np.mean(z * z, axis=1))
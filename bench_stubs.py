@@ -0,0 +1,206 @@
+"""
+Local stand-ins for the Hugging Face dataset and the Mistral API, for the
+load test (load_test.py). Each runs a threaded HTTP server on 127.0.0.1 with
+a fixed per-request latency, and serves just the endpoints the server uses:
+
+- Hub: dataset info (head sha), paginated file tree, file download
+- Mistral: file upload, signed URL, transcription
+
+Uploads from simulated players go through `HubStub.add_file`, which moves
+the dataset head like a real commit.
+"""
+import hashlib
+import io
+import json
+import re
+import threading
+import time
+import uuid
+import wave
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Dict, List, Optional
+from urllib.parse import parse_qs, unquote, urlparse
+
+import numpy as np
+
+TREE_PAGE_SIZE = 1000  # the Hub pages tree listings, clients follow the Link header
+CLIP_RATE = 16000
+
+
+def synth_clip(name: str, seconds: float = 3.0) -> bytes:
+    """A voiced-sounding 16-bit mono WAV; pitch and pace vary with the name."""
+    seed = int(hashlib.sha256(name.encode()).hexdigest()[:8], 16)
+    rng = np.random.default_rng(seed)
+    t = np.arange(int(seconds * CLIP_RATE)) / CLIP_RATE
+    f0 = 110 + seed % 120
+    voice = sum(np.sin(2 * np.pi * f0 * k * t) / k for k in range(1, 6))
+    envelope = 0.5 * (1 - np.cos(2 * np.pi * (2.5 + seed % 3) * t))
+    x = 0.2 * voice * envelope + 0.003 * rng.standard_normal(len(t))
+    buf = io.BytesIO()
+    with wave.open(buf, "wb") as w:
+        w.setnchannels(1)
+        w.setsampwidth(2)
+        w.setframerate(CLIP_RATE)
+        w.writeframes((np.clip(x, -1, 1) * 32767).astype("<i2").tobytes())
+    return buf.getvalue()
+
+
+class _StubServer(ThreadingHTTPServer):
+    # Default backlog (5) makes a burst of concurrent connects wait on SYN retries
+    request_queue_size = 256
+    daemon_threads = True
+
+
+class _Handler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+    stub = None  # set per server class
+
+    def log_message(self, *args):
+        pass
+
+    def _send(self, status: int, body: bytes, content_type: str = "application/json", headers: Optional[Dict[str, str]] = None):
+        self.send_response(status)
+        self.send_header("Content-Type", content_type)
+        self.send_header("Content-Length", str(len(body)))
+        for k, v in (headers or {}).items():
+            self.send_header(k, v)
+        self.end_headers()
+        self.wfile.write(body)
+
+    def _json(self, status: int, obj, headers: Optional[Dict[str, str]] = None):
+        self._send(status, json.dumps(obj).encode(), headers=headers)
+
+    def _read_body(self) -> bytes:
+        return self.rfile.read(int(self.headers.get("Content-Length", 0)))
+
+
+class _Stub:
+    def __init__(self, latency_s: float):
+        self.latency_s = latency_s
+        self.requests = 0
+        self._lock = threading.Lock()
+        self._server: Optional[_StubServer] = None
+
+    def _handler(self):
+        raise NotImplementedError
+
+    def _hit(self) -> None:
+        with self._lock:
+            self.requests += 1
+        if self.latency_s:
+            time.sleep(self.latency_s)
+
+    @property
+    def url(self) -> str:
+        return f"http://127.0.0.1:{self._server.server_port}"
+
+    def start(self) -> "_Stub":
+        handler = type(f"{type(self).__name__}Handler", (self._handler(),), {"stub": self})
+        self._server = _StubServer(("127.0.0.1", 0), handler)
+        threading.Thread(target=self._server.serve_forever, daemon=True).start()
+        return self
+
+    def stop(self) -> None:
+        if self._server is not None:
+            self._server.shutdown()
+            self._server.server_close()
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc):
+        self.stop()
+
+
+class HubStub(_Stub):
+    """
+    One dataset repo. Seeded with `n_files` untagged WAVs timestamped in the
+    past, so they are listed on every refresh but never offered to players.
+    """
+
+    def __init__(self, repo_id: str, n_files: int = 0, latency_s: float = 0.0, clip_s: float = 3.0):
+        super().__init__(latency_s)
+        self.repo_id = repo_id
+        self.clip_s = clip_s
+        old = int(time.time()) - 30 * 86400
+        self._files: List[str] = [f"{old + i}_seed{i}.wav" for i in range(n_files)]
+        self._sha = uuid.uuid4().hex
+        self._clips: Dict[str, bytes] = {}
+
+    def add_file(self, path: str) -> None:
+        """Commit a new file: it shows up in the tree and the head moves."""
+        with self._lock:
+            self._files.append(path)
+            self._sha = uuid.uuid4().hex
+
+    def clip(self, path: str) -> bytes:
+        with self._lock:
+            data = self._clips.get(path)
+        if data is None:
+            data = synth_clip(path, self.clip_s)
+            with self._lock:
+                self._clips[path] = data
+        return data
+
+    def _handler(self):
+        info = re.compile(rf"^/api/datasets/{re.escape(self.repo_id)}(?:/revision/[^/?]+)?$")
+        tree = re.compile(rf"^/api/datasets/{re.escape(self.repo_id)}/tree/[^/?]+$")
+        resolve = re.compile(rf"^/datasets/{re.escape(self.repo_id)}/resolve/[^/]+/(.+)$")
+
+        class Handler(_Handler):
+            def do_GET(self):
+                stub: HubStub = self.stub
+                stub._hit()
+                url = urlparse(self.path)
+                if info.match(url.path):
+                    with stub._lock:
+                        sha = stub._sha
+                    return self._json(200, {"id": stub.repo_id, "sha": sha, "private": False})
+                if tree.match(url.path):
+                    cursor = int(parse_qs(url.query).get("cursor", ["0"])[0])
+                    with stub._lock:
+                        page = stub._files[cursor : cursor + TREE_PAGE_SIZE]
+                        more = cursor + TREE_PAGE_SIZE < len(stub._files)
+                    body = [{"type": "file", "path": p, "size": 0, "oid": "0" * 40} for p in page]
+                    headers = {}
+                    if more:
+                        headers["Link"] = f'<{stub.url}{url.path}?recursive=True&cursor={cursor + TREE_PAGE_SIZE}>; rel="next"'
+                    return self._json(200, body, headers)
+                m = resolve.match(url.path)
+                if m:
+                    return self._send(200, stub.clip(unquote(m.group(1))), "audio/wav")
+                self._json(404, {"error": "not found"})
+
+        return Handler
+
+
+class MistralStub(_Stub):
+    """Accepts any upload; every transcription returns the same short text."""
+
+    def __init__(self, latency_s: float = 0.0, text: str = "I think I went to the cinema, um, with a friend."):
+        super().__init__(latency_s)
+        self.text = text
+
+    def _handler(self):
+        class Handler(_Handler):
+            def do_POST(self):
+                stub: MistralStub = self.stub
+                body = self._read_body()
+                stub._hit()
+                if self.path == "/v1/files":
+                    return self._json(200, {
+                        "id": str(uuid.uuid4()), "object": "file", "size_bytes": len(body), "created_at": 0,
+                        "filename": "audio.wav", "purpose": "audio", "sample_type": "instruct", "source": "upload",
+                    })
+                if self.path == "/v1/audio/transcriptions":
+                    return self._json(200, {"model": "voxtral-mini-latest", "text": stub.text, "language": "en", "usage": {}})
+                self._json(404, {"message": "not found"})
+
+            def do_GET(self):
+                stub: MistralStub = self.stub
+                stub._hit()
+                # /v1/files/{id}/url?expiry=24
+                file_id = self.path.split("/")[3]
+                self._json(200, {"url": f"{stub.url}/signed/{file_id}"})
+
+        return Handler
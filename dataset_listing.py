@@ -0,0 +1,270 @@
+"""
+Dataset listing cache for the recordings dataset.
+Keeps a timestamp-sorted index of the '<epoch>_*.wav' files so that
+"files since start_ts" is a bisect instead of a full listing + sort.
+"""
+import asyncio
+import bisect
+import itertools
+import logging
+import re
+import threading
+from typing import Awaitable, Callable, Dict, List, Optional, Set, Tuple
+
+# Uploader filename: f"{int(time.time())}_{base}.wav"
+WAV_PATTERN = re.compile(r"^(\d+)_.*\.wav$", re.IGNORECASE)
+# Uploads tagged with a session's upload token:
+# f"{int(time.time())}_cm-{token}_{base}.wav", token = 8 hex chars
+TAGGED_WAV_PATTERN = re.compile(r"^\d+_cm-([0-9a-f]{8})_.*\.wav$", re.IGNORECASE)
+
+log = logging.getLogger(__name__)
+
+
+def upload_token(path: str) -> Optional[str]:
+    """The upload token a WAV is tagged with, or None for untagged uploads."""
+    m = TAGGED_WAV_PATTERN.match(path)
+    return m.group(1).lower() if m else None
+
+
+class DatasetListingCache:
+    """
+    Shared, incrementally refreshed index of the WAV files in a HF dataset.
+
+    The cache is keyed on the dataset's head commit SHA: `refresh()` asks the
+    Hub for the head (a tiny request) and only re-lists the repo when it moved.
+    Names already seen are skipped, so only the files added since the last
+    known commit are parsed and merged into the sorted index.
+    """
+
+    def __init__(self, repo_id: str, api_factory: Callable, repo_type: str = "dataset"):
+        """
+        Args:
+            repo_id (str): Dataset id, e.g. "alonam27/catchmeow-audio"
+            api_factory (callable): Returns the HfApi client to use
+            repo_type (str): Hub repo type
+        """
+        self.repo_id = repo_id
+        self.repo_type = repo_type
+        self._api_factory = api_factory
+        self._lock = threading.Lock()
+        self._head: Optional[str] = None
+        # Heads are fetched outside the lock, so they can come back out of
+        # order: each fetch is numbered, and one older than the last applied
+        # head is dropped instead of rolling the index back
+        self._fetches = itertools.count()
+        self._applied_fetch = -1
+        self._seen: Set[str] = set()
+        # (epoch, path) sorted ascending, oldest first
+        self._index: List[Tuple[int, str]] = []
+        # Same entries split per upload token (None = untagged uploads)
+        self._by_token: Dict[Optional[str], List[Tuple[int, str]]] = {}
+        # Called with the newly indexed (epoch, path) entries after a refresh
+        self._listeners: List[Callable[[List[Tuple[int, str]]], None]] = []
+
+    @property
+    def head(self) -> Optional[str]:
+        return self._head
+
+    def __len__(self) -> int:
+        return len(self._index)
+
+    def subscribe(self, listener: Callable[[List[Tuple[int, str]]], None]) -> None:
+        """
+        Register a callback for newly indexed files. It runs on whichever
+        thread did the refresh, so it must be cheap and thread-safe.
+        """
+        self._listeners.append(listener)
+
+    def refresh(self) -> str:
+        """
+        Bring the index up to date with the dataset's current head.
+
+        Returns:
+            str: The head commit SHA the index now reflects
+        """
+        api = self._api_factory()
+        fetch = next(self._fetches)
+        info = api.repo_info(repo_id=self.repo_id, repo_type=self.repo_type, expand=["sha"])
+        head = info.sha
+        # Holding the lock while listing means concurrent callers that saw
+        # the same new head wait for one listing instead of each doing one.
+        with self._lock:
+            if fetch < self._applied_fetch:
+                return self._head  # a newer head was applied while this one was in flight
+            self._applied_fetch = fetch
+            if head == self._head:
+                return head
+            files = api.list_repo_files(repo_id=self.repo_id, repo_type=self.repo_type, revision=head)
+            new_entries = self._apply(head, files)
+
+        if new_entries:
+            for listener in self._listeners:
+                listener(new_entries)
+        return head
+
+    def _apply(self, head: str, files: List[str]) -> List[Tuple[int, str]]:
+        current = set(files)
+        removed = self._seen - current
+        added = [f for f in files if f not in self._seen]
+
+        if removed:
+            self._index = [e for e in self._index if e[1] not in removed]
+            for token, entries in list(self._by_token.items()):
+                kept = [e for e in entries if e[1] not in removed]
+                if kept:
+                    self._by_token[token] = kept
+                else:
+                    del self._by_token[token]
+
+        new_entries = []
+        for f in added:
+            m = WAV_PATTERN.match(f)
+            if m:
+                new_entries.append((int(m.group(1)), f))
+
+        new_entries.sort()
+        if new_entries:
+            # Appending a small batch to an already-sorted list and re-sorting
+            # is a linear merge for timsort.
+            self._index.extend(new_entries)
+            self._index.sort()
+            for entry in new_entries:
+                # Arrivals are mostly in epoch order, so this is usually an append
+                bisect.insort(self._by_token.setdefault(upload_token(entry[1]), []), entry)
+
+        self._seen = current
+        self._head = head
+        return new_entries
+
+    def entries_since(self, start_ts: int) -> List[Tuple[int, str]]:
+        """(epoch, path) entries with epoch >= start_ts, oldest first."""
+        with self._lock:
+            i = bisect.bisect_left(self._index, start_ts, key=lambda e: e[0])
+            return self._index[i:]
+
+    def entries_for(self, token: Optional[str], start_ts: int) -> List[Tuple[int, str]]:
+        """
+        (epoch, path) entries tagged with `token` (None = untagged) with
+        epoch >= start_ts, oldest first. Only that token's uploads are touched.
+        """
+        with self._lock:
+            entries = self._by_token.get(token)
+            if not entries:
+                return []
+            i = bisect.bisect_left(entries, start_ts, key=lambda e: e[0])
+            return entries[i:]
+
+    def since(self, start_ts: int) -> List[str]:
+        """
+        Paths whose leading epoch is >= start_ts, oldest first.
+        Does not hit the network; call `refresh()` first for fresh data.
+        """
+        return [p for _, p in self.entries_since(start_ts)]
+
+
+class DatasetWatcher:
+    """
+    One background poller per dataset that fans new WAVs out to waiters.
+
+    Sessions call `wait_for(predicate, timeout)` instead of polling the Hub
+    themselves. While anyone is waiting, a single task refreshes the listing
+    every `interval_s`; every refresh (including ones triggered by other
+    tool calls) wakes the waiters whose predicate matches a new file.
+    """
+
+    def __init__(self, listing: DatasetListingCache, refresh: Callable[[], Awaitable], interval_s: float = 1.0):
+        """
+        Args:
+            listing (DatasetListingCache): The shared listing to watch
+            refresh (callable): Async callable that refreshes `listing`
+            interval_s (float): Poll period while there are waiters
+        """
+        self.listing = listing
+        self.interval_s = interval_s
+        self._refresh = refresh
+        self._ids = itertools.count()
+        self._waiters: Dict[int, Tuple[Callable[[int, str], bool], asyncio.Future]] = {}
+        self._watchers: Dict[int, Callable[[List[Tuple[int, str]]], None]] = {}
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._task: Optional[asyncio.Task] = None
+        listing.subscribe(self._on_new_files)
+
+    @property
+    def waiting(self) -> int:
+        return len(self._waiters)
+
+    async def wait_for(self, predicate: Callable[[int, str], bool], timeout: float, since_ts: int = 0) -> Optional[str]:
+        """
+        Wait until a listed file matches `predicate(epoch, path)`.
+
+        Args:
+            predicate (callable): Decides whether a file is the one we want
+            timeout (float): Seconds to wait before giving up
+            since_ts (int): Files already indexed with epoch >= since_ts are
+                checked once on entry, so nothing indexed just before we
+                registered is missed
+
+        Returns:
+            str | None: The matching path, or None on timeout
+        """
+        self._loop = asyncio.get_running_loop()
+        fut = self._loop.create_future()
+        key = next(self._ids)
+        self._waiters[key] = (predicate, fut)
+        self._dispatch(self.listing.entries_since(since_ts))
+        if self._task is None or self._task.done():
+            self._task = asyncio.create_task(self._poll())
+        try:
+            return await asyncio.wait_for(fut, timeout)
+        except asyncio.TimeoutError:
+            return None
+        finally:
+            self._waiters.pop(key, None)
+
+    def watch(self, on_entries: Callable[[List[Tuple[int, str]]], None]) -> Callable[[], None]:
+        """
+        Standing subscription: keep polling and call `on_entries(new entries)`
+        on the event loop after every refresh that found new files, until the
+        returned function is called.
+        """
+        self._loop = asyncio.get_running_loop()
+        key = next(self._ids)
+        self._watchers[key] = on_entries
+        if self._task is None or self._task.done():
+            self._task = asyncio.create_task(self._poll())
+        return lambda: self._watchers.pop(key, None)
+
+    async def _poll(self) -> None:
+        while self._waiters or self._watchers:
+            try:
+                await self._refresh()
+            except Exception:
+                # Transient Hub errors: keep waiting, the next tick retries
+                pass
+            await asyncio.sleep(self.interval_s)
+
+    def _on_new_files(self, entries: List[Tuple[int, str]]) -> None:
+        # Runs on the refreshing thread; hop back onto the loop to resolve futures
+        if self._loop is not None and (self._waiters or self._watchers):
+            self._loop.call_soon_threadsafe(self._fan_out, entries)
+
+    def _fan_out(self, entries: List[Tuple[int, str]]) -> None:
+        # One failing subscriber must not keep the others (or the waiters) from their files
+        for on_entries in list(self._watchers.values()):
+            try:
+                on_entries(entries)
+            except Exception:
+                log.exception("Dataset watcher callback failed")
+        self._dispatch(entries)
+
+    def _dispatch(self, entries: List[Tuple[int, str]]) -> None:
+        for predicate, fut in list(self._waiters.values()):
+            if fut.done():
+                continue
+            try:
+                match = next((p for ts, p in entries if predicate(ts, p)), None)
+            except Exception as e:
+                fut.set_exception(e)  # surfaces in that waiter's wait_for only
+                continue
+            if match is not None:
+                fut.set_result(match)
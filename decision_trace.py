@@ -0,0 +1,248 @@
+"""
+Decision trace for the bluff judge.
+Every judge decision (upload accepted for a prompt, baseline profile built,
+round answer scored) is recorded with its inputs, outcome, judge version and
+timings, so calls can be reviewed and replayed against a newer judge.
+
+Recording only appends to a bounded in-memory buffer; a background thread
+serializes records in batches and appends them to gzip-compressed JSONL
+segments, rotated by size. When the buffer is full new records are dropped
+and counted instead of blocking the caller.
+"""
+import atexit
+import glob
+import gzip
+import itertools
+import json
+import os
+import threading
+import time
+from collections import deque
+from datetime import datetime
+from typing import Any, Callable, Deque, Dict, Iterator, List, Optional
+
+MB = 1024 * 1024
+SEGMENT_GLOB = "trace-*.jsonl.gz"
+
+
+def _jsonable(value: Any) -> Any:
+    # NumPy scalars/arrays and sets show up in features and sessions
+    if hasattr(value, "tolist"):
+        return value.tolist()
+    if isinstance(value, (set, frozenset)):
+        return sorted(value)
+    return str(value)
+
+
+class DecisionTrace:
+    """
+    Bounded trace buffer with a batching gzip writer and a reader for review.
+
+    Records are plain dicts: {"ts", "seq", "pid", "kind", **fields}. Fields
+    are serialized later, on the writer thread, so callers must not mutate
+    what they pass in afterwards.
+    """
+
+    def __init__(self, directory: str, capacity: int = 10000, batch_size: int = 256,
+                 flush_interval_s: float = 2.0, segment_max_bytes: int = 4 * MB, max_segments: int = 64):
+        """
+        Args:
+            directory (str): Where segments are written; created if missing
+            capacity (int): Records buffered before new ones are dropped
+            batch_size (int): Buffered records that wake the writer early
+            flush_interval_s (float): Longest a record waits in the buffer
+            segment_max_bytes (int): Compressed size at which a new segment starts
+            max_segments (int): Oldest segments beyond this many are deleted
+        """
+        self.directory = directory
+        self.capacity = capacity
+        self.batch_size = batch_size
+        self.flush_interval_s = flush_interval_s
+        self.segment_max_bytes = segment_max_bytes
+        self.max_segments = max_segments
+        self.dropped = 0
+        self.written = 0
+        self._buf: Deque[Dict[str, Any]] = deque()
+        self._lock = threading.Lock()
+        self._write_lock = threading.Lock()
+        self._wake = threading.Event()
+        self._seq = itertools.count()
+        self._segment: Optional[str] = None
+        self._segment_no = itertools.count()
+        self._thread: Optional[threading.Thread] = None
+        self._closed = False
+        os.makedirs(directory, exist_ok=True)
+
+    def record(self, kind: str, **fields: Any) -> bool:
+        """
+        Queue one decision. Constant time, never blocks on I/O.
+
+        Returns:
+            bool: False if the buffer was full and the record was dropped
+        """
+        rec = {"ts": time.time(), "seq": next(self._seq), "pid": os.getpid(), "kind": kind, **fields}
+        with self._lock:
+            if len(self._buf) >= self.capacity:
+                self.dropped += 1
+                return False
+            self._buf.append(rec)
+            queued = len(self._buf)
+        if self._thread is None:
+            self._start()
+        if queued >= self.batch_size:
+            self._wake.set()
+        return True
+
+    def _start(self) -> None:
+        with self._lock:
+            if self._thread is not None or self._closed:
+                return
+            self._thread = threading.Thread(target=self._run, name="decision-trace", daemon=True)
+            self._thread.start()
+        atexit.register(self.close)
+
+    def _run(self) -> None:
+        while not self._closed:
+            self._wake.wait(self.flush_interval_s)
+            self._wake.clear()
+            try:
+                self.flush()
+            except OSError:
+                pass  # disk trouble; the next batch tries again
+
+    def flush(self) -> int:
+        """Write everything buffered now. Returns how many records were written."""
+        with self._write_lock:
+            with self._lock:
+                batch = list(self._buf)
+                self._buf.clear()
+            if not batch:
+                return 0
+            data = "".join(json.dumps(r, separators=(",", ":"), default=_jsonable) + "\n" for r in batch)
+            path = self._current_segment()
+            # Each batch is its own gzip member; readers see one continuous stream
+            with gzip.open(path, "ab", compresslevel=6) as f:
+                f.write(data.encode())
+            self.written += len(batch)
+            if os.path.getsize(path) >= self.segment_max_bytes:
+                self._segment = None
+                self._prune()
+            return len(batch)
+
+    def _current_segment(self) -> str:
+        if self._segment is None:
+            # Time first, so segments from several worker processes sort chronologically
+            stamp = datetime.now().strftime("%Y%m%d-%H%M%S")
+            name = f"trace-{stamp}-{os.getpid()}-{next(self._segment_no):04d}.jsonl.gz"
+            self._segment = os.path.join(self.directory, name)
+        return self._segment
+
+    def _prune(self) -> None:
+        for path in self.segments()[: -self.max_segments]:
+            try:
+                os.remove(path)
+            except FileNotFoundError:
+                pass
+
+    def close(self) -> None:
+        """Stop the writer and flush what is left."""
+        self._closed = True
+        self._wake.set()
+        if self._thread is not None and self._thread is not threading.current_thread():
+            self._thread.join(5)
+        self.flush()
+
+    def stats(self) -> Dict[str, int]:
+        with self._lock:
+            queued = len(self._buf)
+        return {
+            "queued": queued,
+            "written": self.written,
+            "dropped": self.dropped,
+            "capacity": self.capacity,
+            "segments": len(self.segments()),
+        }
+
+    # ---------- review ----------
+    def segments(self) -> List[str]:
+        return sorted(glob.glob(os.path.join(self.directory, SEGMENT_GLOB)))
+
+    def iter_records(self, since: Optional[float] = None, until: Optional[float] = None) -> Iterator[Dict[str, Any]]:
+        """All written records (buffered ones are flushed first), oldest segment first."""
+        self.flush()
+        for path in self.segments():
+            yield from self._read_segment(path, since, until)
+
+    @staticmethod
+    def _read_segment(path: str, since: Optional[float], until: Optional[float]) -> Iterator[Dict[str, Any]]:
+        try:
+            with gzip.open(path, "rt") as f:
+                for line in f:
+                    rec = json.loads(line)
+                    if (since is None or rec["ts"] >= since) and (until is None or rec["ts"] < until):
+                        yield rec
+        except (OSError, EOFError, ValueError):
+            return  # segment cut short by a crash: keep what was readable
+
+    def query(self, kind: Optional[str] = None, session: Optional[str] = None, since: Optional[float] = None,
+              until: Optional[float] = None, limit: Optional[int] = None, **match: Any) -> List[Dict[str, Any]]:
+        """
+        Records matching every given filter; with `limit`, the most recent ones.
+        A limited query reads segments newest first and stops as soon as no
+        older segment can hold a more recent match.
+
+        Args:
+            kind (str): Record kind, e.g. "round_score"
+            session (str): Client id the decision was about
+            since (float): Unix time, inclusive
+            until (float): Unix time, exclusive
+            limit (int): Keep only the last `limit` matches
+            **match: Other fields that must be equal, e.g. lobby_id="ab12cd34"
+        """
+        def wanted(rec: Dict[str, Any]) -> bool:
+            return ((kind is None or rec.get("kind") == kind)
+                    and (session is None or rec.get("session") == session)
+                    and all(rec.get(k) == v for k, v in match.items()))
+
+        if limit is None:
+            return [rec for rec in self.iter_records(since, until) if wanted(rec)]
+        if limit <= 0:
+            return []
+        self.flush()
+        # A segment's last write is no older than any record in it. Segments from
+        # several workers overlap in time, so order by that rather than by name
+        by_last_write = []
+        for path in self.segments():
+            try:
+                by_last_write.append((os.path.getmtime(path), path))
+            except FileNotFoundError:
+                continue  # pruned meanwhile
+        found: List[Dict[str, Any]] = []
+        for newest, path in sorted(by_last_write, reverse=True):
+            if (len(found) == limit and newest < found[0]["ts"]) or (since is not None and newest < since):
+                break
+            found.extend(rec for rec in self._read_segment(path, since, until) if wanted(rec))
+            found.sort(key=lambda r: (r["ts"], r["seq"]))
+            del found[:-limit]
+        return found
+
+    def replay(self, judge: Callable[[Dict[str, Any]], Dict[str, Any]], kind: Optional[str] = None,
+               **filters: Any) -> Dict[str, Any]:
+        """
+        Re-run `judge` on recorded decisions and report where it now disagrees.
+        `judge(record)` returns the fields it recomputes, e.g. {"bluff_score", "band"}.
+
+        Returns:
+            dict: {"replayed": int, "changed": [{"seq", "ts", "session", "fields": {name: {"recorded", "replayed"}}}]}
+        """
+        records = self.query(kind=kind, **filters)
+        changed = []
+        for rec in records:
+            fields = {
+                k: {"recorded": rec.get(k), "replayed": v}
+                for k, v in judge(rec).items()
+                if rec.get(k) != v
+            }
+            if fields:
+                changed.append({"seq": rec["seq"], "ts": rec["ts"], "session": rec.get("session"), "fields": fields})
+        return {"replayed": len(records), "changed": changed}
@@ -0,0 +1,160 @@
+"""
+Honesty Mode leaderboards, one per lobby.
+Each round adds 100 - bluff_score to every scored player. Standings are kept
+in a sorted index that is patched per player on update, so top-k and rank
+reads never re-sort.
+"""
+import bisect
+import json
+import os
+import threading
+from typing import Any, Dict, List, Mapping, Optional, Tuple
+
+
+def honesty_points(result: Mapping[str, Any]) -> Optional[int]:
+    """Honesty Mode points for one round result; None if it wasn't scored."""
+    score = result.get("bluff_score")
+    return None if score is None else 100 - int(score)
+
+
+class Leaderboard:
+    """Cumulative scores of one lobby with an ordered (-total, player) index."""
+
+    def __init__(self):
+        self.totals: Dict[str, int] = {}
+        self.names: Dict[str, str] = {}
+        self.rounds: List[int] = []
+        self._index: List[Tuple[int, str]] = []
+
+    def _set(self, player: str, total: int) -> None:
+        old = self.totals.get(player)
+        if old is not None:
+            del self._index[bisect.bisect_left(self._index, (-old, player))]
+        self.totals[player] = total
+        bisect.insort(self._index, (-total, player))
+
+    def apply_round(self, round_no: int, results: Mapping[str, Mapping[str, Any]],
+                    names: Optional[Mapping[str, str]] = None) -> bool:
+        """
+        Add one round's points. Idempotent per round number.
+
+        Returns:
+            bool: False if the round was already applied
+        """
+        if round_no in self.rounds:
+            return False
+        self.rounds.append(round_no)
+        for player, result in results.items():
+            if names and player in names:
+                self.names[player] = names[player]
+            points = honesty_points(result)
+            if points is not None:
+                self._set(player, self.totals.get(player, 0) + points)
+        return True
+
+    def rank(self, player: str) -> Optional[int]:
+        """1-based rank (ties share the best rank), or None for unknown players."""
+        total = self.totals.get(player)
+        if total is None:
+            return None
+        return bisect.bisect_left(self._index, (-total, "")) + 1
+
+    def top(self, k: int = 10) -> List[Dict[str, Any]]:
+        out = []
+        for neg_total, player in self._index[:k]:
+            out.append({
+                "rank": bisect.bisect_left(self._index, (neg_total, "")) + 1,
+                "player": self.names.get(player, player),
+                "score": -neg_total,
+            })
+        return out
+
+    def __len__(self) -> int:
+        return len(self._index)
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {"totals": dict(self.totals), "names": dict(self.names), "rounds": list(self.rounds)}
+
+    @classmethod
+    def from_dict(cls, data: Mapping[str, Any]) -> "Leaderboard":
+        board = cls()
+        board.names = dict(data.get("names", {}))
+        board.rounds = list(data.get("rounds", []))
+        for player, total in data.get("totals", {}).items():
+            board._set(player, int(total))
+        return board
+
+
+class LeaderboardService:
+    """
+    All lobbies' leaderboards, with JSON snapshots on disk.
+
+    Updates and reads are cheap in-memory operations under one lock; the
+    snapshot file is written from a copy, outside the lock, and replaced
+    atomically so a crash never leaves a half-written file.
+    """
+
+    def __init__(self, path: Optional[str] = None):
+        """
+        Args:
+            path (str): Snapshot file; loaded if present. None/"" = memory only
+        """
+        self.path = path or None
+        self._boards: Dict[str, Leaderboard] = {}
+        self._lock = threading.Lock()
+        self._write_lock = threading.Lock()
+        self._version = 0
+        self._saved_version = 0
+        if self.path and os.path.exists(self.path):
+            with open(self.path, encoding="utf-8") as f:
+                data = json.load(f)
+            self._boards = {lobby: Leaderboard.from_dict(b) for lobby, b in data.get("lobbies", {}).items()}
+
+    def apply_round(self, lobby_id: str, round_no: int, results: Mapping[str, Mapping[str, Any]],
+                    names: Optional[Mapping[str, str]] = None) -> bool:
+        with self._lock:
+            board = self._boards.setdefault(lobby_id, Leaderboard())
+            changed = board.apply_round(round_no, results, names)
+            if changed:
+                self._version += 1
+            return changed
+
+    def top(self, lobby_id: str, k: int = 10) -> List[Dict[str, Any]]:
+        with self._lock:
+            board = self._boards.get(lobby_id)
+            return board.top(k) if board else []
+
+    def standing(self, lobby_id: str, player: str) -> Optional[Dict[str, Any]]:
+        """Rank and score of one player, or None if they have no score yet."""
+        with self._lock:
+            board = self._boards.get(lobby_id)
+            if board is None or player not in board.totals:
+                return None
+            return {
+                "player": board.names.get(player, player),
+                "rank": board.rank(player),
+                "score": board.totals[player],
+                "of": len(board),
+                "rounds": len(board.rounds),
+            }
+
+    def snapshot(self) -> Dict[str, Any]:
+        with self._lock:
+            return {"lobbies": {lobby: b.to_dict() for lobby, b in self._boards.items()}}
+
+    def save(self) -> bool:
+        """Write the snapshot file if anything changed since the last save."""
+        if not self.path:
+            return False
+        with self._write_lock:
+            with self._lock:
+                version = self._version
+                if version == self._saved_version:
+                    return False
+            data = self.snapshot()
+            tmp = f"{self.path}.{os.getpid()}.tmp"
+            with open(tmp, "w", encoding="utf-8") as f:
+                json.dump(data, f)
+            os.replace(tmp, self.path)
+            self._saved_version = version
+            return True
@@ -0,0 +1,369 @@
+"""
+Load test and benchmark for the MCP server.
+
+Starts mainmcp1.py on a free port against local stand-ins for the HF dataset
+and Mistral (bench_stubs.py), then plays N concurrent lobbies of 3-8 players
+over streamable HTTP (/mcp). Every player runs the baseline flow
+(start_baseline_recording, then three uploads each followed by
+validate_next_upload); with --rounds, each lobby then plays rounds that end
+in scoring and transcription.
+
+Each (dataset size, lobby count) combination gets a fresh server. The report
+has throughput plus p50/p95/p99 per tool, as the players saw them, and the
+server's own metrics for its external calls. Results are saved as JSON under
+bench_results/ and compared with the last saved run of the same
+configuration, so regressions show up between runs.
+
+    python load_test.py --lobbies 1,4,8 --dataset-files 100,5000 --hf-latency-ms 40 --mistral-latency-ms 250
+"""
+import argparse
+import asyncio
+import glob
+import json
+import os
+import random
+import re
+import socket
+import subprocess
+import sys
+import tempfile
+import time
+import urllib.request
+from collections import defaultdict
+from contextlib import AsyncExitStack, contextmanager
+from datetime import datetime
+from typing import Any, Dict, List, Optional
+
+from bench_stubs import HubStub, MistralStub
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+REPO_ID = "bench/catchmeow-audio"
+RESULTS_DIR = os.path.join(HERE, "bench_results")
+STARTUP_TIMEOUT_S = 60
+
+
+class FlowError(Exception):
+    """A tool reply that doesn't move the player's flow forward."""
+
+
+def _free_port() -> int:
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+def _percentile(sorted_values: List[float], q: float) -> float:
+    # Nearest rank, so small samples report an observed value
+    return sorted_values[max(0, min(len(sorted_values) - 1, int(round(q * len(sorted_values) + 0.5)) - 1))]
+
+
+@contextmanager
+def serve(hub_url: str, mistral_url: str, workdir: str, watch_interval_s: float = 0.25):
+    """Run mainmcp1.py in a subprocess, wired to the stubs; yields its base URL."""
+    port = _free_port()
+    env = dict(
+        os.environ,
+        PORT=str(port),
+        HF_ENDPOINT=hub_url,
+        HF_DATASET=REPO_ID,
+        HF_HUB_DISABLE_TELEMETRY="1",
+        MISTRAL_SERVER_URL=mistral_url,
+        MISTRAL_API_KEY="stub",
+        SESSION_DB=os.path.join(workdir, "sessions.db"),
+        LEADERBOARD_PATH="",
+        AUDIO_CACHE_DIR=os.path.join(workdir, "audio_cache"),
+        TRANSCRIPT_CACHE_DIR=os.path.join(workdir, "transcript_cache"),
+        STREAM_DIR=os.path.join(workdir, "streams"),
+        WATCH_INTERVAL_S=str(watch_interval_s),
+        ROUND_GRACE_S="5",
+        TRUST_CLIENT_ID_HEADER="1",  # one X-Client-Id per simulated player
+    )
+    log_path = os.path.join(workdir, "server.log")
+    with open(log_path, "wb") as log:
+        proc = subprocess.Popen([sys.executable, os.path.join(HERE, "mainmcp1.py")], cwd=workdir, env=env,
+                                stdout=log, stderr=subprocess.STDOUT)
+    base = f"http://127.0.0.1:{port}"
+    try:
+        deadline = time.monotonic() + STARTUP_TIMEOUT_S
+        while True:
+            if proc.poll() is not None or time.monotonic() > deadline:
+                with open(log_path, errors="replace") as f:
+                    raise RuntimeError(f"Server did not start:\n{f.read()[-2000:]}")
+            try:
+                with urllib.request.urlopen(f"{base}/metrics", timeout=1):
+                    break
+            except OSError:
+                time.sleep(0.1)
+        yield base
+    finally:
+        proc.terminate()
+        try:
+            proc.wait(10)
+        except subprocess.TimeoutExpired:
+            proc.kill()
+
+
+class Recorder:
+    """Client-side latency samples and failures per tool."""
+
+    def __init__(self):
+        self.samples: Dict[str, List[float]] = defaultdict(list)
+        self.failures: Dict[str, int] = defaultdict(int)
+
+    async def call(self, client, tool: str, args: Optional[Dict[str, Any]] = None, expect: Optional[str] = None) -> str:
+        t0 = time.perf_counter()
+        try:
+            result = await client.call_tool(tool, args or {})
+            text = result.content[0].text if result.content else ""
+        except Exception:
+            self.failures[tool] += 1
+            raise
+        finally:
+            self.samples[tool].append(time.perf_counter() - t0)
+        if expect is not None and expect not in text:
+            self.failures[tool] += 1
+            raise FlowError(f"{tool}: {text[:200]}")
+        return text
+
+    def summary(self) -> Dict[str, Dict[str, float]]:
+        out = {}
+        for tool, values in sorted(self.samples.items()):
+            values = sorted(values)
+            out[tool] = {
+                "count": len(values),
+                "failures": self.failures.get(tool, 0),
+                "mean_ms": round(1000 * sum(values) / len(values), 2),
+                "p50_ms": round(1000 * _percentile(values, 0.50), 2),
+                "p95_ms": round(1000 * _percentile(values, 0.95), 2),
+                "p99_ms": round(1000 * _percentile(values, 0.99), 2),
+            }
+        return out
+
+
+async def _baseline(rec: Recorder, client, hub: HubStub, think_s: float) -> str:
+    text = await rec.call(client, "start_baseline_recording", expect="Baseline started")
+    token = re.search(r"token=([0-9a-f]{8})", text).group(1)
+    for n in (1, 2, 3):
+        await asyncio.sleep(think_s)
+        hub.add_file(f"{int(time.time())}_cm-{token}_prompt{n}.wav")
+        await rec.call(client, "validate_next_upload", {"wait_seconds": 20}, expect="Great")
+    return token
+
+
+async def _lobby(rec: Recorder, base: str, hub: HubStub, run_id: str, lobby_no: int, n_players: int,
+                 rounds: int, think_s: float) -> int:
+    from fastmcp import Client
+    from fastmcp.client.transports import StreamableHttpTransport
+
+    async with AsyncExitStack() as stack:
+        clients = []
+        for i in range(n_players):
+            # One identity per simulated player, see _client_id() in mainmcp1.py
+            transport = StreamableHttpTransport(f"{base}/mcp", headers={"X-Client-Id": f"{run_id}-{lobby_no}-{i}"})
+            clients.append(await stack.enter_async_context(Client(transport, timeout=90)))
+        tokens = await asyncio.gather(*(_baseline(rec, c, hub, think_s) for c in clients))
+        if not rounds:
+            return n_players
+
+        host = clients[0]
+        text = await rec.call(host, "create_lobby", {"name": "P0"}, expect="lobby_id")
+        lobby_id = re.search(r"'lobby_id': '([^']+)'", text).group(1)
+        await asyncio.gather(*(
+            rec.call(c, "join_lobby", {"lobby_id": lobby_id, "name": f"P{i}"}, expect="players")
+            for i, c in enumerate(clients[1:], start=1)
+        ))
+        for r in range(rounds):
+            await rec.call(host, "start_round", {"lobby_id": lobby_id}, expect="started")
+
+            async def answer(client, token: str, i: int) -> None:
+                await asyncio.sleep(think_s)
+                hub.add_file(f"{int(time.time())}_cm-{token}_round{r}_{i}.wav")
+                # Uploads are often picked up by the round scheduler first; any reply is fine here
+                await rec.call(client, "submit_round_answer", {"lobby_id": lobby_id, "wait_seconds": 20})
+
+            await asyncio.gather(*(answer(c, t, i) for i, (c, t) in enumerate(zip(clients, tokens))))
+            await asyncio.gather(*(
+                rec.call(c, "get_round_results", {"lobby_id": lobby_id, "wait_seconds": 55}, expect="'status': 'revealed'")
+                for c in clients
+            ))
+        return n_players
+
+
+async def _server_metrics(base: str) -> Dict[str, Any]:
+    from fastmcp import Client
+    from fastmcp.client.transports import StreamableHttpTransport
+
+    async with Client(StreamableHttpTransport(f"{base}/mcp")) as client:
+        return json.loads((await client.read_resource("metrics://server"))[0].text)
+
+
+async def run_scenario(base: str, hub: HubStub, lobbies: int, min_players: int = 3, max_players: int = 8,
+                       rounds: int = 0, think_s: float = 0.0, seed: int = 0) -> Dict[str, Any]:
+    """Play `lobbies` lobbies at once against a running server."""
+    rng = random.Random(seed)
+    sizes = [rng.randint(min_players, max_players) for _ in range(lobbies)]
+    run_id = f"bench{int(time.time())}"
+    rec = Recorder()
+    t0 = time.perf_counter()
+    outcomes = await asyncio.gather(
+        *(_lobby(rec, base, hub, run_id, n, size, rounds, think_s) for n, size in enumerate(sizes)),
+        return_exceptions=True,
+    )
+    wall = time.perf_counter() - t0
+    errors = [f"{type(e).__name__}: {e}" for e in outcomes if isinstance(e, BaseException)]
+    server = await _server_metrics(base)
+    tools = rec.summary()
+    calls = sum(t["count"] for t in tools.values())
+    return {
+        "lobbies": lobbies,
+        "players": sum(sizes),
+        "rounds": rounds,
+        "wall_s": round(wall, 3),
+        "lobbies_failed": len(errors),
+        "errors": errors[:5],
+        "throughput": {
+            "players_per_s": round(sum(s for s, o in zip(sizes, outcomes) if not isinstance(o, BaseException)) / wall, 3),
+            "tool_calls_per_s": round(calls / wall, 2),
+        },
+        "tools": tools,
+        "server": {"tool": server.get("tool", {}), "external": server.get("external", {}), "stats": server.get("stats", {})},
+        "hub_requests": hub.requests,
+    }
+
+
+def run_matrix(lobby_counts: List[int], dataset_sizes: List[int], hf_latency_ms: float = 0.0,
+               mistral_latency_ms: float = 0.0, **scenario) -> List[Dict[str, Any]]:
+    """One fresh server and stub set per (dataset size, lobby count)."""
+    runs = []
+    for n_files in dataset_sizes:
+        for lobbies in lobby_counts:
+            with tempfile.TemporaryDirectory(prefix="catchmeow-bench-") as workdir, \
+                    HubStub(REPO_ID, n_files=n_files, latency_s=hf_latency_ms / 1000) as hub, \
+                    MistralStub(latency_s=mistral_latency_ms / 1000) as mistral, \
+                    serve(hub.url, mistral.url, workdir) as base:
+                run = asyncio.run(run_scenario(base, hub, lobbies, **scenario))
+            run["config"] = {
+                "dataset_files": n_files,
+                "lobbies": lobbies,
+                "hf_latency_ms": hf_latency_ms,
+                "mistral_latency_ms": mistral_latency_ms,
+                **scenario,
+            }
+            runs.append(run)
+    return runs
+
+
+def _config_key(config: Dict[str, Any]) -> str:
+    return json.dumps(config, sort_keys=True)
+
+
+def previous_runs(results_dir: str) -> Dict[str, Dict[str, Any]]:
+    """Most recent saved run per configuration."""
+    latest: Dict[str, Dict[str, Any]] = {}
+    for path in sorted(glob.glob(os.path.join(results_dir, "*.json"))):
+        try:
+            with open(path) as f:
+                saved = json.load(f)
+        except (OSError, ValueError):
+            continue
+        for run in saved.get("runs", []):
+            latest[_config_key(run["config"])] = run
+    return latest
+
+
+def compare(runs: List[Dict[str, Any]], previous: Dict[str, Dict[str, Any]], threshold_pct: float) -> List[str]:
+    """
+    Annotate each run with the p95 change per tool vs. the previous run of the
+    same configuration.
+
+    Returns:
+        list: Tools whose p95 grew by more than threshold_pct, as messages
+    """
+    regressions = []
+    for run in runs:
+        prev = previous.get(_config_key(run["config"]))
+        if prev is None:
+            continue
+        for tool, stats in run["tools"].items():
+            before = prev["tools"].get(tool, {}).get("p95_ms")
+            if not before:
+                continue
+            change = 100.0 * (stats["p95_ms"] - before) / before
+            stats["p95_change_pct"] = round(change, 1)
+            if change > threshold_pct:
+                regressions.append(
+                    f"{tool} p95 {before:.0f} -> {stats['p95_ms']:.0f} ms (+{change:.0f}%) at "
+                    f"{run['config']['dataset_files']} files, {run['config']['lobbies']} lobbies"
+                )
+    return regressions
+
+
+def save(runs: List[Dict[str, Any]], results_dir: str, argv: List[str]) -> str:
+    os.makedirs(results_dir, exist_ok=True)
+    try:
+        rev = subprocess.run(["git", "rev-parse", "--short", "HEAD"], cwd=HERE, capture_output=True, text=True).stdout.strip()
+    except OSError:
+        rev = ""
+    stamp = datetime.now().strftime("%Y%m%d-%H%M%S")
+    path = os.path.join(results_dir, f"{stamp}.json")
+    with open(path, "w") as f:
+        json.dump({"created": stamp, "git": rev, "argv": argv, "runs": runs}, f, indent=2)
+    return path
+
+
+def report(runs: List[Dict[str, Any]]) -> str:
+    lines = []
+    for run in runs:
+        c = run["config"]
+        lines.append(
+            f"\n{c['dataset_files']} files, {c['lobbies']} lobbies ({run['players']} players): "
+            f"{run['wall_s']:.1f}s, {run['throughput']['players_per_s']:.2f} players/s, "
+            f"{run['throughput']['tool_calls_per_s']:.1f} calls/s, {run['lobbies_failed']} lobbies failed"
+        )
+        lines.append(f"  {'tool':<26}{'calls':>6}{'fail':>6}{'p50 ms':>10}{'p95 ms':>10}{'p99 ms':>10}{'Δp95':>8}")
+        for tool, s in run["tools"].items():
+            change = f"{s['p95_change_pct']:+.0f}%" if "p95_change_pct" in s else ""
+            lines.append(f"  {tool:<26}{s['count']:>6}{s['failures']:>6}{s['p50_ms']:>10.1f}{s['p95_ms']:>10.1f}{s['p99_ms']:>10.1f}{change:>8}")
+        for name, s in run["server"]["external"].items():
+            lines.append(f"  server {name:<19}{s['count']:>6}{s['errors']:>6}  p95 <= {s['p95_s']}s")
+        for error in run["errors"]:
+            lines.append(f"  ! {error}")
+    return "\n".join(lines)
+
+
+def _ints(value: str) -> List[int]:
+    return [int(v) for v in value.split(",") if v]
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--lobbies", type=_ints, default=[1, 4], help="Concurrent lobby counts, e.g. 1,4,8")
+    parser.add_argument("--dataset-files", type=_ints, default=[100, 5000], help="Files already in the dataset, e.g. 100,5000")
+    parser.add_argument("--min-players", type=int, default=3)
+    parser.add_argument("--max-players", type=int, default=8)
+    parser.add_argument("--rounds", type=int, default=1, help="Rounds per lobby after the baseline (0 = baseline only)")
+    parser.add_argument("--think-s", type=float, default=0.0, help="Delay before each simulated upload")
+    parser.add_argument("--hf-latency-ms", type=float, default=40.0)
+    parser.add_argument("--mistral-latency-ms", type=float, default=250.0)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--out", default=RESULTS_DIR, help="Directory for result JSON files")
+    parser.add_argument("--fail-on-regression", type=float, default=None, metavar="PCT",
+                        help="Exit 1 if any tool's p95 grew by more than PCT%% vs. the last run")
+    args = parser.parse_args(argv)
+
+    runs = run_matrix(
+        args.lobbies, args.dataset_files, hf_latency_ms=args.hf_latency_ms, mistral_latency_ms=args.mistral_latency_ms,
+        min_players=args.min_players, max_players=args.max_players, rounds=args.rounds, think_s=args.think_s, seed=args.seed,
+    )
+    regressions = compare(runs, previous_runs(args.out), args.fail_on_regression if args.fail_on_regression is not None else 20.0)
+    path = save(runs, args.out, sys.argv[1:] if argv is None else argv)
+    print(report(runs))
+    print(f"\nSaved {path}")
+    for line in regressions:
+        print(f"REGRESSION {line}")
+    failed = any(run["lobbies_failed"] for run in runs)
+    return 1 if failed or (regressions and args.fail_on_regression is not None) else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
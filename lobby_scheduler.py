@@ -0,0 +1,149 @@
+"""
+Round clocks for every lobby on the server.
+All recording deadlines sit in one heap served by a single asyncio task, and
+uploads are routed to rounds from the shared dataset watcher by upload token,
+so hundreds of open rounds cost one timer task and one poller in total.
+"""
+import asyncio
+import heapq
+import itertools
+import logging
+import time
+from typing import Callable, Dict, Hashable, List, Optional, Tuple
+
+from dataset_listing import DatasetWatcher, upload_token
+from round_engine import Lobby, Round
+
+log = logging.getLogger(__name__)
+
+
+class DeadlineHeap:
+    """
+    Timers keyed by an id, fired by one task that sleeps until the earliest
+    deadline. Re-scheduling or cancelling a key leaves a stale heap entry
+    behind, which is skipped when it surfaces. A callback that raises is
+    logged; it never stops the task, so other timers still fire.
+    """
+
+    def __init__(self):
+        self._heap: List[Tuple[float, int, Hashable]] = []
+        self._live: Dict[Hashable, Tuple[int, Callable[[], None]]] = {}
+        self._seq = itertools.count()
+        self._wake: Optional[asyncio.Event] = None
+        self._task: Optional[asyncio.Task] = None
+
+    def __len__(self) -> int:
+        return len(self._live)
+
+    def call_at(self, key: Hashable, when: float, callback: Callable[[], None]) -> None:
+        """Run `callback()` at loop time `when`, replacing any timer for `key`."""
+        seq = next(self._seq)
+        self._live[key] = (seq, callback)
+        heapq.heappush(self._heap, (when, seq, key))
+        if self._task is None or self._task.done():
+            self._wake = asyncio.Event()
+            self._task = asyncio.create_task(self._run())
+        elif self._heap[0][1] == seq:
+            # New earliest deadline: cut the current sleep short
+            self._wake.set()
+
+    def cancel(self, key: Hashable) -> bool:
+        return self._live.pop(key, None) is not None
+
+    async def _run(self) -> None:
+        loop = asyncio.get_running_loop()
+        while self._live:
+            when, seq, key = self._heap[0]
+            live = self._live.get(key)
+            if live is None or live[0] != seq:
+                heapq.heappop(self._heap)
+                continue
+            delay = when - loop.time()
+            if delay > 0:
+                self._wake.clear()
+                try:
+                    await asyncio.wait_for(self._wake.wait(), delay)
+                except asyncio.TimeoutError:
+                    pass
+                continue
+            heapq.heappop(self._heap)
+            del self._live[key]
+            try:
+                live[1]()
+            except Exception:
+                log.exception("Deadline callback for %r failed", key)
+        self._heap.clear()
+
+
+class RoundScheduler:
+    """
+    Runs the recording phase of rounds: attributes tagged uploads to players
+    as they land and closes each round at its deadline (plus a grace period
+    for the upload itself) if not everyone made it.
+    """
+
+    def __init__(self, watcher: DatasetWatcher,
+                 on_upload: Callable[[Lobby, Round, str, str], None],
+                 on_deadline: Callable[[Lobby, Round], None],
+                 grace_s: float = 10.0):
+        """
+        Args:
+            watcher (DatasetWatcher): Shared dataset watcher to take uploads from
+            on_upload (callable): (lobby, round, player, path) for a new upload
+                from a player of an open round; a player in open rounds of
+                several lobbies gets one call per round
+            on_deadline (callable): (lobby, round) when a round's time is up
+            grace_s (float): Extra seconds after the recording deadline
+        """
+        self.watcher = watcher
+        self.grace_s = grace_s
+        self._on_upload = on_upload
+        self._on_deadline = on_deadline
+        self.timers = DeadlineHeap()
+        # A player may be in open rounds of several lobbies at once; each of
+        # those rounds gets offered the upload, and the claim decides which wins
+        self._by_token: Dict[str, Dict[Tuple[str, int], Tuple[Lobby, Round, str]]] = {}
+        self._tokens: Dict[Tuple[str, int], List[str]] = {}
+        self._unwatch: Optional[Callable[[], None]] = None
+
+    @property
+    def open_rounds(self) -> int:
+        return len(self._tokens)
+
+    def open(self, lobby: Lobby, rnd: Round, tokens: Dict[str, str]) -> None:
+        """Start the clock on a round; `tokens` maps player -> upload token."""
+        key = (lobby.lobby_id, rnd.number)
+        self._tokens[key] = list(tokens.values())
+        for player, token in tokens.items():
+            self._by_token.setdefault(token, {})[key] = (lobby, rnd, player)
+        loop = asyncio.get_running_loop()
+        when = loop.time() + max(0.0, rnd.record_deadline - time.time()) + self.grace_s
+        self.timers.call_at(key, when, lambda: self._expire(lobby, rnd))
+        if self._unwatch is None:
+            self._unwatch = self.watcher.watch(self._on_entries)
+
+    def finish(self, lobby: Lobby, rnd: Round) -> None:
+        """Stop tracking a round (closed early, or expired)."""
+        key = (lobby.lobby_id, rnd.number)
+        self.timers.cancel(key)
+        for token in self._tokens.pop(key, ()):
+            owners = self._by_token.get(token, {})
+            owners.pop(key, None)
+            if not owners:
+                self._by_token.pop(token, None)
+        if not self._tokens and self._unwatch is not None:
+            self._unwatch()
+            self._unwatch = None
+
+    def _expire(self, lobby: Lobby, rnd: Round) -> None:
+        self.finish(lobby, rnd)
+        self._on_deadline(lobby, rnd)
+
+    def _on_entries(self, entries: List[Tuple[int, str]]) -> None:
+        for ts, path in entries:
+            for lobby, rnd, player in list(self._by_token.get(upload_token(path), {}).values()):
+                if ts >= rnd.started_at and rnd.status == "recording" and player not in rnd.submissions:
+                    try:
+                        self._on_upload(lobby, rnd, player, path)
+                    except Exception:
+                        log.exception("Upload callback for %s in lobby %s failed", player, lobby.lobby_id)
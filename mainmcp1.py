@@ -1,31 +1,125 @@
 """
 Bluff Judge 
 Follows the "MCP Server Template" structure.
+
+Startup is kept short for scale-to-zero hosting: huggingface_hub, mistralai,
+boto3 and the NumPy analysis stack are imported when first needed (or by a
+background warm-up once the server is listening), and the static tool
+payloads below are built once at import.
 """
-import os, re, time 
-from typing import Dict, Any, List, Optional
+import os, secrets, tempfile, time 
+import asyncio
+import functools
+import json
+from concurrent.futures import ThreadPoolExecutor
+import threading
+from typing import TYPE_CHECKING, Dict, Any, List, Optional
 from fastmcp import FastMCP, Context
+from fastmcp.server.dependencies import get_http_headers
+from fastmcp.server.middleware import Middleware
 #from mcp.server.fastmcp import FastMCP, Context
 from pydantic import Field  
-from huggingface_hub import HfApi
 
-import mcp.types as types
+from audio_cache import AudioCache
+from decision_trace import DecisionTrace
+from dataset_listing import DatasetListingCache, DatasetWatcher, upload_token
+from session_store import SessionStore, open_session_store
+from round_engine import JUDGE_VERSION, Lobby, Round, RoundEngine
+from leaderboard import LeaderboardService
+from lobby_scheduler import RoundScheduler
+from metrics import METRICS
+from s3_store import MULTIPART_THRESHOLD, RecordingStore
+from starlette.requests import Request
+from starlette.responses import JSONResponse, PlainTextResponse
+from transcription import AudioTranscriber
+
+if TYPE_CHECKING:
+    from huggingface_hub import HfApi
+    from speaker_index import SpeakerIndex
+    from stream_ingest import StreamIngest
 # -------------------------------------------------
 # PUBLIC URL AND DATASET
 RECORDER_URL = "https://huggingface.co/spaces/alonam27/catchmeow-voice-recorder"
 HF_DATASET = os.environ.get("HF_DATASET", "alonam27/catchmeow-audio")
-mcp = FastMCP("Catch Meow Main Server", port=3000, stateless_http=True, debug=True)
+# Dataset files without an upload token ('<epoch>_<name>.wav') are offered to
+# sessions only with UNTAGGED_UPLOADS=1 (single-player setups whose uploader
+# can't tag names); otherwise a session only ever sees its own tagged uploads.
+UNTAGGED_UPLOADS = os.environ.get("UNTAGGED_UPLOADS", "0") == "1"
+PORT = int(os.environ.get("PORT", "3000"))
+# The X-Client-Id header is unauthenticated: anyone can send another player's
+# id. It names the session only with TRUST_CLIENT_ID_HEADER=1, which the load
+# test sets to keep its simulated players apart; never enable it in production.
+TRUST_CLIENT_ID_HEADER = os.environ.get("TRUST_CLIENT_ID_HEADER", "0") == "1"
+mcp = FastMCP("Catch Meow Main Server", port=PORT, stateless_http=True, debug=True)
+
+class _ToolMetrics(Middleware):
+    """Latency, in-flight count and errors of every tool call (see metrics.py)."""
+
+    async def on_call_tool(self, context, call_next):
+        with METRICS.track("tool", context.message.name):
+            return await call_next(context)
 
-# Simple in-memory store keyed by client_id for now there is only 8 people maximum 
-SESSIONS: Dict[str, Dict[str, Any]] = {}
+mcp.add_middleware(_ToolMetrics())
+# Recorder uploads (voice_recorder_s3.html); S3_ENDPOINT_URL points at a local S3 stand-in
+S3_BUCKET = os.environ.get("S3_BUCKET", "voice-recordings-catchmeow")
+S3_REGION = os.environ.get("S3_REGION", "eu-north-1")
+S3_ENDPOINT_URL = os.environ.get("S3_ENDPOINT_URL")
+RECORDINGS = RecordingStore(S3_BUCKET, region=S3_REGION, endpoint_url=S3_ENDPOINT_URL)
+# Live PCM streams from the recorder page, written to STREAM_DIR as they arrive
+STREAM_DIR = os.environ.get("STREAM_DIR", ".streams")
+
+# Hub calls are blocking; they run on a small dedicated pool so the event loop
+# stays free for other players, and the pool size bounds concurrent requests.
+HUB_MAX_CONCURRENCY = int(os.environ.get("HUB_MAX_CONCURRENCY", "4"))
+HUB_TIMEOUT_S = float(os.environ.get("HUB_TIMEOUT_S", "20"))
+# Long-poll mode of validate_next_upload: shared poll period and max wait
+WATCH_INTERVAL_S = float(os.environ.get("WATCH_INTERVAL_S", "1.0"))
+MAX_WAIT_S = 55
+_HUB_EXECUTOR = ThreadPoolExecutor(max_workers=HUB_MAX_CONCURRENCY, thread_name_prefix="hub")
+# Local audio cache: WAVs seen in the listing within the prefetch window are
+# downloaded in the background, so scoring reads them from disk
+AUDIO_CACHE_DIR = os.environ.get("AUDIO_CACHE_DIR", ".audio_cache")
+AUDIO_CACHE_MAX_MB = int(os.environ.get("AUDIO_CACHE_MAX_MB", "512"))
+AUDIO_PREFETCH_WINDOW_S = float(os.environ.get("AUDIO_PREFETCH_WINDOW_S", "3600"))
+# Rounds: recording window shown to players, scoring deadline, scoring processes
+ROUND_RECORD_S = 30
+ROUND_GRACE_S = float(os.environ.get("ROUND_GRACE_S", "10"))  # upload time allowed past the deadline
+ROUND_SCORE_TIMEOUT_S = float(os.environ.get("ROUND_SCORE_TIMEOUT_S", "30"))
+ROUND_WORKERS = int(os.environ.get("ROUND_WORKERS", "0")) or None
+ROUND_TRANSCRIPTS = os.environ.get("ROUND_TRANSCRIPTS", "1") == "1"
+# Speaker embeddings of baseline clips, to check round answers come from the
+# same voice. ":memory:" (the default) keeps them in this process only; a .npy
+# path keeps a memory-mapped file across restarts, but every process holds its
+# own copy and overwrites the others' on flush, so use it with a single worker
+# (several workers need a shared backend, see speaker_index.py).
+SPEAKER_INDEX = os.environ.get("SPEAKER_INDEX", ":memory:")
+# Judge decisions, batched to gzip JSONL segments in TRACE_DIR off the hot path ("" = off)
+TRACE_DIR = os.environ.get("TRACE_DIR", ".traces")
+TRACE = DecisionTrace(TRACE_DIR) if TRACE_DIR else None
+
+# Session store keyed by client_id. SQLite (WAL) by default so several worker
+# processes share state and it survives restarts; ":memory:" = this process only.
+# Its calls can wait on another worker's write lock: tools run them in a thread.
+SESSION_DB = os.environ.get("SESSION_DB", "sessions.db")
+SESSION_TTL_S = float(os.environ.get("SESSION_TTL_S", str(6 * 3600)))
+SESSIONS: SessionStore = open_session_store(SESSION_DB, ttl_s=SESSION_TTL_S)
 # Session shape we’ll maintain:
-# SESSIONS[client_id] = {
+# SESSIONS.get(client_id) == {
 #   "start_ts": int,            # when baseline started (unix seconds)
 #   "current_prompt": int,      # 1..3
 #   "answers": { "1": path, ... },
 #   "used_paths": set([...]),   # to avoid reusing files
-#   "recorder_url": str
+#   "upload_token": str,        # 8 hex chars, tags this client's uploads
+#   "recorder_url": str,        # recorder link carrying the upload token
+#   "profile_status": str,      # baseline profile: "pending" | "ready" | "failed: ..."
+#   "baseline_profile": dict,   # fixed-size mean/var summary, see baseline_profile.py
 # }
+# Lobbies live in this process: a round's submissions, scoring and reveal
+# all happen on the worker that hosts the lobby.
+LOBBIES: Dict[str, Lobby] = {}
+# Honesty Mode standings per lobby, snapshotted to LEADERBOARD_PATH ("" = memory only)
+LEADERBOARD_PATH = os.environ.get("LEADERBOARD_PATH", "leaderboard.json")
+LEADERBOARDS = LeaderboardService(LEADERBOARD_PATH)
 # The 5 recording prompts that will always be asked
 RECORDING_PROMPTS: Dict[str, str] = {
     "1": "Can you tell me your name and your favorite color, and count from 1 to 10.",
@@ -34,37 +128,408 @@ RECORDING_PROMPTS: Dict[str, str] = {
     "4": "This match runs on Alpic-hosted MCP servers; Mistral guides prompts; Qdrant stores vectors; Weave from Weights and Biases logs decisions. Our bluff judge is deterministic; features are weighted, scores are banded, and every call is traced and versioned for review.",
     "5": "What did you do last night? (Truth & Lie)"
 }
+# Static tool payloads, built once at import instead of on every call
+_START_GAME_TEXT = str({
+    "greeting": "Welcome to Catch Meow! First, a quick profile to personalize scoring.",
+    "questions": [
+        "What's your name or nickname?",
+        "How old are you?",
+        "What's your favorite color?"
+    ],
+    "expect_tool": "save_profile"
+})
+_PROMPT_TEXTS: Dict[str, str] = {
+    pid: f"Prompt {pid} ({'QUESTION' if pid in ['1', '2', '5'] else 'READ ALOUD'}):\n\n{prompt}"
+    for pid, prompt in RECORDING_PROMPTS.items()
+}
+_ALL_PROMPTS_TEXT = str({
+    "prompts": RECORDING_PROMPTS,
+    "prompt_types": {
+        "1": "QUESTION - Name, color, count 1-10",
+        "2": "QUESTION - Free time activities", 
+        "3": "READ ALOUD - Saturday routine text",
+        "4": "READ ALOUD - Technical MCP text",
+        "5": "QUESTION - Last night (Truth & Lie)"
+    },
+    "usage": "Use 'get_recording_prompt' with prompt_id (1-5) to get a specific prompt"
+})
+_VOICE_INSTRUCTIONS: Dict[str, str] = {
+    "baseline": "You are conducting a baseline voice recording session. Ask the participant to speak naturally and clearly. Record their normal speech patterns, tone, and pace. Be encouraging and create a comfortable atmosphere.",
+    "truth": "You are conducting a truth recording session. Instruct the participant to answer all questions honestly and naturally. Emphasize that they should tell the truth and speak as they normally would.",
+    "lie": "You are conducting a lie recording session. Instruct the participant to answer questions with deliberate lies or false information. They should try to be convincing while lying. Remind them this is for training purposes."
+}
 # ---------- helpers ----------
 def _client_id() -> str:
     # TODO: wire to real user/session later
-    return "anonymous"
+    if not TRUST_CLIENT_ID_HEADER:
+        return "anonymous"
+    cid = get_http_headers().get("x-client-id", "").strip()
+    return cid[:64] if cid else "anonymous"
+
+@functools.lru_cache(maxsize=1)
+def _api() -> "HfApi":
+    # Works fine without token for public datasets.
+    # One shared client; huggingface_hub keeps an HTTP session per thread, and
+    # the hub pool threads are long-lived, so connections get reused.
+    from huggingface_hub import HfApi
+
+    return METRICS.instrument(HfApi(), "hf", ("repo_info", "list_repo_files", "upload_file"))
+
+def _trace(kind: str, **fields) -> None:
+    if TRACE is not None:
+        TRACE.record(kind, judge_version=JUDGE_VERSION, **fields)
 
-def _api() -> HfApi:
-    # Works fine without token for public datasets
-    return HfApi()
+async def _run_hub(fn, *args, **kwargs):
+    """Run a blocking Hub call on the hub pool, with a timeout."""
+    loop = asyncio.get_running_loop()
+    call = functools.partial(fn, *args, **kwargs)
+    # On timeout the worker thread finishes in the background; the caller
+    # just stops waiting for it.
+    return await asyncio.wait_for(loop.run_in_executor(_HUB_EXECUTOR, call), HUB_TIMEOUT_S)
 
-def _list_wav_paths_since(start_ts: int) -> List[str]:
+# One listing cache for the whole process, shared by every session
+_LISTING = DatasetListingCache(HF_DATASET, _api)
+
+def _list_wav_paths_since(start_ts: int, token: Optional[str] = None) -> List[str]:
     """
     List dataset files like '1699999999_*.wav' with leading epoch >= start_ts.
     Relies on your uploader's filename: f"{int(time.time())}_{base}.wav"
+    The dataset is only re-listed when its head commit changes.
+
+    With a token, only that client's tagged uploads
+    (f"{ts}_cm-{token}_{base}.wav") are returned, plus untagged ones if
+    UNTAGGED_UPLOADS is on. Other clients' tagged uploads are never offered.
     """
     if not HF_DATASET:
         raise RuntimeError("HF_DATASET is not set")
-    files = _api().list_repo_files(repo_id=HF_DATASET, repo_type="dataset")
-    pat = re.compile(r"^(\d+)_.*\.wav$", re.IGNORECASE)
-
-    out = []
-    for f in files:
-        m = pat.match(f)
-        if not m:
-            continue
-        ts = int(m.group(1))
-        if ts >= start_ts:
-            out.append(f)
-
+    _LISTING.refresh()
     # Oldest first so we consume in order
-    out.sort(key=lambda p: int(re.match(r"^(\d+)_", p).group(1)))
-    return out
+    if token is None:
+        return _LISTING.since(start_ts)
+    own = _LISTING.entries_for(token, start_ts)
+    untagged = _LISTING.entries_for(None, start_ts) if UNTAGGED_UPLOADS else []
+    return [p for _, p in own] + [p for _, p in untagged]
+
+def _owns_upload(token: Optional[str], path: str) -> bool:
+    """Whether a dataset file may be claimed by the session with this upload token."""
+    tag = upload_token(path)
+    return token is None or tag == token or (tag is None and UNTAGGED_UPLOADS)
+
+def _publish_recording(s3_key: str, token: str) -> Dict[str, Any]:
+    """
+    Copy a recorder upload from S3 into the HF dataset, where validation and
+    rounds look for answers. Only tagged recordings are accepted, so every
+    published file is attributed to exactly one session, and only by the
+    holder of that session's upload token.
+
+    Args:
+        s3_key (str): Key the recorder uploaded to
+        token (str): Upload token the recorder page was opened with
+
+    Raises:
+        ValueError: The key is not a tagged recording
+        PermissionError: The token is not the key's tag, or no live session holds it
+    """
+    name = os.path.basename(s3_key)
+    tag = upload_token(name)
+    if not s3_key.startswith(RECORDINGS.prefix) or tag is None:
+        raise ValueError(f"Not a tagged recording: '{s3_key}'")
+    if token != tag or SESSIONS.client_for_token(tag) is None:
+        raise PermissionError("Upload token does not match a live session")
+    fd, tmp = tempfile.mkstemp(suffix=".wav")
+    try:
+        with os.fdopen(fd, "w+b") as f:
+            RECORDINGS.download(s3_key, f)
+            f.seek(0)
+            _api().upload_file(path_or_fileobj=f, path_in_repo=name, repo_id=HF_DATASET, repo_type="dataset",
+                               commit_message=f"Add recording {name}")
+        # These are the published bytes: keep them, so scoring never downloads them back
+        _AUDIO.put(name, tmp)
+    finally:
+        if os.path.exists(tmp):
+            os.remove(tmp)
+    # Index it now: waiting sessions and open rounds pick it up without a poll
+    _LISTING.refresh()
+    return {"ok": True, "path": name}
+
+async def _claim_next(cid: str, candidates: List[str]) -> Optional[tuple]:
+    """
+    Atomically give the session its first unused candidate as the answer to
+    its current prompt. Returns (prompt_id, path, new current_prompt,
+    answers so far), or None if nothing could be claimed.
+    """
+    def claim(sess):
+        # The session may have been replaced (e.g. by save_profile) meanwhile
+        if not sess or sess.get("current_prompt", 4) > 3:
+            return None
+        path = next((p for p in candidates if p not in sess["used_paths"]), None)
+        if path is None:
+            return None
+        prompt_id = str(sess["current_prompt"])
+        sess["answers"][prompt_id] = path
+        sess["used_paths"].add(path)
+        sess["current_prompt"] += 1
+        if sess["current_prompt"] > 3:
+            sess["profile_status"] = "pending"
+        return prompt_id, path, sess["current_prompt"], dict(sess["answers"])
+
+    return await asyncio.to_thread(SESSIONS.update, cid, claim)
+
+async def _refresh_listing() -> None:
+    await _run_hub(_LISTING.refresh)
+
+# One poller for the dataset; sessions in wait mode subscribe to it
+_WATCHER = DatasetWatcher(_LISTING, _refresh_listing, interval_s=WATCH_INTERVAL_S)
+
+# Background jobs; keep references so running tasks aren't garbage-collected
+_BACKGROUND: set = set()
+
+def _spawn(coro) -> asyncio.Task:
+    task = asyncio.create_task(coro)
+    _BACKGROUND.add(task)
+    task.add_done_callback(_BACKGROUND.discard)
+    return task
+
+@METRICS.timed("external", "hf.download")
+def _fetch_wav(path: str, out) -> None:
+    """Stream one dataset file into `out` (used by the audio cache)."""
+    from huggingface_hub import hf_hub_url
+    from huggingface_hub.utils import build_hf_headers, get_session
+
+    url = hf_hub_url(HF_DATASET, path, repo_type="dataset")
+    with get_session().get(url, headers=build_hf_headers(), stream=True, timeout=HUB_TIMEOUT_S) as resp:
+        resp.raise_for_status()
+        for chunk in resp.iter_content(chunk_size=1024 * 1024):
+            out.write(chunk)
+
+_AUDIO = AudioCache(AUDIO_CACHE_DIR, _fetch_wav, max_bytes=AUDIO_CACHE_MAX_MB * 1024 * 1024,
+                    max_concurrency=HUB_MAX_CONCURRENCY)
+
+def _prefetch_new(entries) -> None:
+    # Listing callback (refresh thread): queue downloads of recent uploads only,
+    # not the dataset's whole history on the first listing
+    cutoff = time.time() - AUDIO_PREFETCH_WINDOW_S
+    _AUDIO.prefetch(p for ts, p in entries if ts >= cutoff)
+
+_LISTING.subscribe(_prefetch_new)
+METRICS.register_stats("audio_cache", _AUDIO.stats)
+
+async def _fetch_audio(path: str) -> str:
+    """
+    Local copy of a dataset file, pinned in the cache until _AUDIO.release().
+    Instant if it was prefetched; otherwise awaits the cache's own download
+    rather than parking a hub thread on it.
+    """
+    while True:
+        # shield: a timed-out caller must not cancel a download others may join
+        await asyncio.wait_for(asyncio.shield(asyncio.wrap_future(_AUDIO.fetch(path))), HUB_TIMEOUT_S)
+        local = _AUDIO.pin(path)
+        if local is not None:  # else evicted right after downloading; fetch again
+            return local
+
+async def _build_baseline_profile(cid: str, answers: Dict[str, str]) -> None:
+    """
+    Runs once per player, after prompt 3 is validated: fetch the three
+    baseline clips, reduce them to a profile and store it on the session.
+    """
+    from baseline_profile import profile_from_paths
+
+    t0 = time.perf_counter()
+    paths = [answers[k] for k in sorted(answers)]
+    enrol_error = None
+    # return_exceptions: every fetch settles, so each pin taken gets released
+    fetched = await asyncio.gather(*(_fetch_audio(p) for p in paths), return_exceptions=True)
+    local = [f for f in fetched if isinstance(f, str)]
+    try:
+        failed = next((f for f in fetched if isinstance(f, BaseException)), None)
+        if failed is not None:
+            raise failed
+        # Clips streamed to this server were already analysed when they closed
+        known = [_streamed_features(p) for p in paths]
+        profile, status = await asyncio.to_thread(profile_from_paths, local, known), "ready"
+        # The profile stands on its own; without a voice enrolment rounds just skip the voice check
+        try:
+            await asyncio.to_thread(_enrol_speaker, cid, local, paths)
+        except Exception as e:
+            enrol_error = str(e)
+    except Exception as e:
+        profile, status = None, f"failed: {e}"
+    finally:
+        for f in local:
+            _AUDIO.release(f)
+
+    def save(sess):
+        # Skip if the player restarted their baseline meanwhile
+        if sess and sess.get("answers") == answers:
+            sess["baseline_profile"] = profile
+            sess["profile_status"] = status
+
+    await asyncio.to_thread(SESSIONS.update, cid, save)
+    _trace("baseline_profile", session=cid, paths=paths, status=status, profile=profile,
+           enrol_error=enrol_error, elapsed_ms=round(1000 * (time.perf_counter() - t0), 1))
+
+def _ensure_upload_token_sync(cid: str) -> str:
+    def ensure(sess):
+        if sess is None:
+            return None
+        sess.setdefault("upload_token", secrets.token_hex(4))
+        sess.setdefault("used_paths", set())
+        return sess["upload_token"]
+
+    token = SESSIONS.update(cid, ensure)
+    if token is None:
+        token = secrets.token_hex(4)
+        SESSIONS.put(cid, {"upload_token": token, "used_paths": set()})
+    return token
+
+async def _ensure_upload_token(cid: str) -> str:
+    """The client's upload token, creating one (and a session) if needed."""
+    return await asyncio.to_thread(_ensure_upload_token_sync, cid)
+
+async def _claim_round_upload(cid: str, rnd: Round, candidates: List[str]) -> Optional[str]:
+    """Atomically mark the first unused candidate as this player's round answer."""
+    taken = set(rnd.submissions.values())
+
+    def claim(sess):
+        if not sess:
+            return None
+        used = sess.setdefault("used_paths", set())
+        path = next((p for p in candidates if p not in used and p not in taken), None)
+        if path is not None:
+            used.add(path)
+        return path
+
+    return await asyncio.to_thread(SESSIONS.update, cid, claim)
+
+@functools.lru_cache(maxsize=1)
+def _speaker_index() -> "SpeakerIndex":
+    from speaker_index import open_speaker_index
+
+    return open_speaker_index(SPEAKER_INDEX)
+
+def _enrol_speaker(cid: str, local: List[str], paths: List[str]) -> None:
+    """Store one voice embedding per baseline clip (replacing an earlier baseline)."""
+    from voice_features import embed_batch
+
+    index = _speaker_index()
+    index.replace(cid, embed_batch(local), clip_ids=paths)
+    index.flush()
+
+@functools.lru_cache(maxsize=1)
+def _engine() -> RoundEngine:
+    """
+    Round scoring: acoustic analysis in worker processes, transcripts over
+    the shared Mistral client, downloads through the audio cache.
+    """
+    from transcript_features import TranscriptScorer
+
+    transcriber = AudioTranscriber() if ROUND_TRANSCRIPTS else None
+    if transcriber is not None:
+        METRICS.register_stats("transcript_cache", transcriber.cache_stats)
+    return RoundEngine(
+        fetch=_fetch_audio,
+        release=_AUDIO.release,
+        features=_streamed_features,
+        transcriber=transcriber,
+        max_workers=ROUND_WORKERS,
+        score_timeout_s=ROUND_SCORE_TIMEOUT_S,
+        # Read-aloud prompts are checked against their text
+        text_scorer=TranscriptScorer({k: RECORDING_PROMPTS[k] for k in ("3", "4")}),
+        speaker_index=_speaker_index(),
+    )
+
+@functools.lru_cache(maxsize=1)
+def _streams() -> "StreamIngest":
+    from stream_ingest import StreamIngest
+
+    return StreamIngest(STREAM_DIR)
+
+def _streamed_features(path: str) -> Optional[Dict[str, float]]:
+    """
+    Features computed while a dataset file was streamed in, if the streamed
+    bytes are the ones published (checked against the cached copy's hash).
+    """
+    return _streams().features(path, _AUDIO.digest(path))
+
+async def _score_round(lobby: Lobby, rnd: Round) -> None:
+    try:
+        profiles = await asyncio.to_thread(lambda: {p: (SESSIONS.get(p) or {}).get("baseline_profile") for p in rnd.players})
+        results = await _engine().score(rnd, profiles)
+    except Exception as e:
+        # Runs as a background task, where the error would go unseen: reveal
+        # the failure instead of leaving the round (and the lobby) stuck in "scoring"
+        if rnd.status != "revealed":
+            rnd.publish({p: {"bluff_score": None, "error": f"scoring failed: {e}"} for p in rnd.players})
+        raise
+    transcriber = _engine().transcriber
+    for player, r in results.items():
+        _trace("round_score", session=player, lobby_id=lobby.lobby_id, round=rnd.number, prompt_id=rnd.prompt_id,
+               path=rnd.submissions.get(player), profile=profiles.get(player), features=r.get("features"),
+               text_features=r.get("text_features"), bluff_score=r.get("bluff_score"), band=r.get("band"),
+               reasons=r.get("reasons"), error=r.get("error"), voice_check=r.get("voice_check"), timings_ms=r.get("timings_ms"),
+               transcript_model=transcriber.model if transcriber is not None else None)
+    if LEADERBOARDS.apply_round(lobby.lobby_id, rnd.number, results, lobby.players):
+        await asyncio.to_thread(LEADERBOARDS.save)
+
+def _close_round(lobby: Lobby, rnd: Round) -> None:
+    """Stop taking answers and start scoring (everyone in, deadline, or host)."""
+    if rnd.status != "recording":
+        return
+    rnd.close()
+    _SCHEDULER.finish(lobby, rnd)
+    _spawn(_score_round(lobby, rnd))
+
+async def _submit_upload(lobby: Lobby, rnd: Round, cid: str, path: str) -> None:
+    if not await _claim_round_upload(cid, rnd, [path]):
+        return
+    # Re-checked after the await: another upload or the tool may have submitted meanwhile
+    if rnd.status == "recording" and cid not in rnd.submissions and rnd.submit(cid, path):
+        _close_round(lobby, rnd)
+
+def _auto_submit(lobby: Lobby, rnd: Round, cid: str, path: str) -> None:
+    # A player's tagged upload landed while their round is open
+    _spawn(_submit_upload(lobby, rnd, cid, path))
+
+# Round clocks for all lobbies: one deadline heap, uploads routed from _WATCHER
+_SCHEDULER = RoundScheduler(_WATCHER, on_upload=_auto_submit, on_deadline=_close_round, grace_s=ROUND_GRACE_S)
+
+async def _upload_url(filename: str, size_bytes: int = 0) -> Dict[str, Any]:
+    """Presigned upload for the recorder: single PUT, or multipart for large clips."""
+    if not filename.strip():
+        return {"error": "filename is required"}
+    try:
+        # Signing may resolve credentials over the network; keep it off the loop
+        if size_bytes > MULTIPART_THRESHOLD:
+            return await asyncio.to_thread(RECORDINGS.presign_multipart, filename, size_bytes)
+        return await asyncio.to_thread(RECORDINGS.presign_put, filename)
+    except Exception as e:
+        return {"error": f"Could not create upload URL: {e}"}
+
+_CORS = {
+    "Access-Control-Allow-Origin": "*",
+    "Access-Control-Allow-Methods": "POST, OPTIONS",
+    "Access-Control-Allow-Headers": "Content-Type",
+}
+
+def _json_error(message: str, status_code: int = 400) -> JSONResponse:
+    return JSONResponse({"error": message}, status_code=status_code, headers=_CORS)
+
+def _get_lobby(lobby_id: str) -> Lobby:
+    lobby = LOBBIES.get(lobby_id.strip())
+    if lobby is None:
+        raise KeyError(f"Lobby '{lobby_id}' not found")
+    return lobby
+
+def _round_results(lobby: Lobby, rnd: Round) -> Dict[str, Any]:
+    return {
+        "lobby_id": lobby.lobby_id,
+        "round": rnd.number,
+        "status": "revealed",
+        "results": {
+            lobby.players.get(p, p): {k: v for k, v in r.items() if k != "timings_ms"}
+            for p, r in rnd.results.items()
+        },
+    }
 
 # -------------------------------------------------------------------
 # TOOLS - Functions that can be called by the LLM during conversation
@@ -80,16 +545,7 @@ async def start_game() -> str:
     NECESSITY: Maybe not needed if you're just doing voice recording sessions
     USAGE: Called at the beginning of a game session
     """
-    result = {
-        "greeting": "Welcome to Catch Meow! First, a quick profile to personalize scoring.",
-        "questions": [
-            "What's your name or nickname?",
-            "How old are you?",
-            "What's your favorite color?"
-        ],
-        "expect_tool": "save_profile"
-    }
-    return str(result)
+    return _START_GAME_TEXT
 
 @mcp.tool(
     title="Save Profile",
@@ -105,14 +561,15 @@ async def save_profile(
     USAGE: Called after start_game to save user details
     """
     client_id = _client_id() # Basic for now
-    SESSIONS[client_id] = {
+    profile = {
         "name": name.strip(),
         "age": age,
         "favorite_color": favorite_color.strip()
     }
+    await asyncio.to_thread(SESSIONS.put, client_id, profile)
     result = {
         "ok": True,
-        "stored": SESSIONS[client_id],
+        "stored": profile,
         "recorder_url": RECORDER_URL,
         "next_hint": "Open the recorder URL to capture baseline audio, then return."
     }
@@ -130,8 +587,8 @@ async def get_profile() -> str:
     USAGE: Called to get stored user profile data
     """
     client_id = _client_id()  # Simplified for now
-    result = {"profile": SESSIONS.get(client_id)}
-    return str(result)
+    # str() reads used_paths too, so it runs in the thread as well
+    return await asyncio.to_thread(lambda: str({"profile": SESSIONS.get(client_id)}))
 @mcp.tool(
     title="Get Recording Prompt",
     description="Get a specific recording prompt (question or reading text) for the session."
@@ -144,10 +601,9 @@ async def get_recording_prompt(
     NECESSITY: ESSENTIAL - This is core to your voice recording functionality
     USAGE: Called during recording sessions to get the specific prompt/question
     """
-    prompt = RECORDING_PROMPTS.get(prompt_id)
-    if prompt:
-        prompt_type = "QUESTION" if prompt_id in ["1", "2", "5"] else "READ ALOUD"
-        return f"Prompt {prompt_id} ({prompt_type}):\n\n{prompt}"
+    text = _PROMPT_TEXTS.get(prompt_id)
+    if text:
+        return text
     else:
         return f"Prompt '{prompt_id}' not found. Available IDs: {list(RECORDING_PROMPTS.keys())}"
 
@@ -161,18 +617,7 @@ async def list_all_recording_prompts() -> str:
     NECESSITY: USEFUL - Helps see all available prompts for recording sessions
     USAGE: Called to display all prompts and their types for session planning
     """
-    result = {
-        "prompts": RECORDING_PROMPTS,
-        "prompt_types": {
-            "1": "QUESTION - Name, color, count 1-10",
-            "2": "QUESTION - Free time activities", 
-            "3": "READ ALOUD - Saturday routine text",
-            "4": "READ ALOUD - Technical MCP text",
-            "5": "QUESTION - Last night (Truth & Lie)"
-        },
-        "usage": "Use 'get_recording_prompt' with prompt_id (1-5) to get a specific prompt"
-    }
-    return str(result)
+    return _ALL_PROMPTS_TEXT
 
 @mcp.tool(
     title="Start Baseline Recording",
@@ -180,19 +625,22 @@ async def list_all_recording_prompts() -> str:
 )
 async def start_baseline_recording() -> str:
     cid = _client_id()
-    SESSIONS[cid] = {
+    token = secrets.token_hex(4)
+    recorder_url = f"{RECORDER_URL}?token={token}"
+    await asyncio.to_thread(SESSIONS.put, cid, {
         "start_ts": int(time.time()),
         "current_prompt": 1,
         "answers": {},
         "used_paths": set(),
-        "recorder_url": RECORDER_URL,
-    }
+        "upload_token": token,
+        "recorder_url": recorder_url,
+    })
     p1 = RECORDING_PROMPTS["1"]
     p2 = RECORDING_PROMPTS["2"]
     p3 = RECORDING_PROMPTS["3"]
     return (
         f"🎮 Baseline started!\n\n"
-        f"Recorder: {RECORDER_URL}\n\n"
+        f"Recorder: {recorder_url}\n\n"
         f"Please record answers to these, one by one (click **Send** each time):\n"
         f"1) {p1}\n"
         f"2) {p2}\n"
@@ -202,41 +650,482 @@ async def start_baseline_recording() -> str:
 
 @mcp.tool(
     title="Validate Next Upload",
-    description="Finds the next new .wav since the session started and advances to the next prompt."
+    description=(
+        "Finds the next new .wav since the session started and advances to the next prompt. "
+        "Set wait_seconds to wait for the upload to land instead of calling again."
+    )
 )
-async def validate_next_upload() -> str:
+async def validate_next_upload(
+    wait_seconds: int = Field(default=0, description=f"Seconds to wait for the next upload (0 = check once, max {MAX_WAIT_S})")
+) -> str:
+    t0 = time.perf_counter()
     cid = _client_id()
-    sess = SESSIONS.get(cid)
-    if not sess:
+    sess = await asyncio.to_thread(SESSIONS.get, cid)
+    if not sess or "current_prompt" not in sess:
         return "No active session. Call **Start Baseline Recording** first."
 
     if sess["current_prompt"] > 3:
         return "✅ All three baseline answers are already validated. Great job!"
 
     try:
-        candidates = _list_wav_paths_since(sess["start_ts"])
+        candidates = await _run_hub(_list_wav_paths_since, sess["start_ts"], sess.get("upload_token"))
+    except asyncio.TimeoutError:
+        return f"⚠️ Listing the dataset took longer than {HUB_TIMEOUT_S:.0f}s. Please try again in a moment."
     except Exception as e:
         return f"⚠️ Could not list dataset files: {e}"
 
-    # first candidate not yet used
-    new_path = next((p for p in candidates if p not in sess["used_paths"]), None)
-    if not new_path:
-        return "⏳ I don’t see a new WAV yet. Make sure you clicked **Send** on the recorder, then run this tool again."
+    claim = await _claim_next(cid, candidates)
 
-    prompt_id = str(sess["current_prompt"])
-    sess["answers"][prompt_id] = new_path
-    sess["used_paths"].add(new_path)
-    sess["current_prompt"] += 1
+    if claim is None and wait_seconds > 0:
+        loop = asyncio.get_running_loop()
+        deadline = loop.time() + min(wait_seconds, MAX_WAIT_S)
+        # Every candidate seen so far failed to claim (already used), so only
+        # newer files can match; the predicate never touches the store
+        tried = set(candidates)
+        while claim is None and (remaining := deadline - loop.time()) > 0:
+            # Re-read: the baseline may have been finished or restarted meanwhile
+            sess = await asyncio.to_thread(SESSIONS.get, cid)
+            if not sess or sess.get("current_prompt", 4) > 3:
+                break
+            start_ts, token = sess["start_ts"], sess.get("upload_token")
+            path = await _WATCHER.wait_for(
+                lambda ts, p: ts >= start_ts and p not in tried and _owns_upload(token, p),
+                timeout=remaining,
+                since_ts=start_ts,
+            )
+            if path is None:
+                break
+            tried.add(path)
+            claim = await _claim_next(cid, [path])
+        if claim is None:
+            return f"⏳ No new WAV arrived within {min(wait_seconds, MAX_WAIT_S)}s. Make sure you clicked **Send** on the recorder, then run this tool again."
 
+    if claim is None:
+        return "⏳ I don’t see a new WAV yet. Make sure you clicked **Send** on the recorder, then run this tool again."
+
+    prompt_id, new_path, current_prompt, answers = claim
+    _trace("upload_validated", session=cid, prompt_id=prompt_id, path=new_path, waited=wait_seconds > 0,
+           elapsed_ms=round(1000 * (time.perf_counter() - t0), 1))
+    if current_prompt > 3:
+        # The answers this claim completed, not a re-read that a reset could change
+        _spawn(_build_baseline_profile(cid, answers))
     ack = f"🎉 Great, amazing answer for {prompt_id}! (saved: {new_path})"
 
-    if sess["current_prompt"] <= 3:
-        next_id = str(sess["current_prompt"])
+    if current_prompt <= 3:
+        next_id = str(current_prompt)
         next_prompt = RECORDING_PROMPTS[next_id]
         return f"{ack}\n\nNext up — Prompt {next_id}:\n{next_prompt}"
     else:
         return f"{ack}\n\n✅ All three baseline prompts are complete. Thank you!"
 
+@mcp.tool(
+    title="Create Lobby",
+    description="Create a game lobby for 3–8 players and join it."
+)
+async def create_lobby(
+    name: str = Field(default="", description="Your display name in the lobby")
+) -> str:
+    cid = _client_id()
+    lobby = Lobby()
+    LOBBIES[lobby.lobby_id] = lobby
+    sess = await asyncio.to_thread(SESSIONS.get, cid)
+    lobby.join(cid, name.strip() or (sess or {}).get("name") or "Player 1")
+    result = {
+        "lobby_id": lobby.lobby_id,
+        "players": list(lobby.players.values()),
+        "next_hint": "Share the lobby id; others call join_lobby, then call start_round.",
+    }
+    return str(result)
+
+@mcp.tool(
+    title="Join Lobby",
+    description="Join an existing game lobby by id."
+)
+async def join_lobby(
+    lobby_id: str = Field(description="Lobby id from create_lobby"),
+    name: str = Field(default="", description="Your display name in the lobby")
+) -> str:
+    cid = _client_id()
+    sess = await asyncio.to_thread(SESSIONS.get, cid)
+    try:
+        lobby = _get_lobby(lobby_id)
+        lobby.join(cid, name.strip() or (sess or {}).get("name") or f"Player {len(lobby.players) + 1}")
+    except (KeyError, ValueError) as e:
+        return f"⚠️ {e.args[0]}"
+    return str({"lobby_id": lobby.lobby_id, "players": list(lobby.players.values())})
+
+@mcp.tool(
+    title="Start Round",
+    description="Start the next round in a lobby: you get the prompt and your recorder link, other players call get_round_link."
+)
+async def start_round(
+    lobby_id: str = Field(description="Lobby id"),
+    prompt_id: str = Field(default="5", description="Recording prompt for this round (1-5)")
+) -> str:
+    prompt = RECORDING_PROMPTS.get(prompt_id)
+    if prompt is None:
+        return f"Prompt '{prompt_id}' not found. Available IDs: {list(RECORDING_PROMPTS.keys())}"
+    try:
+        lobby = _get_lobby(lobby_id)
+        rnd = lobby.start_round(prompt_id, ROUND_RECORD_S)
+    except KeyError as e:
+        return f"⚠️ {e.args[0]}"
+    except RuntimeError as e:
+        return f"⚠️ {e}"
+    tokens = await asyncio.to_thread(lambda: {p: _ensure_upload_token_sync(p) for p in rnd.players})
+    _SCHEDULER.open(lobby, rnd, tokens)
+    token = tokens.get(_client_id()) or await _ensure_upload_token(_client_id())
+    return (
+        f"🎙️ Round {rnd.number} started for {len(rnd.players)} players!\n\n"
+        f"{_round_brief(rnd, token)}\n"
+        f"Every other player gets their own recorder link from **Get Round Link** (lobby {lobby.lobby_id})."
+    )
+
+def _round_brief(rnd: Round, token: str) -> str:
+    return (
+        f"Prompt: {RECORDING_PROMPTS[rnd.prompt_id]}\n\n"
+        f"Record a {ROUND_RECORD_S}-second answer — truth or bluff — at {RECORDER_URL}?token={token}\n"
+        f"Answers are picked up automatically; the round closes when everyone is in or after "
+        f"{ROUND_RECORD_S + ROUND_GRACE_S:.0f}s. Results are revealed together once all answers are analysed."
+    )
+
+@mcp.tool(
+    title="Get Round Link",
+    description="The current round's prompt and your own recorder link (each player's link tags their uploads)."
+)
+async def get_round_link(
+    lobby_id: str = Field(description="Lobby id")
+) -> str:
+    cid = _client_id()
+    try:
+        lobby = _get_lobby(lobby_id)
+    except KeyError as e:
+        return f"⚠️ {e.args[0]}"
+    rnd = lobby.current
+    if rnd is None or rnd.status != "recording":
+        return "No round is accepting answers. Call **Start Round** first."
+    if cid not in rnd.players:
+        return "You joined after this round started; you'll be in the next one."
+    if cid in rnd.submissions:
+        return f"✅ Already submitted ({rnd.submissions[cid]}). Waiting for {len(rnd.missing)} more player(s)."
+    # Same token start_round registered with the scheduler, so this player's upload is picked up
+    token = await _ensure_upload_token(cid)
+    return f"🎙️ Round {rnd.number} of lobby {lobby.lobby_id}\n\n{_round_brief(rnd, token)}"
+
+@mcp.tool(
+    title="Submit Round Answer",
+    description=(
+        "Finds your recording for the current round and submits it. Uploads from your round "
+        "recorder link are picked up automatically; use this to check, or for other uploads. "
+        "Scoring starts as soon as every player has submitted."
+    )
+)
+async def submit_round_answer(
+    lobby_id: str = Field(description="Lobby id"),
+    wait_seconds: int = Field(default=0, description=f"Seconds to wait for the upload to land (0 = check once, max {MAX_WAIT_S})")
+) -> str:
+    cid = _client_id()
+    try:
+        lobby = _get_lobby(lobby_id)
+    except KeyError as e:
+        return f"⚠️ {e.args[0]}"
+    rnd = lobby.current
+    if rnd is None or rnd.status != "recording":
+        return "No round is accepting answers. Call **Start Round** first."
+    if cid not in rnd.players:
+        return "You joined after this round started; you'll be in the next one."
+    if cid in rnd.submissions:
+        return f"✅ Already submitted ({rnd.submissions[cid]}). Waiting for {len(rnd.missing)} more player(s)."
+
+    token = await _ensure_upload_token(cid)
+    try:
+        candidates = await _run_hub(_list_wav_paths_since, rnd.started_at, token)
+    except asyncio.TimeoutError:
+        return f"⚠️ Listing the dataset took longer than {HUB_TIMEOUT_S:.0f}s. Please try again in a moment."
+    except Exception as e:
+        return f"⚠️ Could not list dataset files: {e}"
+    path = await _claim_round_upload(cid, rnd, candidates)
+
+    if path is None and wait_seconds > 0 and cid not in rnd.submissions:
+        found = await _WATCHER.wait_for(
+            # Also wakes when the round scheduler submits this player's upload first
+            lambda ts, p: ts >= rnd.started_at and _owns_upload(token, p)
+            and (p not in rnd.submissions.values() or rnd.submissions.get(cid) == p),
+            timeout=min(wait_seconds, MAX_WAIT_S),
+            since_ts=rnd.started_at,
+        )
+        if found is not None:
+            path = await _claim_round_upload(cid, rnd, [found])
+    if path is None and cid in rnd.submissions:
+        return f"✅ Already submitted ({rnd.submissions[cid]}). Waiting for {len(rnd.missing)} more player(s)."
+    if path is None:
+        return "⏳ I don’t see your round recording yet. Make sure you clicked **Send** on the recorder, then run this tool again."
+    if rnd.status != "recording":
+        return "⌛ The round closed before your answer arrived."
+    if cid in rnd.submissions:  # the scheduler submitted another upload while we waited
+        return f"✅ Already submitted ({rnd.submissions[cid]}). Waiting for {len(rnd.missing)} more player(s)."
+
+    if rnd.submit(cid, path):
+        _close_round(lobby, rnd)
+        return f"🎉 Answer saved ({path}). Everyone is in — analysing all answers now."
+    return f"🎉 Answer saved ({path}). Waiting for {len(rnd.missing)} more player(s)."
+
+@mcp.tool(
+    title="Close Round",
+    description="Stop waiting for missing answers and score the round with what was submitted."
+)
+async def close_round(
+    lobby_id: str = Field(description="Lobby id")
+) -> str:
+    try:
+        lobby = _get_lobby(lobby_id)
+    except KeyError as e:
+        return f"⚠️ {e.args[0]}"
+    rnd = lobby.current
+    if rnd is None or rnd.status != "recording":
+        return "No round is accepting answers."
+    _close_round(lobby, rnd)
+    return f"Round {rnd.number} closed with {len(rnd.submissions)}/{len(rnd.players)} answers — analysing now."
+
+@mcp.tool(
+    title="Get Round Results",
+    description="Bluff scores and reasons for the current round, revealed for all players at once."
+)
+async def get_round_results(
+    lobby_id: str = Field(description="Lobby id"),
+    wait_seconds: int = Field(default=0, description=f"Seconds to wait for the reveal (0 = check once, max {MAX_WAIT_S})")
+) -> str:
+    try:
+        lobby = _get_lobby(lobby_id)
+    except KeyError as e:
+        return f"⚠️ {e.args[0]}"
+    rnd = lobby.current
+    if rnd is None:
+        return "No round has been played in this lobby yet."
+    if rnd.status != "revealed" and wait_seconds > 0:
+        try:
+            await asyncio.wait_for(rnd.revealed.wait(), min(wait_seconds, MAX_WAIT_S))
+        except asyncio.TimeoutError:
+            pass
+    if rnd.status == "revealed":
+        return str(_round_results(lobby, rnd))
+    if rnd.status == "scoring":
+        return f"🔎 Round {rnd.number}: analysing {len(rnd.submissions)} answers. Results are revealed together."
+    missing = [lobby.players.get(p, p) for p in rnd.missing]
+    return f"⏳ Round {rnd.number}: waiting for {', '.join(missing)}."
+
+@mcp.tool(
+    title="Get Leaderboard",
+    description="Honesty Mode leaderboard of a lobby (100 − bluff_score per round, cumulative)."
+)
+async def get_leaderboard(
+    lobby_id: str = Field(description="Lobby id"),
+    top_k: int = Field(default=10, description="How many places to show")
+) -> str:
+    cid = _client_id()
+    result = {
+        "lobby_id": lobby_id,
+        "top": LEADERBOARDS.top(lobby_id.strip(), max(1, top_k)),
+        "you": LEADERBOARDS.standing(lobby_id.strip(), cid),
+    }
+    return str(result)
+
+@mcp.tool(
+    title="Get My Rank",
+    description="Your current rank and cumulative score in a lobby."
+)
+async def get_my_rank(
+    lobby_id: str = Field(description="Lobby id")
+) -> str:
+    standing = LEADERBOARDS.standing(lobby_id.strip(), _client_id())
+    if standing is None:
+        return "No score yet in this lobby — it appears after your first revealed round."
+    return str(standing)
+
+@mcp.tool(
+    title="Check S3 Connection",
+    description="Checks that the recordings bucket is reachable with the server's credentials."
+)
+async def check_s3_connection() -> str:
+    try:
+        result = await asyncio.to_thread(RECORDINGS.check)
+    except Exception as e:
+        result = {"ok": False, "bucket": S3_BUCKET, "error": str(e)}
+    return str(result)
+
+@mcp.tool(
+    title="Generate Upload URL",
+    description=(
+        "Presigned S3 URL the recorder PUTs a WAV to. Clips larger than "
+        f"{MULTIPART_THRESHOLD // (1024 * 1024)} MB get one URL per part (multipart)."
+    )
+)
+async def generate_upload_url(
+    filename: str = Field(description="Recording file name, e.g. 1699999999_cm-<token>_recording.wav"),
+    size_bytes: int = Field(default=0, description="Clip size in bytes, if known (enables multipart for large clips)")
+) -> str:
+    return str(await _upload_url(filename, size_bytes))
+
+@mcp.tool(
+    title="Complete Multipart Upload",
+    description="Finish a multipart upload started by generate_upload_url."
+)
+async def complete_multipart_upload(
+    s3_key: str = Field(description="s3_key returned by generate_upload_url"),
+    upload_id: str = Field(description="upload_id returned by generate_upload_url"),
+    etags: List[str] = Field(description="ETag response header of each part, in part order")
+) -> str:
+    try:
+        result = await asyncio.to_thread(RECORDINGS.complete_multipart, s3_key, upload_id, etags)
+    except Exception as e:
+        result = {"ok": False, "error": str(e)}
+    return str(result)
+
+@mcp.tool(
+    title="List Recordings",
+    description="Recordings uploaded on one day (default today, UTC), one page at a time."
+)
+async def list_recordings(
+    day: str = Field(default="", description="Upload day as YYYY-MM-DD (empty = today)"),
+    limit: int = Field(default=50, description="Page size (max 1000)"),
+    page_token: str = Field(default="", description="next_page_token from the previous page")
+) -> str:
+    try:
+        result = await asyncio.to_thread(RECORDINGS.list_recordings, day or None, limit, page_token or None)
+    except ValueError:
+        result = {"error": f"Invalid day '{day}', expected YYYY-MM-DD"}
+    except Exception as e:
+        result = {"error": f"Could not list recordings: {e}"}
+    return str(result)
+
+# -------------------------------------------------------------------
+# HTTP ROUTES - plain JSON endpoints for the recorder page
+# -------------------------------------------------------------------
+@mcp.custom_route("/generate_upload_url", methods=["POST", "OPTIONS"])
+async def generate_upload_url_route(request: Request) -> JSONResponse:
+    if request.method == "OPTIONS":
+        return JSONResponse({}, headers=_CORS)
+    try:
+        body = await request.json()
+        filename, size_bytes = str(body.get("filename", "")), body.get("size_bytes") or 0
+    except (ValueError, AttributeError):
+        return _json_error("Expected a JSON object")
+    # A whole number of bytes; bools, floats and numeric strings are refused
+    if type(size_bytes) is not int or size_bytes < 0:
+        return _json_error("size_bytes must be a non-negative integer")
+    result = await _upload_url(filename, size_bytes)
+    return JSONResponse(result, status_code=400 if result.get("error") == "filename is required" else 200, headers=_CORS)
+
+@mcp.custom_route("/complete_multipart_upload", methods=["POST", "OPTIONS"])
+async def complete_multipart_upload_route(request: Request) -> JSONResponse:
+    if request.method == "OPTIONS":
+        return JSONResponse({}, headers=_CORS)
+    try:
+        body = await request.json()
+        result = await asyncio.to_thread(RECORDINGS.complete_multipart, body["s3_key"], body["upload_id"], body["etags"])
+    except (ValueError, KeyError):
+        return _json_error("Expected JSON with s3_key, upload_id and etags")
+    except Exception as e:
+        result = {"error": f"Could not complete upload: {e}"}
+    return JSONResponse(result, headers=_CORS)
+
+@mcp.custom_route("/publish_recording", methods=["POST", "OPTIONS"])
+async def publish_recording_route(request: Request) -> JSONResponse:
+    """Called by the recorder once its S3 upload is done."""
+    if request.method == "OPTIONS":
+        return JSONResponse({}, headers=_CORS)
+    try:
+        body = await request.json()
+        s3_key, token = str(body["s3_key"]), str(body["upload_token"])
+    except (ValueError, KeyError, TypeError):
+        return _json_error("Expected JSON with s3_key and upload_token")
+    try:
+        result = await _run_hub(_publish_recording, s3_key, token)
+    except PermissionError as e:
+        return _json_error(str(e), status_code=403)
+    except ValueError as e:
+        return _json_error(str(e))
+    except Exception as e:
+        result = {"error": f"Could not publish recording: {e}"}
+    return JSONResponse(result, headers=_CORS)
+
+@mcp.custom_route("/stream/start", methods=["POST", "OPTIONS"])
+async def stream_start_route(request: Request) -> JSONResponse:
+    if request.method == "OPTIONS":
+        return JSONResponse({}, headers=_CORS)
+    try:
+        body = await request.json()
+        stream_id = await asyncio.to_thread(
+            _streams().start, str(body.get("filename", "")), int(body["sample_rate"]), int(body.get("channels", 1))
+        )
+    except (ValueError, KeyError, TypeError):
+        return _json_error("Expected JSON with filename and sample_rate (8000-192000 Hz, 1-2 channels)")
+    except RuntimeError as e:
+        return _json_error(str(e), 503)
+    return JSONResponse({"stream_id": stream_id}, headers=_CORS)
+
+@mcp.custom_route("/stream/{stream_id}/chunk", methods=["POST", "OPTIONS"])
+async def stream_chunk_route(request: Request) -> JSONResponse:
+    """Body: raw little-endian 16-bit PCM. Returns the live VAD state."""
+    if request.method == "OPTIONS":
+        return JSONResponse({}, headers=_CORS)
+    try:
+        stream = _streams().get(request.path_params["stream_id"])
+        status = await asyncio.to_thread(stream.append, await request.body())
+    except KeyError as e:
+        return _json_error(e.args[0], 404)
+    except ValueError as e:
+        return _json_error(str(e), 413)
+    return JSONResponse(status, headers=_CORS)
+
+@mcp.custom_route("/stream/{stream_id}/close", methods=["POST", "OPTIONS"])
+async def stream_close_route(request: Request) -> JSONResponse:
+    """Finalize the WAV; returns its name, VAD summary and acoustic features."""
+    if request.method == "OPTIONS":
+        return JSONResponse({}, headers=_CORS)
+    try:
+        result = await asyncio.to_thread(_streams().finish, request.path_params["stream_id"])
+    except KeyError as e:
+        return _json_error(e.args[0], 404)
+    return JSONResponse(result, headers=_CORS)
+
+@mcp.custom_route("/metrics", methods=["GET"])
+async def metrics_route(request: Request) -> PlainTextResponse:
+    return PlainTextResponse(METRICS.render_prometheus(), media_type="text/plain; version=0.0.4")
+
+# -------------------------------------------------------------------
+# RESOURCES
+# -------------------------------------------------------------------
+@mcp.resource(
+    "leaderboard://{lobby_id}",
+    name="Lobby leaderboard",
+    description="Honesty Mode standings of a lobby as JSON.",
+    mime_type="application/json",
+)
+async def leaderboard_resource(lobby_id: str) -> str:
+    return json.dumps({"lobby_id": lobby_id, "top": LEADERBOARDS.top(lobby_id, 100)})
+
+@mcp.resource(
+    "metrics://server",
+    name="Server metrics",
+    description="Per-tool and per-external-call latency (p50/p95/p99), in-flight counts, error rates and cache hit ratios as JSON.",
+    mime_type="application/json",
+)
+async def metrics_resource() -> str:
+    return json.dumps(METRICS.snapshot())
+
+@mcp.resource(
+    "decisions://{session_id}",
+    name="Judge decisions",
+    description="The last 50 traced judge decisions about a player (validations, baseline, round scores) as JSON.",
+    mime_type="application/json",
+)
+async def decisions_resource(session_id: str) -> str:
+    if TRACE is None:
+        return json.dumps({"session": session_id, "decisions": [], "trace": "disabled"})
+    decisions = await asyncio.to_thread(TRACE.query, session=session_id, limit=50)
+    return json.dumps({"session": session_id, "decisions": decisions, "trace": TRACE.stats()})
+
 # -------------------------------------------------------------------
 # PROMPTS
 # -------------------------------------------------------------------
@@ -244,12 +1133,7 @@ async def validate_next_upload() -> str:
 async def voice_recording_instructions(
     session_type: str = Field(description="Type of recording session: baseline, truth, lie", default="baseline")
 ) -> str:
-    instructions = {
-        "baseline": "You are conducting a baseline voice recording session. Ask the participant to speak naturally and clearly. Record their normal speech patterns, tone, and pace. Be encouraging and create a comfortable atmosphere.",
-        "truth": "You are conducting a truth recording session. Instruct the participant to answer all questions honestly and naturally. Emphasize that they should tell the truth and speak as they normally would.",
-        "lie": "You are conducting a lie recording session. Instruct the participant to answer questions with deliberate lies or false information. They should try to be convincing while lying. Remind them this is for training purposes."
-    }
-    return instructions.get(session_type, instructions["baseline"])
+    return _VOICE_INSTRUCTIONS.get(session_type, _VOICE_INSTRUCTIONS["baseline"])
 
 @mcp.prompt("Game instructions")
 async def game_instructions(
@@ -320,6 +1204,22 @@ async def game_instructions(
 # -------------------------------------------------------------------
 # RUN
 # -------------------------------------------------------------------
+def _prewarm() -> None:
+    """Import the deferred modules and build clients once the server is up."""
+    import numpy  # noqa: F401
+    import audio_prep, baseline_profile, voice_features  # noqa: F401
+
+    _engine()
+    _streams()
+    _speaker_index()
+    _api()
+    if _engine().transcriber is not None:
+        _engine().transcriber.client
+    RECORDINGS.client
+
 if __name__ == "__main__":
-    # Exposes an HTTP MCP endpoint at http://127.0.0.1:3000/mcp
-    mcp.run(transport="streamable-http")
\ No newline at end of file
+    if os.environ.get("PREWARM", "1") == "1":
+        # Runs while uvicorn starts; the first tool call doesn't wait for it
+        threading.Thread(target=_prewarm, name="prewarm", daemon=True).start()
+    # Exposes an HTTP MCP endpoint at http://127.0.0.1:3000/mcp (PORT overrides)
+    mcp.run(transport="streamable-http", port=PORT)
\ No newline at end of file
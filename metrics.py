@@ -0,0 +1,202 @@
+"""
+In-process metrics for the MCP server.
+Latency histograms, in-flight gauges and error counts per tool and per
+external call (Hub, Mistral), plus the hit ratios of the caches. Recording a
+sample is a bisect and a few integer adds under one lock, cheap enough to
+leave on in production. Read out as a JSON snapshot (MCP resource) or as
+Prometheus text (/metrics).
+"""
+import asyncio
+import bisect
+import functools
+import threading
+import time
+from contextlib import contextmanager
+from typing import Any, Callable, Dict, Iterable, List, Optional, Tuple
+
+# Upper bounds in seconds; a final +Inf bucket catches the rest
+BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+KINDS = ("tool", "external")
+PREFIX = "catchmeow"
+
+
+class _Series:
+    __slots__ = ("counts", "total", "count", "errors", "in_flight")
+
+    def __init__(self, n_buckets: int):
+        self.counts = [0] * (n_buckets + 1)
+        self.total = 0.0
+        self.count = 0
+        self.errors = 0
+        self.in_flight = 0
+
+
+class Metrics:
+    """Registry of latency series keyed by (kind, name), plus stats sources."""
+
+    def __init__(self, buckets: Tuple[float, ...] = BUCKETS):
+        self.buckets = tuple(buckets)
+        self._series: Dict[Tuple[str, str], _Series] = {}
+        self._stats: Dict[str, Callable[[], Dict[str, Any]]] = {}
+        self._lock = threading.Lock()
+
+    def _get(self, kind: str, name: str) -> _Series:
+        series = self._series.get((kind, name))
+        if series is None:
+            series = self._series.setdefault((kind, name), _Series(len(self.buckets)))
+        return series
+
+    def observe(self, kind: str, name: str, seconds: float, error: bool = False) -> None:
+        """Record one finished operation."""
+        self._record(kind, name, seconds, error, 0)
+
+    def _record(self, kind: str, name: str, seconds: float, error: bool, finished: int) -> None:
+        i = bisect.bisect_left(self.buckets, seconds)
+        with self._lock:
+            series = self._get(kind, name)
+            series.in_flight -= finished
+            series.counts[i] += 1
+            series.total += seconds
+            series.count += 1
+            if error:
+                series.errors += 1
+
+    @contextmanager
+    def track(self, kind: str, name: str):
+        """Time the enclosed block; it counts as in flight until it exits."""
+        with self._lock:
+            self._get(kind, name).in_flight += 1
+        error = False
+        t0 = time.perf_counter()
+        try:
+            yield
+        except BaseException:
+            error = True
+            raise
+        finally:
+            self._record(kind, name, time.perf_counter() - t0, error, 1)
+
+    def timed(self, kind: str, name: str) -> Callable[[Callable], Callable]:
+        """Decorator form of track(); works on plain and async functions."""
+        def wrap(fn: Callable) -> Callable:
+            if asyncio.iscoroutinefunction(fn):
+                @functools.wraps(fn)
+                async def run_async(*args, **kwargs):
+                    with self.track(kind, name):
+                        return await fn(*args, **kwargs)
+                return run_async
+
+            @functools.wraps(fn)
+            def run(*args, **kwargs):
+                with self.track(kind, name):
+                    return fn(*args, **kwargs)
+            return run
+        return wrap
+
+    def instrument(self, obj: Any, prefix: str, methods: Iterable[str]) -> Any:
+        """
+        Time some methods of one client object, as external calls named
+        '<prefix>.<method>'. A method's '_async' twin shares its series.
+        """
+        for method in methods:
+            for attr in (method, f"{method}_async"):
+                fn = getattr(obj, attr, None)
+                if fn is not None:
+                    setattr(obj, attr, self.timed("external", f"{prefix}.{method}")(fn))
+        return obj
+
+    def register_stats(self, name: str, source: Callable[[], Dict[str, Any]]) -> None:
+        """
+        Add a stats source (e.g. a cache's stats()); its numeric values are
+        reported under `name` on every read-out.
+        """
+        self._stats[name] = source
+
+    def _quantile(self, counts: List[int], count: int, q: float) -> Optional[float]:
+        # Upper bound of the bucket holding the q-th sample; None past the last bound
+        if not count:
+            return None
+        rank = q * count
+        seen = 0
+        for bound, n in zip(self.buckets, counts):
+            seen += n
+            if seen >= rank:
+                return bound
+        return None
+
+    def _rows(self) -> List[tuple]:
+        # Consistent copy of every series, sorted by (kind, name)
+        with self._lock:
+            return sorted((key, s.count, s.total, s.errors, s.in_flight, list(s.counts)) for key, s in self._series.items())
+
+    def _collect_stats(self) -> Dict[str, Dict[str, float]]:
+        out = {}
+        for name, source in list(self._stats.items()):
+            try:
+                values = source()
+            except Exception:
+                continue
+            out[name] = {k: float(v) for k, v in values.items() if isinstance(v, (int, float))}
+        return out
+
+    def snapshot(self) -> Dict[str, Any]:
+        """
+        Returns:
+            dict: {"tool": {name: {...}}, "external": {name: {...}}, "stats": {source: {...}}}
+        """
+        out: Dict[str, Any] = {kind: {} for kind in KINDS}
+        for (kind, name), count, total, errors, in_flight, counts in self._rows():
+            out.setdefault(kind, {})[name] = {
+                "count": count,
+                "errors": errors,
+                "error_rate": errors / count if count else 0.0,
+                "in_flight": in_flight,
+                "mean_s": total / count if count else None,
+                "p50_s": self._quantile(counts, count, 0.50),
+                "p95_s": self._quantile(counts, count, 0.95),
+                "p99_s": self._quantile(counts, count, 0.99),
+            }
+        out["stats"] = self._collect_stats()
+        return out
+
+    def render_prometheus(self) -> str:
+        """Prometheus text exposition format (version 0.0.4)."""
+        items = self._rows()
+        lines: List[str] = []
+        for kind in KINDS:
+            rows = [row for row in items if row[0][0] == kind]
+            if not rows:
+                continue
+            base = f"{PREFIX}_{kind}"
+            lines.append(f"# HELP {base}_seconds Latency of {kind} calls.")
+            lines.append(f"# TYPE {base}_seconds histogram")
+            for (_, name), count, total, _, _, counts in rows:
+                label = f'name="{_escape(name)}"'
+                cumulative = 0
+                for bound, n in zip(self.buckets, counts):
+                    cumulative += n
+                    lines.append(f'{base}_seconds_bucket{{{label},le="{bound:g}"}} {cumulative}')
+                lines.append(f'{base}_seconds_bucket{{{label},le="+Inf"}} {count}')
+                lines.append(f"{base}_seconds_sum{{{label}}} {total:.6f}")
+                lines.append(f"{base}_seconds_count{{{label}}} {count}")
+            lines.append(f"# TYPE {base}_errors_total counter")
+            lines.extend(f'{base}_errors_total{{name="{_escape(name)}"}} {errors}' for (_, name), _, _, errors, _, _ in rows)
+            lines.append(f"# TYPE {base}_in_flight gauge")
+            lines.extend(f'{base}_in_flight{{name="{_escape(name)}"}} {busy}' for (_, name), _, _, _, busy, _ in rows)
+        stats = self._collect_stats()
+        keys = sorted({k for values in stats.values() for k in values})
+        for key in keys:
+            lines.append(f"# TYPE {PREFIX}_cache_{key} gauge")
+            lines.extend(
+                f'{PREFIX}_cache_{key}{{cache="{_escape(source)}"}} {values[key]:g}'
+                for source, values in sorted(stats.items()) if key in values
+            )
+        return "\n".join(lines) + "\n"
+
+
+def _escape(value: str) -> str:
+    return value.replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+# Process-wide registry; modules record into it without any wiring
+METRICS = Metrics()
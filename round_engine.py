@@ -0,0 +1,336 @@
+"""
+Lobbies, rounds and the round scoring engine.
+The NumPy-based analysis modules are imported where they are used, so the
+server can load this module without paying for them at startup.
+Every player's answer is analysed in parallel (acoustic scoring in a process
+pool, transcription on the event loop), and the round's results are
+published in one step once the last analysis finishes or the scoring
+deadline passes, so everyone sees their score at the same time.
+"""
+import asyncio
+import logging
+import math
+import multiprocessing
+import os
+import secrets
+import time
+from concurrent.futures import ProcessPoolExecutor
+from types import MappingProxyType
+from typing import TYPE_CHECKING, Any, Awaitable, Callable, Dict, List, Mapping, Optional
+
+if TYPE_CHECKING:
+    from speaker_index import SpeakerIndex
+    from transcript_features import TranscriptScorer
+
+log = logging.getLogger(__name__)
+
+# Bump when score_features, REASONS or the text cues change; it is recorded
+# with every traced decision so old calls can be replayed against new rules
+JUDGE_VERSION = "2"
+
+# Generic adult-speech profile, used when a player has no baseline yet
+# (values in voice_features.FEATURE_NAMES order)
+GENERIC_PROFILE = {
+    "n": 0,
+    "mean": [10.0, -25.0, 8.0, 160.0, 25.0, 0.02, 0.2, 4.0, 0.3],
+    "var": [25.0, 36.0, 9.0, 2500.0, 100.0, 1e-4, 0.01, 1.0, 0.04],
+}
+
+# Which cue each feature's deviation from baseline points to
+REASONS = {
+    "duration_s": ("answer much longer than usual", "answer much shorter than usual"),
+    "energy_mean_db": ("voice stress (louder than baseline)", "voice stress (quieter than baseline)"),
+    "energy_std_db": ("voice stress (unsteady loudness)", "flatter delivery than baseline"),
+    "pitch_mean_hz": ("voice stress (pitch raised)", "voice stress (pitch lowered)"),
+    "pitch_std_hz": ("voice stress (unsteady pitch)", "monotone compared to baseline"),
+    "jitter": ("voice stress (pitch jitter)", "unusually steady pitch"),
+    "pause_ratio": ("hesitation patterns (more pauses)", "fewer pauses than baseline"),
+    "speech_rate": ("pace inconsistency (faster than baseline)", "pace inconsistency (slower than baseline)"),
+    "rate_variability": ("pace inconsistency (uneven pace)", "unusually even pace"),
+}
+
+
+def band(score: int) -> str:
+    if score < 30:
+        return "appears honest"
+    if score < 70:
+        return "uncertain"
+    return "likely bluffing"
+
+
+def score_features(features, profile: Optional[Dict[str, Any]]) -> Dict[str, Any]:
+    """
+    Deterministic bluff score from one answer's features and the player's
+    baseline profile: 0 = indistinguishable from baseline, 100 = far off it.
+    """
+    import baseline_profile
+    import voice_features
+
+    profile = profile or GENERIC_PROFILE
+    z = baseline_profile.zscores(features, profile)[0]
+    dist = float(math.sqrt((z * z).mean()))
+    score = int(round(100 * (1 - math.exp(-dist / 2.0))))
+
+    ranked = sorted(range(len(z)), key=lambda i: -abs(z[i]))
+    reasons = []
+    for i in ranked[:3]:
+        if abs(z[i]) < 1.0:
+            break
+        up, down = REASONS[voice_features.FEATURE_NAMES[i]]
+        reasons.append(up if z[i] > 0 else down)
+    if not reasons:
+        reasons.append("delivery consistent with baseline")
+    return {"bluff_score": score, "band": band(score), "reasons": reasons}
+
+
+def rescore(record: Dict[str, Any]) -> Dict[str, Any]:
+    """
+    Re-score a traced "round_score" decision from its recorded features and
+    profile (for DecisionTrace.replay). Text cues are not re-applied.
+    """
+    import voice_features
+
+    if not record.get("features"):
+        return {}
+    features = [[record["features"][name] for name in voice_features.FEATURE_NAMES]]
+    result = score_features(features, record.get("profile"))
+    return {"bluff_score": result["bluff_score"], "band": result["band"]}
+
+
+def analyse_submission(path: str, profile: Optional[Dict[str, Any]],
+                       known: Optional[Dict[str, float]] = None) -> Dict[str, Any]:
+    """
+    Feature extraction, scoring and speaker embedding for one answer. Runs in
+    a worker process. `known` = features already computed for this answer
+    (e.g. while it was streamed), which skips the extraction pass.
+    """
+    import voice_features
+
+    signal = voice_features.load_signal(path)
+    features = voice_features.extract_signals([signal]) if known is None else voice_features.from_dicts([known])
+    result = score_features(features, profile)
+    result["features"] = voice_features.as_dicts(features)[0]
+    result["embedding"] = voice_features.speaker_embeddings([signal])[0].tolist()
+    return result
+
+
+class Round:
+    """One round of a lobby: who answered with what, and the revealed results."""
+
+    def __init__(self, lobby_id: str, number: int, prompt_id: str, players: List[str], record_s: float):
+        self.lobby_id = lobby_id
+        self.number = number
+        self.prompt_id = prompt_id
+        self.players = list(players)
+        self.started_at = int(time.time())
+        self.record_deadline = time.time() + record_s
+        self.submissions: Dict[str, str] = {}
+        self.status = "recording"  # -> "scoring" -> "revealed"
+        self.results: Optional[Mapping[str, Dict[str, Any]]] = None
+        self.revealed = asyncio.Event()
+
+    @property
+    def missing(self) -> List[str]:
+        return [p for p in self.players if p not in self.submissions]
+
+    def submit(self, player: str, path: str) -> bool:
+        """
+        Record a player's answer. Returns True once everyone has submitted.
+        The first answer stands: it may already be on its way to analysis.
+        """
+        if self.status != "recording":
+            raise RuntimeError(f"Round {self.number} is already {self.status}")
+        if player in self.submissions:
+            raise ValueError(f"{player} already submitted {self.submissions[player]}")
+        self.submissions[player] = path
+        return not self.missing
+
+    def close(self) -> None:
+        """Stop accepting answers; scoring may start."""
+        self.status = "scoring"
+
+    def publish(self, results: Dict[str, Dict[str, Any]]) -> None:
+        # Single assignment of a read-only mapping: readers see all results or none
+        self.results = MappingProxyType(dict(results))
+        self.status = "revealed"
+        self.revealed.set()
+
+
+class Lobby:
+    """3-8 players playing rounds together."""
+
+    MAX_PLAYERS = 8
+
+    def __init__(self, lobby_id: Optional[str] = None):
+        self.lobby_id = lobby_id or secrets.token_hex(3)
+        self.players: Dict[str, str] = {}  # client_id -> display name
+        self.rounds: List[Round] = []
+
+    @property
+    def current(self) -> Optional[Round]:
+        return self.rounds[-1] if self.rounds else None
+
+    def join(self, client_id: str, name: str) -> None:
+        if client_id not in self.players and len(self.players) >= self.MAX_PLAYERS:
+            raise ValueError(f"Lobby {self.lobby_id} is full ({self.MAX_PLAYERS} players)")
+        self.players[client_id] = name
+
+    def start_round(self, prompt_id: str, record_s: float) -> Round:
+        if self.current and self.current.status != "revealed":
+            raise RuntimeError(f"Round {self.current.number} is still {self.current.status}")
+        rnd = Round(self.lobby_id, len(self.rounds) + 1, prompt_id, list(self.players), record_s)
+        self.rounds.append(rnd)
+        return rnd
+
+
+class RoundEngine:
+    """
+    Scores rounds. CPU-heavy analysis goes to a process pool so it never
+    runs on the MCP event loop; downloads and transcription stay async.
+    """
+
+    def __init__(self, fetch: Callable[[str], Awaitable[str]], release: Optional[Callable[[str], None]] = None,
+                 features: Optional[Callable[[str], Optional[Dict[str, float]]]] = None, transcriber=None,
+                 max_workers: Optional[int] = None, score_timeout_s: float = 20.0,
+                 text_scorer: Optional["TranscriptScorer"] = None, speaker_index: Optional["SpeakerIndex"] = None):
+        """
+        Args:
+            fetch (callable): async dataset path -> local file path
+            release (callable): Called with each fetched local path once its
+                analysis is over (e.g. to unpin it in a cache)
+            features (callable): dataset path -> acoustic features already
+                computed for it, or None (e.g. answers that were streamed)
+            transcriber (AudioTranscriber): Optional; adds a transcript per answer
+            max_workers (int): Process pool size (default: CPU count)
+            score_timeout_s (float): Scoring deadline per round; answers not
+                analysed by then are published as timed out
+            text_scorer (TranscriptScorer): Adds transcript cues to the reasons
+                (needs a transcriber)
+            speaker_index (SpeakerIndex): Checks each answer's voice against
+                the player's enrolled baseline clips
+        """
+        self._fetch = fetch
+        self._release = release
+        self._features = features
+        self.transcriber = transcriber
+        self.max_workers = max_workers or os.cpu_count() or 1
+        self.score_timeout_s = score_timeout_s
+        self.text_scorer = text_scorer
+        self.speaker_index = speaker_index
+        self._executor: Optional[ProcessPoolExecutor] = None
+
+    def _pool(self) -> ProcessPoolExecutor:
+        if self._executor is None:
+            # spawn: the server process has live threads, which fork doesn't mix well with
+            self._executor = ProcessPoolExecutor(self.max_workers, mp_context=multiprocessing.get_context("spawn"))
+        return self._executor
+
+    def shutdown(self) -> None:
+        if self._executor is not None:
+            self._executor.shutdown(cancel_futures=True)
+            self._executor = None
+
+    async def _analyse(self, path: str, profile: Optional[Dict[str, Any]]) -> Dict[str, Any]:
+        t0 = time.perf_counter()
+        local = await self._fetch(path)
+        fetched = time.perf_counter()
+        known = self._features(path) if self._features is not None else None
+        loop = asyncio.get_running_loop()
+        try:
+            scoring = loop.run_in_executor(self._pool(), analyse_submission, local, profile, known)
+            if self.transcriber is None:
+                result = await scoring
+            else:
+                (transcript,), result = await asyncio.gather(self.transcriber.transcribe_many([local]), scoring)
+                result["transcript"] = transcript["text"]
+                if transcript["error"]:
+                    result["transcript_error"] = transcript["error"]
+        finally:
+            if self._release is not None:
+                self._release(local)
+        # Analysis = acoustic scoring and transcription, which run side by side
+        result["timings_ms"] = {
+            "fetch": round(1000 * (fetched - t0), 1),
+            "analysis": round(1000 * (time.perf_counter() - fetched), 1),
+        }
+        return result
+
+    def _add_text_cues(self, rnd: Round, results: Dict[str, Dict[str, Any]]) -> None:
+        import transcript_features
+
+        # One batched pass over the round's transcripts
+        players = [p for p, r in results.items() if r.get("transcript")]
+        if not players:
+            return
+        matrix = self.text_scorer.score_batch(
+            [results[p]["transcript"] for p in players],
+            durations=[results[p]["features"]["duration_s"] for p in players],
+            prompt_ids=[rnd.prompt_id] * len(players),
+        )
+        for player, row, text in zip(players, matrix, transcript_features.as_dicts(matrix)):
+            result = results[player]
+            result["text_features"] = text
+            cues = [c for c in transcript_features.reasons(row) if c not in result["reasons"]]
+            if result["reasons"] == ["delivery consistent with baseline"] and cues:
+                result["reasons"] = []
+            result["reasons"] = (result["reasons"] + cues)[:3]
+
+    def _check_voices(self, rnd: Round, results: Dict[str, Dict[str, Any]]) -> None:
+        import numpy as np
+
+        embeddings = {p: r.pop("embedding", None) for p, r in results.items()}
+        if self.speaker_index is None:
+            return
+        claims = [(p, np.asarray(e, dtype=np.float32)) for p, e in embeddings.items() if e is not None]
+        for (player, _), check in zip(claims, self.speaker_index.verify(claims, candidates=rnd.players)):
+            result = results[player]
+            result["voice_check"] = check
+            if check["verified"] is False:
+                cue = "voice matches another player's baseline" if check["closest"] else "voice differs from the baseline recordings"
+                kept = [r for r in result["reasons"] if r != "delivery consistent with baseline"]
+                result["reasons"] = ([cue] + kept)[:3]
+
+    async def score(self, rnd: Round, profiles: Mapping[str, Optional[Dict[str, Any]]]) -> Mapping[str, Dict[str, Any]]:
+        """
+        Analyse every submission in parallel and publish all results at once.
+        Reveal time is bounded by the slowest player (or the deadline).
+        """
+        rnd.close()
+        tasks = {
+            player: asyncio.create_task(self._analyse(path, profiles.get(player)))
+            for player, path in rnd.submissions.items()
+        }
+        if tasks:
+            await asyncio.wait(tasks.values(), timeout=self.score_timeout_s)
+
+        results: Dict[str, Dict[str, Any]] = {}
+        # The round is closed already: whatever fails below, it must still be
+        # revealed, or the lobby could never start another round
+        try:
+            for player in rnd.players:
+                task = tasks.get(player)
+                if task is None:
+                    results[player] = {"bluff_score": None, "error": "no answer submitted"}
+                elif not task.done():
+                    task.cancel()
+                    results[player] = {"bluff_score": None, "error": f"analysis exceeded {self.score_timeout_s:.0f}s"}
+                elif task.exception() is not None:
+                    results[player] = {"bluff_score": None, "error": f"analysis failed: {task.exception()}"}
+                else:
+                    results[player] = task.result()
+            # Transcript cues and the voice check only add reasons: on failure the acoustic scores stand
+            if self.text_scorer is not None:
+                try:
+                    self._add_text_cues(rnd, results)
+                except Exception:
+                    log.exception("Transcript cues failed for round %d of lobby %s", rnd.number, rnd.lobby_id)
+            try:
+                # One batched lookup for the whole round; also strips the embeddings from the results
+                self._check_voices(rnd, results)
+            except Exception:
+                log.exception("Voice check failed for round %d of lobby %s", rnd.number, rnd.lobby_id)
+        finally:
+            for player in rnd.players:
+                results.setdefault(player, {"bluff_score": None, "error": "scoring failed"}).pop("embedding", None)
+            rnd.publish(results)
+        return rnd.results
@@ -0,0 +1,172 @@
+"""
+S3 storage for recorder uploads.
+One pooled boto3 client per process; the browser PUTs straight to S3 with
+presigned URLs (single PUT, or multipart for large clips). Keys are laid out
+by upload day so listing a day never walks the whole bucket.
+"""
+import os
+import re
+import threading
+import time
+from datetime import datetime, timezone
+from typing import Any, Dict, List, Optional, Tuple
+
+MB = 1024 * 1024
+# Above this size uploads go multipart; S3 requires parts of >= 5 MB except the last
+MULTIPART_THRESHOLD = 16 * MB
+PART_SIZE = 8 * MB
+
+_SAFE_NAME = re.compile(r"[^A-Za-z0-9._-]+")
+
+
+class RecordingStore:
+    """
+    Recordings bucket access for the MCP tools and the recorder page.
+
+    The boto3 client is created once, lazily (boto3 itself is only imported
+    then), and shared by all threads (boto3 clients are thread-safe); its
+    connection pool is sized for the server's concurrency. Presigned URLs
+    are cached per key and reused while more than half of their lifetime
+    is left.
+    """
+
+    def __init__(self, bucket: str, region: Optional[str] = None, endpoint_url: Optional[str] = None,
+                 prefix: str = "recordings/", max_pool_connections: int = 16, url_ttl_s: int = 900):
+        """
+        Args:
+            bucket (str): Bucket name
+            region (str): Bucket region
+            endpoint_url (str): Alternative S3 endpoint (MinIO, moto server, ...)
+            prefix (str): Key prefix for recordings; a YYYY/MM/DD/ level follows it
+            max_pool_connections (int): HTTP connection pool size of the client
+            url_ttl_s (int): Lifetime of presigned URLs
+        """
+        self.bucket = bucket
+        self.region = region
+        self.endpoint_url = endpoint_url or None
+        self.prefix = prefix
+        self.url_ttl_s = url_ttl_s
+        self.max_pool_connections = max_pool_connections
+        self._client = None
+        self._client_lock = threading.Lock()
+        self._urls: Dict[Tuple[str, str], Tuple[float, str]] = {}
+        self._urls_lock = threading.Lock()
+
+    @property
+    def client(self):
+        if self._client is None:
+            with self._client_lock:
+                if self._client is None:
+                    import boto3
+                    from botocore.config import Config
+
+                    config = Config(
+                        region_name=self.region,
+                        signature_version="s3v4",
+                        max_pool_connections=self.max_pool_connections,
+                        retries={"max_attempts": 3, "mode": "standard"},
+                        connect_timeout=5,
+                        read_timeout=30,
+                        tcp_keepalive=True,
+                    )
+                    self._client = boto3.session.Session().client("s3", endpoint_url=self.endpoint_url, config=config)
+        return self._client
+
+    def key_for(self, filename: str, when: Optional[float] = None) -> str:
+        """'recordings/2025/09/14/<filename>' with the name reduced to safe characters."""
+        name = _SAFE_NAME.sub("_", os.path.basename(filename)).strip("._") or "recording.wav"
+        day = datetime.fromtimestamp(when if when is not None else time.time(), timezone.utc)
+        return f"{self.prefix}{day:%Y/%m/%d}/{name}"
+
+    def day_prefix(self, day: Optional[str] = None) -> str:
+        """Key prefix for one upload day ('YYYY-MM-DD', default today, UTC)."""
+        if day:
+            parsed = datetime.strptime(day, "%Y-%m-%d")
+        else:
+            parsed = datetime.now(timezone.utc)
+        return f"{self.prefix}{parsed:%Y/%m/%d}/"
+
+    def check(self) -> Dict[str, Any]:
+        self.client.head_bucket(Bucket=self.bucket)
+        return {"ok": True, "bucket": self.bucket, "region": self.region, "endpoint": self.endpoint_url}
+
+    def _presign(self, method: str, params: Dict[str, Any], cache_key: Optional[Tuple[str, str]] = None) -> str:
+        now = time.time()
+        if cache_key is not None:
+            with self._urls_lock:
+                hit = self._urls.get(cache_key)
+                if hit and hit[0] - now > self.url_ttl_s / 2:
+                    return hit[1]
+        url = self.client.generate_presigned_url(method, Params=params, ExpiresIn=self.url_ttl_s)
+        if cache_key is not None:
+            with self._urls_lock:
+                # Expired entries are dropped whenever we write
+                self._urls = {k: v for k, v in self._urls.items() if v[0] > now}
+                self._urls[cache_key] = (now + self.url_ttl_s, url)
+        return url
+
+    def presign_put(self, filename: str, content_type: str = "audio/wav") -> Dict[str, Any]:
+        """Presigned single-PUT upload for one recording."""
+        key = self.key_for(filename)
+        url = self._presign(
+            "put_object",
+            {"Bucket": self.bucket, "Key": key, "ContentType": content_type},
+            cache_key=(key, content_type),
+        )
+        return {"upload_url": url, "s3_key": key, "expires_in": self.url_ttl_s}
+
+    def presign_multipart(self, filename: str, size_bytes: int, content_type: str = "audio/wav") -> Dict[str, Any]:
+        """
+        Start a multipart upload and presign one URL per part. The client
+        PUTs each PART_SIZE slice to its URL, then calls complete_multipart
+        with the returned ETags.
+        """
+        key = self.key_for(filename)
+        upload_id = self.client.create_multipart_upload(Bucket=self.bucket, Key=key, ContentType=content_type)["UploadId"]
+        n_parts = max(1, -(-size_bytes // PART_SIZE))
+        urls = [
+            self._presign("upload_part", {"Bucket": self.bucket, "Key": key, "UploadId": upload_id, "PartNumber": n})
+            for n in range(1, n_parts + 1)
+        ]
+        return {"s3_key": key, "upload_id": upload_id, "part_size": PART_SIZE, "part_urls": urls, "expires_in": self.url_ttl_s}
+
+    def complete_multipart(self, key: str, upload_id: str, etags: List[str]) -> Dict[str, Any]:
+        parts = [{"ETag": etag, "PartNumber": n} for n, etag in enumerate(etags, start=1)]
+        self.client.complete_multipart_upload(
+            Bucket=self.bucket, Key=key, UploadId=upload_id, MultipartUpload={"Parts": parts}
+        )
+        return {"ok": True, "s3_key": key, "parts": len(parts)}
+
+    def upload_file(self, path: str, filename: Optional[str] = None) -> str:
+        """Server-side upload of a local file; large files go multipart in parallel."""
+        from boto3.s3.transfer import TransferConfig
+
+        key = self.key_for(filename or path)
+        transfer = TransferConfig(multipart_threshold=MULTIPART_THRESHOLD, multipart_chunksize=PART_SIZE, max_concurrency=4)
+        self.client.upload_file(path, self.bucket, key, ExtraArgs={"ContentType": "audio/wav"}, Config=transfer)
+        return key
+
+    def download(self, key: str, out) -> None:
+        """Stream one recording into the binary file object `out`."""
+        self.client.download_fileobj(self.bucket, key, out)
+
+    def list_recordings(self, day: Optional[str] = None, limit: int = 50,
+                        page_token: Optional[str] = None) -> Dict[str, Any]:
+        """
+        One page of recordings uploaded on `day`.
+
+        Returns:
+            dict: {"prefix", "recordings": [{key, size, last_modified}], "next_page_token"}
+        """
+        params = {"Bucket": self.bucket, "Prefix": self.day_prefix(day), "MaxKeys": max(1, min(limit, 1000))}
+        if page_token:
+            params["ContinuationToken"] = page_token
+        resp = self.client.list_objects_v2(**params)
+        return {
+            "prefix": params["Prefix"],
+            "recordings": [
+                {"key": o["Key"], "size": o["Size"], "last_modified": o["LastModified"].isoformat()}
+                for o in resp.get("Contents", [])
+            ],
+            "next_page_token": resp.get("NextContinuationToken"),
+        }
@@ -0,0 +1,317 @@
+"""
+Session storage backends.
+The MCP server keeps one session per client id; these backends let several
+worker processes share that state and keep it across restarts.
+"""
+import json
+import sqlite3
+import threading
+import time
+from collections.abc import MutableSet
+from typing import Any, Callable, Dict, Iterator, Optional, Set
+
+# Session shape (see mainmcp1.py): plain JSON-able fields plus
+# "used_paths", a set of dataset paths the session already consumed.
+Session = Dict[str, Any]
+
+
+class SessionStore:
+    """
+    Backend interface. `update` is the only way to read-modify-write a
+    session: it runs `fn` atomically with respect to every other caller,
+    in this process or another one.
+    """
+
+    def get(self, client_id: str) -> Optional[Session]:
+        raise NotImplementedError
+
+    def put(self, client_id: str, session: Session) -> None:
+        raise NotImplementedError
+
+    def update(self, client_id: str, fn: Callable[[Optional[Session]], Any]) -> Any:
+        """
+        Atomically apply `fn` to the stored session and save the result.
+
+        Args:
+            client_id (str): Session key
+            fn (callable): Receives the session (or None if there is none)
+                and mutates it in place; its return value is passed through
+
+        Returns:
+            Whatever `fn` returned
+        """
+        raise NotImplementedError
+
+    def client_for_token(self, token: str) -> Optional[str]:
+        """
+        Find the live session an upload token was issued to.
+
+        Args:
+            token (str): Upload token, as tagged into recording names
+
+        Returns:
+            The session's client id, or None if no live session holds it
+        """
+        raise NotImplementedError
+
+    def evict_expired(self) -> int:
+        """Drop sessions idle for longer than the TTL. Returns how many."""
+        raise NotImplementedError
+
+
+class MemorySessionStore(SessionStore):
+    """Single-process store; what SESSIONS used to be, plus a lock and TTL."""
+
+    def __init__(self, ttl_s: float = 6 * 3600):
+        self.ttl_s = ttl_s
+        self._lock = threading.Lock()
+        self._data: Dict[str, Session] = {}
+        self._touched: Dict[str, float] = {}
+
+    def get(self, client_id: str) -> Optional[Session]:
+        with self._lock:
+            sess = self._data.get(client_id)
+            if sess is None or self._expired(client_id):
+                return None
+            return _copy(sess)
+
+    def put(self, client_id: str, session: Session) -> None:
+        with self._lock:
+            self._data[client_id] = _copy(session)
+            self._touched[client_id] = time.time()
+
+    def update(self, client_id: str, fn: Callable[[Optional[Session]], Any]) -> Any:
+        with self._lock:
+            stored = self._data.get(client_id)
+            sess = None if stored is None or self._expired(client_id) else _copy(stored)
+            result = fn(sess)
+            if sess is not None:
+                self._data[client_id] = sess
+                self._touched[client_id] = time.time()
+            return result
+
+    def client_for_token(self, token: str) -> Optional[str]:
+        with self._lock:
+            return next((cid for cid, sess in self._data.items()
+                         if sess.get("upload_token") == token and not self._expired(cid)), None)
+
+    def evict_expired(self) -> int:
+        with self._lock:
+            stale = [cid for cid in self._data if self._expired(cid)]
+            for cid in stale:
+                del self._data[cid]
+                del self._touched[cid]
+            return len(stale)
+
+    def _expired(self, client_id: str) -> bool:
+        return time.time() - self._touched.get(client_id, 0) > self.ttl_s
+
+
+class _UsedPaths(MutableSet):
+    """
+    used_paths of a session loaded from SQLite. Membership is a primary-key
+    lookup on the used_paths table; adds and discards are buffered until the
+    session is saved. Only iterating (display, copies) reads every row.
+    """
+
+    def __init__(self, store: "SQLiteSessionStore", client_id: str):
+        self._store = store
+        self.client_id = client_id
+        self.added: Set[str] = set()
+        self.removed: Set[str] = set()
+
+    def __contains__(self, path: object) -> bool:
+        if path in self.added:
+            return True
+        if path in self.removed:
+            return False
+        row = self._store._conn().execute(
+            "SELECT 1 FROM used_paths WHERE client_id = ? AND path = ?", (self.client_id, path)
+        ).fetchone()
+        return row is not None
+
+    def __iter__(self) -> Iterator[str]:
+        rows = self._store._conn().execute("SELECT path FROM used_paths WHERE client_id = ?", (self.client_id,))
+        return iter(({p for (p,) in rows} - self.removed) | self.added)
+
+    def __len__(self) -> int:
+        return sum(1 for _ in self)
+
+    def add(self, path: str) -> None:
+        self.removed.discard(path)
+        self.added.add(path)
+
+    def discard(self, path: str) -> None:
+        self.added.discard(path)
+        self.removed.add(path)
+
+    def __repr__(self) -> str:
+        return repr(set(self))
+
+
+class SQLiteSessionStore(SessionStore):
+    """
+    SQLite (WAL mode) store that several worker processes can share.
+
+    Sessions are one JSON row each. `used_paths` is kept out of the JSON in a
+    (client_id, path) WITHOUT ROWID table and loaded as a _UsedPaths view, so
+    a claim is one small insert instead of rewriting the whole set, and
+    `path in sess["used_paths"]` is an index lookup.
+    `update` runs inside BEGIN IMMEDIATE, which takes the write lock up
+    front: two concurrent claims for the same client are serialized and the
+    second one sees the first one's used_paths.
+
+    Calls block on SQLite (up to busy_timeout_s on another worker's write
+    lock), so async callers run them in a thread.
+    """
+
+    SCHEMA = """
+    CREATE TABLE IF NOT EXISTS sessions (
+        client_id  TEXT PRIMARY KEY,
+        data       TEXT NOT NULL,
+        updated_at REAL NOT NULL
+    );
+    CREATE INDEX IF NOT EXISTS sessions_updated_at ON sessions(updated_at);
+    CREATE INDEX IF NOT EXISTS sessions_upload_token ON sessions(json_extract(data, '$.upload_token'));
+    CREATE TABLE IF NOT EXISTS used_paths (
+        client_id TEXT NOT NULL,
+        path      TEXT NOT NULL,
+        PRIMARY KEY (client_id, path)
+    ) WITHOUT ROWID;
+    """
+
+    def __init__(self, path: str, ttl_s: float = 6 * 3600, evict_every_s: float = 60.0, busy_timeout_s: float = 5.0):
+        """
+        Args:
+            path (str): Database file, shared by all workers
+            ttl_s (float): Idle time after which a session is dropped
+            evict_every_s (float): How often writes also sweep expired sessions
+            busy_timeout_s (float): How long to wait on another worker's write lock
+        """
+        self.path = path
+        self.ttl_s = ttl_s
+        self.evict_every_s = evict_every_s
+        self.busy_timeout_s = busy_timeout_s
+        self._local = threading.local()
+        self._last_evict = 0.0
+        conn = self._conn()
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.executescript(self.SCHEMA)
+
+    def _conn(self) -> sqlite3.Connection:
+        # sqlite3 connections are per thread; tools may run on pool threads
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=self.busy_timeout_s, isolation_level=None)
+            conn.execute("PRAGMA synchronous=NORMAL")
+            self._local.conn = conn
+        return conn
+
+    def _load(self, conn: sqlite3.Connection, client_id: str) -> Optional[Session]:
+        row = conn.execute(
+            "SELECT data FROM sessions WHERE client_id = ? AND updated_at >= ?",
+            (client_id, time.time() - self.ttl_s),
+        ).fetchone()
+        if row is None:
+            return None
+        sess = json.loads(row[0])
+        if "used_paths" in sess:
+            sess["used_paths"] = _UsedPaths(self, client_id)
+        return sess
+
+    def _save(self, conn: sqlite3.Connection, client_id: str, sess: Session) -> None:
+        data = {k: v for k, v in sess.items() if k != "used_paths"}
+        used = sess.get("used_paths")
+        if used is not None:
+            # Marker so _load knows to restore the set, even when it is empty
+            data["used_paths"] = None
+        conn.execute(
+            "INSERT OR REPLACE INTO sessions (client_id, data, updated_at) VALUES (?, ?, ?)",
+            (client_id, json.dumps(data, separators=(",", ":")), time.time()),
+        )
+        if isinstance(used, _UsedPaths) and used.client_id == client_id:
+            added, removed = used.added, used.removed
+        else:
+            # A plain set (new or replaced session) replaces the stored paths
+            added, removed = set(used or ()), set()
+            conn.execute("DELETE FROM used_paths WHERE client_id = ?", (client_id,))
+        if added:
+            conn.executemany("INSERT OR IGNORE INTO used_paths VALUES (?, ?)", [(client_id, p) for p in added])
+        if removed:
+            conn.executemany("DELETE FROM used_paths WHERE client_id = ? AND path = ?", [(client_id, p) for p in removed])
+        if isinstance(used, _UsedPaths):
+            used.added, used.removed = set(), set()
+
+    def get(self, client_id: str) -> Optional[Session]:
+        return self._load(self._conn(), client_id)
+
+    def put(self, client_id: str, session: Session) -> None:
+        if "used_paths" in session:
+            # Read a view's rows before they are replaced
+            session = {**session, "used_paths": set(session["used_paths"])}
+        conn = self._conn()
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            self._save(conn, client_id, session)
+            conn.execute("COMMIT")
+        except BaseException:
+            conn.execute("ROLLBACK")
+            raise
+        self._maybe_evict()
+
+    def update(self, client_id: str, fn: Callable[[Optional[Session]], Any]) -> Any:
+        conn = self._conn()
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            sess = self._load(conn, client_id)
+            result = fn(sess)
+            if sess is not None:
+                self._save(conn, client_id, sess)
+            conn.execute("COMMIT")
+        except BaseException:
+            conn.execute("ROLLBACK")
+            raise
+        self._maybe_evict()
+        return result
+
+    def client_for_token(self, token: str) -> Optional[str]:
+        row = self._conn().execute(
+            "SELECT client_id FROM sessions WHERE json_extract(data, '$.upload_token') = ? AND updated_at >= ?",
+            (token, time.time() - self.ttl_s),
+        ).fetchone()
+        return None if row is None else row[0]
+
+    def evict_expired(self) -> int:
+        conn = self._conn()
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            cutoff = time.time() - self.ttl_s
+            n = conn.execute("DELETE FROM sessions WHERE updated_at < ?", (cutoff,)).rowcount
+            conn.execute("DELETE FROM used_paths WHERE client_id NOT IN (SELECT client_id FROM sessions)")
+            conn.execute("COMMIT")
+        except BaseException:
+            conn.execute("ROLLBACK")
+            raise
+        self._last_evict = time.time()
+        return n
+
+    def _maybe_evict(self) -> None:
+        if time.time() - self._last_evict > self.evict_every_s:
+            self.evict_expired()
+
+
+def open_session_store(location: str, ttl_s: float = 6 * 3600) -> SessionStore:
+    """
+    Build the store for a SESSION_DB setting: ":memory:" keeps sessions in
+    this process only, anything else is a SQLite file path.
+    """
+    if location == ":memory:":
+        return MemorySessionStore(ttl_s=ttl_s)
+    return SQLiteSessionStore(location, ttl_s=ttl_s)
+
+
+def _copy(sess: Session) -> Session:
+    out = json.loads(json.dumps({k: v for k, v in sess.items() if k != "used_paths"}))
+    if "used_paths" in sess:
+        out["used_paths"] = set(sess["used_paths"])
+    return out
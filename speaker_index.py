@@ -0,0 +1,266 @@
+"""
+Speaker index: checks that a round answer was recorded by the same voice as
+the player's baseline.
+One embedding per baseline clip (voice_features.speaker_embeddings) is kept
+in a single contiguous float32 matrix, optionally backed by a memory-mapped
+.npy file so it survives restarts. A whole round is verified with one matrix
+product, in process, with no network hop on the scoring path.
+"""
+import json
+import os
+import threading
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+# Below this many enrolled voices there is no population to center on, and
+# plain cosine similarity between speech clips is high for everyone
+MIN_SPEAKERS_TO_VERIFY = 3
+VERIFY_THRESHOLD = 0.5  # centered cosine to one's own baseline needed to pass
+CONFUSION_MARGIN = 0.05  # another voice must beat one's own by this much to be reported
+
+
+class SpeakerIndex:
+    """
+    Backend interface. Speakers are enrolled with a few embeddings each;
+    scores are the mean cosine similarity of a query to a speaker's
+    embeddings, after centering on the mean of everything enrolled.
+    search() and verify() are built on scores(), so a backend (e.g. a
+    Qdrant collection) only has to implement the storage methods.
+    """
+
+    def replace(self, speaker: str, embeddings: np.ndarray, clip_ids: Optional[Sequence[str]] = None) -> None:
+        """Enrol `speaker` with these embeddings, dropping any earlier ones."""
+        raise NotImplementedError
+
+    def remove(self, speaker: str) -> bool:
+        raise NotImplementedError
+
+    def speakers(self) -> List[str]:
+        raise NotImplementedError
+
+    def scores(self, queries: np.ndarray, speakers: Sequence[str]) -> np.ndarray:
+        """
+        Returns:
+            np.ndarray: (len(queries), len(speakers)) centered mean cosine similarities
+        """
+        raise NotImplementedError
+
+    def flush(self) -> None:
+        """Persist pending changes (no-op for in-memory backends)."""
+
+    def __contains__(self, speaker: str) -> bool:
+        return speaker in self.speakers()
+
+    def search(self, queries: np.ndarray, k: int = 1) -> List[List[Tuple[str, float]]]:
+        """Nearest enrolled speakers per query, best first."""
+        names = self.speakers()
+        if not names:
+            return [[] for _ in range(len(queries))]
+        sims = self.scores(queries, names)
+        k = min(k, len(names))
+        top = np.argpartition(-sims, k - 1, axis=1)[:, :k]
+        out = []
+        for row, cols in zip(sims, top):
+            cols = cols[np.argsort(-row[cols])]
+            out.append([(names[c], float(row[c])) for c in cols])
+        return out
+
+    def verify(self, claims: Sequence[Tuple[str, Optional[np.ndarray]]],
+               candidates: Optional[Sequence[str]] = None) -> List[Dict[str, Any]]:
+        """
+        Check answers against their claimed speakers' baselines, all in one batch.
+
+        Args:
+            claims (list): (speaker, embedding) per answer; None = no embedding
+            candidates (list): Other voices an answer may be mistaken for,
+                e.g. the round's players (default: every enrolled speaker)
+
+        Returns:
+            list: Per claim {"verified": bool | None, "similarity", "closest",
+                "closest_similarity"}; verified is None when the speaker has
+                no baseline or too few voices are enrolled to judge
+        """
+        enrolled = set(self.speakers())
+        names = [s for s in dict.fromkeys(list(candidates or enrolled) + [s for s, _ in claims]) if s in enrolled]
+        usable = [i for i, (s, e) in enumerate(claims) if s in enrolled and e is not None and np.any(e)]
+        out: List[Dict[str, Any]] = [
+            {"verified": None, "similarity": None, "closest": None, "closest_similarity": None} for _ in claims
+        ]
+        if not usable or len(enrolled) < MIN_SPEAKERS_TO_VERIFY:
+            return out
+        sims = self.scores(np.stack([claims[i][1] for i in usable]), names)
+        col = {s: j for j, s in enumerate(names)}
+        for row, i in zip(sims, usable):
+            speaker = claims[i][0]
+            own = float(row[col[speaker]])
+            others = [(float(row[j]), names[j]) for j in range(len(names)) if names[j] != speaker]
+            best, closest = max(others) if others else (None, None)
+            out[i] = {
+                "verified": own >= VERIFY_THRESHOLD and (best is None or best < own + CONFUSION_MARGIN),
+                "similarity": round(own, 3),
+                "closest": closest if best is not None and best >= own + CONFUSION_MARGIN else None,
+                "closest_similarity": round(best, 3) if best is not None else None,
+            }
+        return out
+
+
+class LocalSpeakerIndex(SpeakerIndex):
+    """
+    NumPy backend. Rows are kept grouped per speaker, so per-speaker means
+    are a single np.add.reduceat over the similarity matrix. With a path,
+    the matrix is an .npy memory map and speaker spans go to a JSON sidecar,
+    both written on flush().
+    """
+
+    def __init__(self, path: Optional[str] = None, dim: Optional[int] = None, capacity: int = 256):
+        """
+        Args:
+            path (str): .npy file for the matrix (None = in memory only)
+            dim (int): Embedding size (default voice_features.EMBED_DIM)
+            capacity (int): Initial rows; the matrix doubles when full
+        """
+        if dim is None:
+            import voice_features
+
+            dim = voice_features.EMBED_DIM
+        self.path = path
+        self.dim = dim
+        self._lock = threading.RLock()
+        self._spans: Dict[str, Tuple[int, int]] = {}  # speaker -> [start, stop) rows, in row order
+        self._clips: List[str] = []
+        self._count = 0
+        self._normed: Optional[np.ndarray] = None  # centered, L2-normalized copy of the used rows
+        self._center: Optional[np.ndarray] = None
+        if path and os.path.exists(path) and os.path.exists(self._meta_path):
+            self._matrix = np.lib.format.open_memmap(path, mode="r+")
+            with open(self._meta_path) as f:
+                meta = json.load(f)
+            self._count = meta["count"]
+            self._spans = {s: tuple(span) for s, span in meta["spans"]}
+            self._clips = meta["clips"]
+            if self._matrix.shape[1] != dim:
+                raise ValueError(f"{path} holds {self._matrix.shape[1]}-dim embeddings, expected {dim}")
+        else:
+            self._matrix = self._allocate(capacity)
+
+    @property
+    def _meta_path(self) -> str:
+        return f"{self.path}.json"
+
+    def _allocate(self, capacity: int) -> np.ndarray:
+        if not self.path:
+            matrix = np.zeros((capacity, self.dim), dtype=np.float32)
+            matrix[: self._count] = self._matrix[: self._count] if self._count else 0
+            return matrix
+        os.makedirs(os.path.dirname(os.path.abspath(self.path)), exist_ok=True)
+        tmp = f"{self.path}.tmp.npy"
+        matrix = np.lib.format.open_memmap(tmp, mode="w+", dtype=np.float32, shape=(capacity, self.dim))
+        matrix[: self._count] = self._matrix[: self._count] if self._count else 0
+        matrix.flush()
+        del matrix
+        os.replace(tmp, self.path)
+        return np.lib.format.open_memmap(self.path, mode="r+")
+
+    def __len__(self) -> int:
+        return self._count
+
+    def speakers(self) -> List[str]:
+        with self._lock:
+            return list(self._spans)
+
+    def remove(self, speaker: str) -> bool:
+        with self._lock:
+            span = self._spans.pop(speaker, None)
+            if span is None:
+                return False
+            start, stop = span
+            n = stop - start
+            # Shift later rows down so every speaker's rows stay contiguous
+            self._matrix[start : self._count - n] = self._matrix[stop : self._count]
+            del self._clips[start:stop]
+            self._count -= n
+            self._spans = {s: (a - n, b - n) if a >= stop else (a, b) for s, (a, b) in self._spans.items()}
+            self._normed = None
+            return True
+
+    def replace(self, speaker: str, embeddings: np.ndarray, clip_ids: Optional[Sequence[str]] = None) -> None:
+        embeddings = np.atleast_2d(np.asarray(embeddings, dtype=np.float32))
+        if embeddings.shape[1] != self.dim:
+            raise ValueError(f"Expected {self.dim}-dim embeddings, got {embeddings.shape[1]}")
+        if clip_ids is not None and len(clip_ids) != len(embeddings):
+            raise ValueError(f"Got {len(clip_ids)} clip ids for {len(embeddings)} embeddings")
+        voiced = np.any(embeddings, axis=1)  # clips without speech carry no voice
+        embeddings = embeddings[voiced]
+        clip_ids = [c for c, keep in zip(clip_ids, voiced) if keep] if clip_ids is not None else None
+        with self._lock:
+            self.remove(speaker)
+            if not len(embeddings):
+                return
+            needed = self._count + len(embeddings)
+            if needed > len(self._matrix):
+                capacity = len(self._matrix)
+                while capacity < needed:
+                    capacity *= 2
+                self._matrix = self._allocate(capacity)
+            self._matrix[self._count : needed] = embeddings
+            self._spans[speaker] = (self._count, needed)
+            self._clips.extend(clip_ids or [""] * len(embeddings))
+            self._count = needed
+            self._normed = None
+
+    def _prepared(self) -> Tuple[np.ndarray, np.ndarray]:
+        # Recomputed only after the index changed: O(rows * dim)
+        if self._normed is None:
+            used = np.asarray(self._matrix[: self._count])
+            self._center = used.mean(axis=0) if self._count else np.zeros(self.dim, dtype=np.float32)
+            self._normed = _normalize(used - self._center)
+        return self._normed, self._center
+
+    def scores(self, queries: np.ndarray, speakers: Sequence[str]) -> np.ndarray:
+        queries = np.atleast_2d(np.asarray(queries, dtype=np.float32))
+        with self._lock:
+            normed, center = self._prepared()
+            spans = [self._spans[s] for s in speakers]
+        if not spans:
+            return np.zeros((len(queries), 0), dtype=np.float32)
+        sims = _normalize(queries - center) @ normed.T
+        # Per-speaker means over each speaker's contiguous block of columns
+        starts = np.array([a for a, _ in spans])
+        order = np.argsort(starts)
+        cols = np.concatenate([np.arange(a, b) for a, b in (spans[i] for i in order)])
+        bounds = np.concatenate([[0], np.cumsum([spans[i][1] - spans[i][0] for i in order])[:-1]])
+        sums = np.add.reduceat(sims[:, cols], bounds, axis=1)
+        means = sums / np.array([spans[i][1] - spans[i][0] for i in order], dtype=np.float32)
+        out = np.empty_like(means)
+        out[:, order] = means
+        return out
+
+    def flush(self) -> None:
+        if not self.path:
+            return
+        with self._lock:
+            self._matrix.flush()
+            meta = {"count": self._count, "spans": [[s, list(span)] for s, span in self._spans.items()], "clips": self._clips}
+            tmp = f"{self._meta_path}.tmp"
+            with open(tmp, "w") as f:
+                json.dump(meta, f)
+            os.replace(tmp, self._meta_path)
+
+
+def _normalize(x: np.ndarray) -> np.ndarray:
+    norm = np.linalg.norm(x, axis=-1, keepdims=True)
+    return (x / np.maximum(norm, 1e-12)).astype(np.float32)
+
+
+def open_speaker_index(location: str) -> SpeakerIndex:
+    """
+    Build the index for a SPEAKER_INDEX setting: ":memory:" keeps it in this
+    process only, "qdrant://..." is reserved for a Qdrant backend, anything
+    else is the .npy path of a local memory-mapped index.
+    """
+    if location == ":memory:":
+        return LocalSpeakerIndex()
+    if location.startswith("qdrant://"):
+        raise ValueError("No Qdrant backend is installed yet; implement SpeakerIndex for it and return it here")
+    return LocalSpeakerIndex(location)
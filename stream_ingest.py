@@ -0,0 +1,259 @@
+"""
+Streaming audio ingest.
+The recorder page sends 16-bit PCM chunks while the player is still talking.
+Each chunk is appended to a WAV on disk and run through voice activity
+detection right away; closing the stream only patches the WAV header and
+runs the feature pass over audio that is already decoded in memory.
+A take streamed under its tagged dataset name ('<epoch>_cm-<token>_*.wav')
+keeps its features and the SHA-256 of its WAV for a while after it closes.
+Streams are not authenticated, so the features are only handed out against
+the hash of the file that was actually published under that name: a stream
+whose bytes differ from the published recording is never trusted. The WAV
+itself is deleted on close; nothing is left behind in the stream directory.
+"""
+import hashlib
+import os
+import re
+import secrets
+import struct
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Dict, List, Optional, Tuple
+
+import numpy as np
+
+import audio_prep
+import voice_features
+from dataset_listing import upload_token
+
+# VAD on 20 ms frames, same thresholds as audio_prep.silent_frames
+FRAME_S = audio_prep.FRAME_S
+MARGIN_DB = 12.0
+FLOOR_DB = -60.0
+NOISE_RISE_DB = 0.05  # how fast the noise floor estimate may creep up per frame
+
+_SAFE_NAME = re.compile(r"[^A-Za-z0-9._-]+")
+
+
+def _wav_header(sample_rate: int, channels: int, data_bytes: int) -> bytes:
+    return struct.pack(
+        "<4sI4s4sIHHIIHH4sI",
+        b"RIFF", 36 + data_bytes, b"WAVE",
+        b"fmt ", 16, 1, channels, sample_rate, sample_rate * channels * 2, channels * 2, 16,
+        b"data", data_bytes,
+    )
+
+
+class StreamingRecording:
+    """One in-progress recording: incremental WAV writer plus live VAD."""
+
+    def __init__(self, path: str, sample_rate: int, channels: int = 1, max_seconds: float = 120.0,
+                 name: Optional[str] = None):
+        """
+        Args:
+            path (str): Where the WAV is written
+            sample_rate (int): Rate of the incoming PCM
+            channels (int): Interleaved channels in the incoming PCM
+            max_seconds (float): Chunks beyond this length are rejected
+            name (str): Dataset file name the take will be published under
+                (default: the WAV's own name)
+        """
+        if not 8000 <= sample_rate <= 192000 or channels not in (1, 2):
+            raise ValueError(f"Unsupported stream format: {sample_rate} Hz, {channels} channels")
+        self.path = path
+        self.name = name or os.path.basename(path)
+        self.sample_rate = sample_rate
+        self.channels = channels
+        self.max_samples = int(max_seconds * sample_rate)
+        self.samples = 0
+        self.started = self.touched = time.time()
+        self._file = open(path, "wb")
+        self._file.write(_wav_header(sample_rate, channels, 0))
+        self._odd = b""  # partial sample frame left over from the last chunk
+        self._chunks: List[np.ndarray] = []
+        self._hop = max(1, int(sample_rate * FRAME_S))
+        self._tail = np.zeros(0, dtype=np.float32)  # samples not yet in a full VAD frame
+        self._noise_db: Optional[float] = None
+        self.speech_frames = 0
+        self.trailing_silence_frames = 0
+        self.closed = False
+        # A chunk request may still be writing when the close request arrives
+        self._lock = threading.Lock()
+
+    def append(self, pcm: bytes) -> Dict[str, Any]:
+        """Write a chunk of little-endian int16 PCM and update the live VAD state."""
+        with self._lock:
+            if self.closed:
+                raise KeyError("Stream is closed")
+            data = self._odd + pcm
+            usable = len(data) - len(data) % (2 * self.channels)
+            data, self._odd = data[:usable], data[usable:]
+            if self.samples + usable // (2 * self.channels) > self.max_samples:
+                raise ValueError(f"Recording exceeds {self.max_samples / self.sample_rate:.0f}s")
+            self._file.write(data)
+            self.touched = time.time()
+
+            frames = np.frombuffer(data, dtype="<i2").reshape(-1, self.channels)
+            mono = frames.mean(axis=1, dtype=np.float32) / 32768.0
+            self.samples += len(mono)
+            self._chunks.append(mono)
+            self._vad(mono)
+            return self.status()
+
+    def _vad(self, mono: np.ndarray) -> None:
+        x = np.concatenate((self._tail, mono))
+        n = len(x) // self._hop
+        self._tail = x[n * self._hop :]
+        for db in audio_prep.frame_energy_db(x[: n * self._hop], self.sample_rate):
+            db = float(db)
+            # Noise floor: follows quiet frames down at once, creeps up slowly
+            self._noise_db = db if self._noise_db is None else min(db, self._noise_db + NOISE_RISE_DB)
+            if db > self._noise_db + MARGIN_DB and db > FLOOR_DB:
+                self.speech_frames += 1
+                self.trailing_silence_frames = 0
+            else:
+                self.trailing_silence_frames += 1
+
+    def status(self) -> Dict[str, Any]:
+        return {
+            "seconds": round(self.samples / self.sample_rate, 3),
+            "speech_s": round(self.speech_frames * FRAME_S, 3),
+            "speaking": self.speech_frames > 0 and self.trailing_silence_frames == 0,
+            "trailing_silence_s": round(self.trailing_silence_frames * FRAME_S, 3),
+        }
+
+    def finalize(self) -> None:
+        """Patch the real sizes into the WAV header and close the file."""
+        with self._lock:
+            self._finalize()
+
+    def _finalize(self) -> None:
+        if not self.closed:
+            self.closed = True
+            data_bytes = self.samples * 2 * self.channels
+            self._file.seek(0)
+            self._file.write(_wav_header(self.sample_rate, self.channels, data_bytes))
+            self._file.close()
+            self._tail = np.zeros(0, dtype=np.float32)
+
+    def close(self) -> Dict[str, Any]:
+        """Finalize the WAV and compute the clip's acoustic features."""
+        with self._lock:
+            self._finalize()
+            chunks, self._chunks = self._chunks, []  # the decoded audio is not needed past this point
+        mono = np.concatenate(chunks) if chunks else np.zeros(0, dtype=np.float32)
+        signal = audio_prep.resample(mono, self.sample_rate, voice_features.RATE, taps=31)
+        features = voice_features.as_dicts(voice_features.extract_signals([signal]))[0]
+        return {"name": self.name, **self.status(), "features": features}
+
+
+class StreamIngest:
+    """
+    Open streams by id, with a cap on concurrent streams and idle expiry,
+    plus the features of recently finished takes by dataset name.
+    """
+
+    def __init__(self, directory: str, max_streams: int = 64, idle_timeout_s: float = 60.0,
+                 features_ttl_s: float = 3600.0):
+        """
+        Args:
+            directory (str): Where in-progress WAVs are written
+            max_streams (int): Concurrent streams allowed
+            idle_timeout_s (float): Streams without a chunk for this long are dropped
+            features_ttl_s (float): How long finished takes' features are kept
+        """
+        self.directory = directory
+        self.max_streams = max_streams
+        self.idle_timeout_s = idle_timeout_s
+        self.features_ttl_s = features_ttl_s
+        self._streams: Dict[str, StreamingRecording] = {}
+        # dataset name -> (finished at, SHA-256 of the WAV, features), oldest first
+        self._finished: "OrderedDict[str, Tuple[float, str, Dict[str, float]]]" = OrderedDict()
+        self._lock = threading.Lock()
+        os.makedirs(directory, exist_ok=True)
+
+    def __len__(self) -> int:
+        return len(self._streams)
+
+    def start(self, filename: str, sample_rate: int, channels: int = 1) -> str:
+        self.reap()
+        name = _SAFE_NAME.sub("_", os.path.basename(filename)).strip("._") or "recording.wav"
+        stream_id = secrets.token_hex(8)
+        with self._lock:
+            if len(self._streams) >= self.max_streams:
+                raise RuntimeError("Too many recordings in progress, try again shortly")
+            path = os.path.join(self.directory, f"{stream_id}_{name}")
+            self._streams[stream_id] = StreamingRecording(path, sample_rate, channels, name=name)
+        return stream_id
+
+    def get(self, stream_id: str) -> StreamingRecording:
+        with self._lock:
+            stream = self._streams.get(stream_id)
+        if stream is None:
+            raise KeyError(f"Unknown stream '{stream_id}'")
+        return stream
+
+    def finish(self, stream_id: str) -> Dict[str, Any]:
+        """
+        Close a stream and delete its WAV. Only takes named with an upload
+        token keep their features (the token ties them to one player's
+        upload), together with the hash that features() checks them against.
+        """
+        with self._lock:
+            stream = self._streams.pop(stream_id, None)
+        if stream is None:
+            raise KeyError(f"Unknown stream '{stream_id}'")
+        try:
+            result = stream.close()
+            if upload_token(stream.name) is not None:
+                digest = _sha256(stream.path)
+                with self._lock:
+                    self._finished[stream.name] = (time.time(), digest, result["features"])
+                    self._finished.move_to_end(stream.name)
+        finally:
+            _remove(stream.path)
+        return result
+
+    def features(self, name: str, digest: Optional[str]) -> Optional[Dict[str, float]]:
+        """
+        Acoustic features of a recently finished take, by its dataset file
+        name, if `digest` (the SHA-256 of the published file) matches what
+        was streamed. None otherwise, and the caller extracts them itself.
+        """
+        with self._lock:
+            entry = self._finished.get(name)
+        if entry is None or entry[0] < time.time() - self.features_ttl_s or digest is None or entry[1] != digest:
+            return None
+        return entry[2]
+
+    def reap(self) -> int:
+        """
+        Drop streams idle for longer than idle_timeout_s (abandoned tabs)
+        and features kept for longer than features_ttl_s.
+        """
+        now = time.time()
+        with self._lock:
+            stale = [sid for sid, s in self._streams.items() if s.touched < now - self.idle_timeout_s]
+            dropped = [self._streams.pop(sid) for sid in stale]
+            while self._finished and next(iter(self._finished.values()))[0] < now - self.features_ttl_s:
+                self._finished.popitem(last=False)
+        for stream in dropped:
+            stream.finalize()
+            _remove(stream.path)
+        return len(dropped)
+
+
+def _sha256(path: str) -> str:
+    h = hashlib.sha256()
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(1 << 20), b""):
+            h.update(block)
+    return h.hexdigest()
+
+
+def _remove(path: str) -> None:
+    try:
+        os.remove(path)
+    except FileNotFoundError:
+        pass
@@ -0,0 +1,112 @@
+import threading
+import time
+
+from audio_cache import AudioCache
+
+
+class SlowHub:
+    """Fake dataset: each download takes `delay` seconds."""
+
+    def __init__(self, files, delay=0.2):
+        self.files = files
+        self.delay = delay
+        self.calls = []
+        self._lock = threading.Lock()
+
+    def fetch(self, path, out):
+        with self._lock:
+            self.calls.append(path)
+        time.sleep(self.delay)
+        data = self.files[path]
+        out.write(data[: len(data) // 2])
+        out.write(data[len(data) // 2 :])
+
+
+def test_prefetched_reads_do_not_wait(tmp_path):
+    hub = SlowHub({f"{i}_cm-0badc0de_r.wav": bytes([i]) * 1000 for i in range(8)})
+    cache = AudioCache(str(tmp_path), hub.fetch, max_concurrency=8)
+
+    t0 = time.perf_counter()
+    assert cache.prefetch(hub.files) == 8
+    assert cache.prefetch(hub.files) == 0  # already in flight
+    first = cache.get("0_cm-0badc0de_r.wav")
+    joined = time.perf_counter() - t0
+    assert joined < 2 * hub.delay  # downloads ran concurrently, get() joined one
+
+    time.sleep(hub.delay)
+    t0 = time.perf_counter()
+    paths = [cache.get(p) for p in hub.files]
+    assert time.perf_counter() - t0 < 0.01
+    assert paths[0] == first
+    assert sorted(hub.calls) == sorted(hub.files)  # one download per file
+    with cache.open("3_cm-0badc0de_r.wav") as m:
+        assert m[:] == bytes([3]) * 1000
+    assert cache.stats()["prefetched"] == 8
+
+
+def test_content_addressing_and_lru_eviction(tmp_path):
+    hub = SlowHub({"a.wav": b"A" * 400, "copy.wav": b"A" * 400, "b.wav": b"B" * 400, "c.wav": b"C" * 400}, delay=0)
+    cache = AudioCache(str(tmp_path), hub.fetch, max_bytes=1000)
+
+    assert cache.get("a.wav") == cache.get("copy.wav")  # same bytes, one blob
+    cache.get("b.wav")
+    cache.get("a.wav")  # a is now most recent
+    cache.get("c.wav")  # over budget: b goes
+
+    assert "a.wav" in cache and "c.wav" in cache and "b.wav" not in cache
+    assert cache.stats()["bytes"] == 800
+    assert len(list(tmp_path.glob("*.wav"))) == 2
+
+    # Blobs survive a restart, and so does which path they hold
+    restarted = AudioCache(str(tmp_path), hub.fetch, max_bytes=1000)
+    assert restarted.stats()["blobs"] == 2
+    calls = len(hub.calls)
+    assert restarted.get("a.wav") == cache.get("a.wav") and restarted.get("copy.wav") == cache.get("a.wav")
+    assert "c.wav" in restarted and "b.wav" not in restarted
+    assert len(hub.calls) == calls and restarted.stats()["hits"] == 2
+
+
+def test_pinned_blobs_are_not_evicted_until_released(tmp_path):
+    hub = SlowHub({"a.wav": b"A" * 400, "b.wav": b"B" * 400, "c.wav": b"C" * 400}, delay=0)
+    cache = AudioCache(str(tmp_path), hub.fetch, max_bytes=1000)
+
+    assert cache.pin("a.wav") is None  # not cached yet
+    cache.get("a.wav")
+    local = cache.pin("a.wav")
+    cache.get("b.wav")
+    cache.get("c.wav")  # over budget, but a is pinned: b goes instead
+    assert "a.wav" in cache and "b.wav" not in cache
+    with open(local, "rb") as f:
+        assert f.read() == b"A" * 400
+
+    cache.release(local)
+    cache.get("b.wav")  # a is the least recent unpinned blob now
+    assert "a.wav" not in cache
+    assert cache.stats()["pinned"] == 0
+
+
+def test_fetch_future_can_be_awaited_without_a_thread(tmp_path):
+    import asyncio
+
+    hub = SlowHub({"a.wav": b"A" * 100}, delay=0.2)
+    cache = AudioCache(str(tmp_path), hub.fetch)
+
+    async def main():
+        ticks = 0
+
+        async def ticker():
+            nonlocal ticks
+            while True:
+                ticks += 1
+                await asyncio.sleep(0.01)
+
+        tick = asyncio.create_task(ticker())
+        local = await asyncio.wrap_future(cache.fetch("a.wav"))
+        tick.cancel()
+        return local, ticks, cache.fetch("a.wav").done()
+
+    local, ticks, cached = asyncio.run(main())
+    assert open(local, "rb").read() == b"A" * 100
+    assert ticks >= 5  # the loop kept running during the download
+    assert cached
+    assert hub.calls == ["a.wav"]
@@ -0,0 +1,134 @@
+import asyncio
+import json
+import os
+import time
+from types import SimpleNamespace
+
+import numpy as np
+import pytest
+
+import audio_prep
+import voice_features
+from baseline_profile import MIN_STD, REL_SPREAD, build_profile, distance, profile_from_paths, zscores
+
+N = len(voice_features.FEATURE_NAMES)
+
+
+def test_profile_is_mean_and_floored_variance():
+    feats = 100.0 + np.outer([-30.0, 0.0, 30.0], np.ones(N))  # variance 600, above the floor of ~100
+    feats[:, 0] = 5.0  # a feature that never moved in the baseline
+    profile = build_profile(feats)
+
+    assert profile["features"] == list(voice_features.FEATURE_NAMES)
+    assert profile["n"] == 3
+    np.testing.assert_allclose(profile["mean"], feats.mean(axis=0))
+    np.testing.assert_allclose(profile["var"][1:], feats.var(axis=0)[1:])
+    assert profile["var"][0] == pytest.approx((REL_SPREAD * 5.0 + MIN_STD) ** 2)
+    assert json.loads(json.dumps(profile)) == profile  # lives in the session store
+
+
+def test_zscores_and_distance():
+    profile = {"mean": [10.0, 0.0], "var": [4.0, 1.0]}
+
+    np.testing.assert_allclose(zscores(np.array([12.0, -3.0]), profile), [[1.0, -3.0]])
+    d = distance(np.array([[10.0, 0.0], [12.0, 0.0], [12.0, 2.0]]), profile)
+    np.testing.assert_allclose(d, [0.0, np.sqrt(0.5), np.sqrt(2.5)])
+    assert distance(np.array([10.0, 0.0]), profile).shape == (1,)
+
+
+def test_own_voice_is_closer_than_another(tmp_path):
+    def clip(name, f0, seed):
+        rng = np.random.default_rng(seed)
+        t = np.arange(4 * 16000) / 16000
+        voice = sum(np.sin(2 * np.pi * f0 * k * t) / k for k in range(1, 6))
+        x = 0.2 * voice * 0.5 * (1 - np.cos(2 * np.pi * 4 * t)) + 0.002 * rng.standard_normal(len(t))
+        path = tmp_path / name
+        path.write_bytes(audio_prep.encode_wav(x.astype(np.float32), 16000))
+        return str(path)
+
+    profile = profile_from_paths([clip(f"b{i}.wav", 120 + 2 * i, i) for i in range(3)])
+    answers = voice_features.extract_batch([clip("same.wav", 121, 7), clip("other.wav", 230, 8)])
+    same, other = distance(answers, profile)
+    assert same < other
+
+
+def test_streamed_features_are_not_extracted_again(tmp_path):
+    rows = 100.0 + np.outer([-30.0, 0.0, 30.0], np.ones(N))
+    known = voice_features.as_dicts(rows)
+    path = tmp_path / "b0.wav"
+    path.write_bytes(audio_prep.encode_wav(np.zeros(16000, dtype=np.float32), 16000))
+
+    streamed = profile_from_paths(["never-read-1.wav", "never-read-2.wav", "never-read-3.wav"], known)
+    assert streamed == build_profile(rows)
+    mixed = profile_from_paths([str(path), "never-read.wav"], [None, known[0]])
+    np.testing.assert_allclose(mixed["mean"], (voice_features.extract_batch([str(path)])[0] + rows[0]) / 2, rtol=1e-5)
+
+
+def test_profile_uses_the_claimed_answers_even_if_the_session_is_reset(monkeypatch):
+    os.environ.setdefault("SESSION_DB", ":memory:")
+    import mainmcp1
+    from dataset_listing import DatasetListingCache
+
+    files = []
+    hub = SimpleNamespace(
+        repo_info=lambda **kw: SimpleNamespace(sha=f"{len(files):040d}"),
+        list_repo_files=lambda **kw: list(files),
+    )
+    monkeypatch.setattr(mainmcp1, "_LISTING", DatasetListingCache("me/audio", lambda: hub))
+    monkeypatch.setattr(mainmcp1, "_client_id", lambda: "reset-me")
+    built = []
+
+    async def build(cid, answers):
+        built.append((cid, answers))
+
+    monkeypatch.setattr(mainmcp1, "_build_baseline_profile", build)
+    claim_next = mainmcp1._claim_next
+
+    async def claim_then_reset(cid, candidates):
+        claim = await claim_next(cid, candidates)
+        mainmcp1.SESSIONS.put(cid, {"name": "restarted"})  # e.g. save_profile from another tab
+        return claim
+
+    async def scenario():
+        await mainmcp1.start_baseline_recording.fn()
+        token = mainmcp1.SESSIONS.get("reset-me")["upload_token"]
+        now = int(time.time())
+        files.extend(f"{now + i}_cm-{token}_p{i}.wav" for i in range(3))
+        await mainmcp1.validate_next_upload.fn(wait_seconds=0)
+        await mainmcp1.validate_next_upload.fn(wait_seconds=0)
+        monkeypatch.setattr(mainmcp1, "_claim_next", claim_then_reset)
+        reply = await mainmcp1.validate_next_upload.fn(wait_seconds=0)
+        await asyncio.sleep(0)  # let the spawned profile job start
+        return reply
+
+    reply = asyncio.run(scenario())
+    assert "All three baseline prompts are complete" in reply
+    assert built == [("reset-me", {str(i + 1): files[i] for i in range(3)})]
+
+
+def test_failed_speaker_enrolment_keeps_the_profile(tmp_path, monkeypatch):
+    os.environ.setdefault("SESSION_DB", ":memory:")
+    import mainmcp1
+
+    rng = np.random.default_rng(0)
+    local = {}
+    for i in range(3):
+        path = tmp_path / f"b{i}.wav"
+        path.write_bytes(audio_prep.encode_wav((0.1 * rng.standard_normal(32000)).astype(np.float32), 16000))
+        local[f"{100 + i}_b{i}.wav"] = str(path)
+    answers = {str(i + 1): p for i, p in enumerate(local)}
+
+    def enrol(cid, paths, clip_ids):
+        raise RuntimeError("index is read-only")
+
+    async def fetch(path):
+        return local[path]
+
+    monkeypatch.setattr(mainmcp1, "_fetch_audio", fetch)
+    monkeypatch.setattr(mainmcp1, "_enrol_speaker", enrol)
+    mainmcp1.SESSIONS.put("enrol-fails", {"answers": answers})
+
+    asyncio.run(mainmcp1._build_baseline_profile("enrol-fails", answers))
+    sess = mainmcp1.SESSIONS.get("enrol-fails")
+    assert sess["profile_status"] == "ready"
+    assert sess["baseline_profile"]["n"] == 3
@@ -0,0 +1,205 @@
+import asyncio
+import time
+from types import SimpleNamespace
+
+from dataset_listing import DatasetListingCache, DatasetWatcher
+
+
+class FakeHub:
+    """Stands in for HfApi: a file list and a head SHA, counting calls."""
+
+    def __init__(self, files):
+        self.files = list(files)
+        self.sha = "a" * 40
+        self.info_calls = 0
+        self.list_calls = 0
+
+    def commit(self, *paths):
+        self.files.extend(paths)
+        self.sha = f"{len(self.files):040d}"
+
+    def repo_info(self, repo_id, repo_type, expand):
+        self.info_calls += 1
+        return SimpleNamespace(sha=self.sha)
+
+    def list_repo_files(self, repo_id, repo_type, revision):
+        assert revision == self.sha
+        self.list_calls += 1
+        return list(self.files)
+
+
+def test_unchanged_head_is_a_cache_hit():
+    hub = FakeHub(["README.md", "100_a.wav", "300_b.wav", "200_c.wav"])
+    cache = DatasetListingCache("me/audio", lambda: hub)
+
+    assert cache.refresh() == hub.sha
+    assert cache.refresh() == hub.sha
+    assert (hub.info_calls, hub.list_calls) == (2, 1)
+    assert cache.since(0) == ["100_a.wav", "200_c.wav", "300_b.wav"]
+
+
+def test_moved_head_relists_and_notifies_only_new_files():
+    hub = FakeHub(["100_a.wav", "200_b.wav"])
+    cache = DatasetListingCache("me/audio", lambda: hub)
+    seen = []
+    cache.subscribe(seen.append)
+    cache.refresh()
+
+    hub.commit("150_late.wav", "notes.txt")
+    hub.files.remove("100_a.wav")
+    assert cache.refresh() == hub.sha
+    assert hub.list_calls == 2
+    assert cache.since(0) == ["150_late.wav", "200_b.wav"]
+    assert seen == [[(100, "100_a.wav"), (200, "200_b.wav")], [(150, "150_late.wav")]]
+
+
+def test_since_bisects_and_tokens_are_indexed_apart():
+    mine, theirs = "0badc0de", "feedf00d"
+    hub = FakeHub([
+        f"100_cm-{mine}_x.wav", f"200_cm-{theirs}_x.wav", "250_plain.wav",
+        f"300_cm-{mine}_y.wav", f"400_CM-{mine.upper()}_z.WAV",
+    ])
+    cache = DatasetListingCache("me/audio", lambda: hub)
+    cache.refresh()
+
+    assert cache.since(250) == ["250_plain.wav", f"300_cm-{mine}_y.wav", f"400_CM-{mine.upper()}_z.WAV"]
+    assert cache.since(401) == []
+    assert cache.entries_for(mine, 150) == [(300, f"300_cm-{mine}_y.wav"), (400, f"400_CM-{mine.upper()}_z.WAV")]
+    assert cache.entries_for(theirs, 0) == [(200, f"200_cm-{theirs}_x.wav")]
+    assert cache.entries_for(None, 0) == [(250, "250_plain.wav")]
+    assert cache.entries_for("00000000", 0) == []
+
+    hub.commit(f"500_cm-{theirs}_y.wav")
+    hub.files.remove(f"200_cm-{theirs}_x.wav")
+    cache.refresh()
+    assert cache.entries_for(theirs, 0) == [(500, f"500_cm-{theirs}_y.wav")]
+
+
+def test_a_stale_head_never_rolls_the_index_back():
+    import threading
+
+    hub = FakeHub(["100_a.wav"])
+    cache = DatasetListingCache("me/audio", lambda: hub)
+    cache.refresh()
+    old_head = hub.sha
+    in_flight, release = threading.Event(), threading.Event()
+    real_info = hub.repo_info
+
+    def slow_info(**kw):
+        info = real_info(**kw)  # the head as it was when this request started
+        in_flight.set()
+        release.wait(2)
+        return info
+
+    hub.commit("200_b.wav")
+    hub.repo_info = slow_info
+    seen = []
+    cache.subscribe(seen.append)
+    hub.sha = old_head  # this thread's request sees the head before 200_b
+    slow = threading.Thread(target=cache.refresh)
+    slow.start()
+    in_flight.wait(2)
+    hub.repo_info = real_info
+    hub.commit()  # newer head, listed by the next refresh
+    cache.refresh()
+    hub.list_repo_files = lambda **kw: ["100_a.wav"]  # what the stale head would list
+    release.set()
+    slow.join()
+
+    assert cache.since(0) == ["100_a.wav", "200_b.wav"]
+    assert cache.head == hub.sha
+    assert seen == [[(200, "200_b.wav")]]  # announced once, not dropped and re-added
+
+
+def _watched(files, interval_s=0.01):
+    hub = FakeHub(files)
+    cache = DatasetListingCache("me/audio", lambda: hub)
+    refreshes = []
+
+    async def refresh():
+        refreshes.append(time.perf_counter())
+        cache.refresh()
+
+    return hub, DatasetWatcher(cache, refresh, interval_s=interval_s), refreshes
+
+
+def test_waiters_share_one_poll_task():
+    async def main():
+        hub, watcher, refreshes = _watched(["100_old.wav"])
+        loop = asyncio.get_running_loop()
+        loop.call_later(0.1, hub.commit, "200_cm-0badc0de_a.wav", "210_cm-feedf00d_b.wav")
+        t0 = time.perf_counter()
+        mine = watcher.wait_for(lambda ts, p: "0badc0de" in p, timeout=2)
+        theirs = watcher.wait_for(lambda ts, p: "feedf00d" in p, timeout=2)
+        found = await asyncio.gather(mine, theirs)
+        elapsed = time.perf_counter() - t0
+        await asyncio.sleep(0.05)
+        return found, elapsed, len(refreshes), watcher
+
+    found, elapsed, n_refreshes, watcher = asyncio.run(main())
+    assert found == ["200_cm-0badc0de_a.wav", "210_cm-feedf00d_b.wav"]
+    # One poller for both waiters, stopped once nobody waits
+    assert n_refreshes <= elapsed / 0.01 + 2
+    assert watcher.waiting == 0 and watcher._task.done()
+
+
+def test_wait_for_sees_already_indexed_files_and_times_out():
+    async def main():
+        hub, watcher, _ = _watched(["100_a.wav", "300_b.wav"])
+        watcher.listing.refresh()
+        early = await watcher.wait_for(lambda ts, p: True, timeout=1, since_ts=200)
+        t0 = time.perf_counter()
+        missing = await watcher.wait_for(lambda ts, p: p == "nope.wav", timeout=0.1)
+        return early, missing, time.perf_counter() - t0, watcher.waiting
+
+    early, missing, waited, waiting = asyncio.run(main())
+    assert early == "300_b.wav"
+    assert missing is None and 0.1 <= waited < 0.5
+    assert waiting == 0
+
+
+def test_watch_delivers_new_entries_until_unsubscribed():
+    async def main():
+        hub, watcher, refreshes = _watched([])
+        got = []
+        stop = watcher.watch(got.append)
+        await asyncio.sleep(0.03)
+        hub.commit("100_a.wav")
+        await asyncio.sleep(0.05)
+        stop()
+        await asyncio.sleep(0.03)
+        n = len(refreshes)
+        hub.commit("200_b.wav")
+        await asyncio.sleep(0.05)
+        return got, n, len(refreshes)
+
+    got, n_at_stop, n_later = asyncio.run(main())
+    assert got == [[(100, "100_a.wav")]]
+    assert n_later == n_at_stop  # polling stopped with the last subscriber
+
+
+def test_failing_callbacks_do_not_block_other_waiters():
+    def broken_watcher(entries):
+        raise RuntimeError("boom")
+
+    def broken_predicate(ts, p):
+        raise ValueError("bad predicate")
+
+    async def main():
+        hub, watcher, _ = _watched([])
+        got = []
+        stops = [watcher.watch(broken_watcher), watcher.watch(got.append)]
+        asyncio.get_running_loop().call_later(0.05, hub.commit, "100_a.wav")
+        results = await asyncio.gather(
+            watcher.wait_for(broken_predicate, timeout=1),
+            watcher.wait_for(lambda ts, p: True, timeout=1),
+            return_exceptions=True,
+        )
+        for stop in stops:
+            stop()
+        return got, results
+
+    got, (broken, ok) = asyncio.run(main())
+    assert isinstance(broken, ValueError)
+    assert ok == "100_a.wav"
+    assert got == [[(100, "100_a.wav")]]
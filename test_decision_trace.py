@@ -0,0 +1,130 @@
+import gzip
+import json
+import os
+import time
+
+import numpy as np
+
+import voice_features
+from decision_trace import DecisionTrace
+from round_engine import GENERIC_PROFILE, rescore
+
+
+def test_records_are_batched_to_gzip_segments_and_queryable(tmp_path):
+    trace = DecisionTrace(str(tmp_path), batch_size=10, flush_interval_s=60)
+    for i in range(25):
+        trace.record("upload_validated", session=f"p{i % 3}", prompt_id=str(i % 3 + 1), path=f"{i}.wav",
+                     features=np.float32(0.5) if i == 0 else None)
+    # Two full batches wake the writer; the last 5 are still buffered
+    deadline = time.time() + 5
+    while trace.written < 20 and time.time() < deadline:
+        time.sleep(0.01)
+    assert trace.written >= 20
+
+    records = trace.query(session="p1")
+    assert [r["path"] for r in records] == [f"{i}.wav" for i in range(1, 25, 3)]
+    assert trace.query(kind="upload_validated", limit=2, prompt_id="1")[-1]["path"] == "24.wav"
+    assert trace.query(session="p0")[0]["features"] == 0.5
+    segment = trace.segments()[0]
+    assert segment.endswith(".jsonl.gz")
+    assert len(gzip.open(segment, "rt").read().splitlines()) == 25
+    trace.close()
+
+
+def test_full_buffer_drops_and_counts(tmp_path):
+    trace = DecisionTrace(str(tmp_path), capacity=3, batch_size=100, flush_interval_s=60)
+    accepted = [trace.record("round_score", session="p") for _ in range(5)]
+    assert accepted == [True, True, True, False, False]
+    assert trace.stats()["dropped"] == 2
+    assert trace.flush() == 3
+    assert trace.record("round_score", session="p")  # room again after the flush
+
+
+def test_segments_rotate_and_old_ones_are_pruned(tmp_path):
+    trace = DecisionTrace(str(tmp_path), segment_max_bytes=1, max_segments=2)
+    for i in range(4):
+        trace.record("round_score", session="p", n=i)
+        trace.flush()
+    assert len(trace.segments()) == 2
+    assert [r["n"] for r in trace.query()] == [2, 3]
+
+
+def test_limited_query_reads_only_the_newest_segments(tmp_path, monkeypatch):
+    trace = DecisionTrace(str(tmp_path), segment_max_bytes=1, max_segments=100)
+    for i in range(10):
+        for j in range(10):
+            trace.record("round_score", session="pq"[j % 2], n=10 * i + j)
+        trace.flush()
+        last = max(r["ts"] for r in trace.query(n=10 * i + 9))
+        os.utime(trace.segments()[-1], (last, last))
+    # Another worker's segment: its name sorts first, but it was written last
+    late = time.time() + 60
+    with gzip.open(tmp_path / "trace-00000000-000000-1-0000.jsonl.gz", "wt") as f:
+        f.write(json.dumps({"ts": late, "seq": 0, "pid": 1, "kind": "round_score", "session": "p", "n": 100}) + "\n")
+    os.utime(tmp_path / "trace-00000000-000000-1-0000.jsonl.gz", (late, late))
+
+    read = []
+    reader = DecisionTrace._read_segment
+    monkeypatch.setattr(DecisionTrace, "_read_segment", staticmethod(lambda path, *a: read.append(path) or reader(path, *a)))
+    assert [r["n"] for r in trace.query(session="p", limit=7)] == [88, 90, 92, 94, 96, 98, 100]
+    assert len(read) == 3  # the late segment and the two newest of this worker
+    assert [r["n"] for r in trace.query(session="q", limit=3)] == [95, 97, 99]
+
+
+def test_enqueue_is_cheap(tmp_path):
+    trace = DecisionTrace(str(tmp_path), capacity=100000, batch_size=100000, flush_interval_s=60)
+    features = {"pitch_mean_hz": 150.0}
+    n = 20000
+    t0 = time.perf_counter()
+    for i in range(n):
+        trace.record("round_score", session="p", features=features, bluff_score=i)
+    assert (time.perf_counter() - t0) / n < 50e-6
+
+
+def test_replay_reports_changed_decisions(tmp_path):
+    trace = DecisionTrace(str(tmp_path))
+    baseline = dict(zip(voice_features.FEATURE_NAMES, GENERIC_PROFILE["mean"]))
+    trace.record("round_score", session="a", features=baseline, profile=None, bluff_score=0, band="appears honest")
+    trace.record("round_score", session="b", features=baseline, profile=None, bluff_score=55, band="uncertain")
+    trace.record("round_score", session="c", features=None, error="no answer submitted")
+
+    report = trace.replay(rescore, kind="round_score")
+    assert report["replayed"] == 3
+    assert [c["session"] for c in report["changed"]] == ["b"]
+    assert report["changed"][0]["fields"]["bluff_score"] == {"recorded": 55, "replayed": 0}
+
+
+def test_round_scores_are_traced(monkeypatch, tmp_path):
+    import asyncio
+
+    monkeypatch.setenv("SESSION_DB", ":memory:")
+    import mainmcp1
+    from leaderboard import LeaderboardService
+    from round_engine import Lobby
+
+    class Engine:
+        transcriber = None
+
+        async def score(self, rnd, profiles):
+            rnd.close()
+            rnd.publish({p: {"bluff_score": 12, "band": "appears honest", "reasons": [], "features": {"x": 1.0},
+                             "timings_ms": {"fetch": 1.0, "analysis": 2.0}} for p in rnd.players})
+            return rnd.results
+
+    trace = DecisionTrace(str(tmp_path))
+    monkeypatch.setattr(mainmcp1, "TRACE", trace)
+    monkeypatch.setattr(mainmcp1, "_engine", lambda: Engine())
+    monkeypatch.setattr(mainmcp1, "LEADERBOARDS", LeaderboardService(""))
+    lobby = Lobby()
+    for p in ("a", "b", "c"):
+        lobby.join(p, p.upper())
+    rnd = lobby.start_round("5", 30)
+    for p in ("a", "b", "c"):
+        rnd.submit(p, f"{p}.wav")
+    asyncio.run(mainmcp1._score_round(lobby, rnd))
+
+    records = trace.query(kind="round_score", lobby_id=lobby.lobby_id)
+    assert sorted((r["session"], r["path"], r["bluff_score"]) for r in records) == [("a", "a.wav", 12), ("b", "b.wav", 12), ("c", "c.wav", 12)]
+    assert records[0]["judge_version"] == mainmcp1.JUDGE_VERSION
+    assert records[0]["timings_ms"] == {"fetch": 1.0, "analysis": 2.0}
+    assert "timings_ms" not in mainmcp1._round_results(lobby, rnd)["results"]["A"]
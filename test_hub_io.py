@@ -0,0 +1,124 @@
+import asyncio
+import contextvars
+import os
+import sqlite3
+import threading
+import time
+from types import SimpleNamespace
+
+import pytest
+
+os.environ.setdefault("SESSION_DB", ":memory:")
+
+import mainmcp1
+
+SLOW_LISTING_S = 1.0
+PLAYER = contextvars.ContextVar("player", default="other-player")
+
+
+def _slow_listing(start_ts, token=None):
+    # Stands in for a large list_repo_files round trip
+    time.sleep(SLOW_LISTING_S)
+    return []
+
+
+async def _timed(coro):
+    t0 = time.perf_counter()
+    await coro
+    return time.perf_counter() - t0
+
+
+async def _timed_reply(coro):
+    t0 = time.perf_counter()
+    reply = await coro
+    return time.perf_counter() - t0, reply
+
+
+async def _other_players_latency(n=20):
+    latencies = []
+    for i in range(n):
+        latencies.append(await _timed(mainmcp1.get_recording_prompt.fn(prompt_id="3")))
+        latencies.append(await _timed(mainmcp1.save_profile.fn(name=f"p{i}", age=30, favorite_color="blue")))
+        await asyncio.sleep(SLOW_LISTING_S / (2 * n))
+    return max(latencies)
+
+
+@pytest.fixture
+def fresh_server(monkeypatch):
+    """Isolate from earlier tests: own listing index and watcher, one client id per task."""
+    from dataset_listing import DatasetListingCache, DatasetWatcher
+
+    hub = SimpleNamespace(repo_info=lambda **kw: SimpleNamespace(sha="0" * 40), list_repo_files=lambda **kw: [])
+    listing = DatasetListingCache("test/hub-io", lambda: hub)
+    monkeypatch.setattr(mainmcp1, "_LISTING", listing)
+    monkeypatch.setattr(mainmcp1, "_WATCHER", DatasetWatcher(listing, lambda: mainmcp1._run_hub(listing.refresh)))
+    monkeypatch.setattr(mainmcp1, "_client_id", PLAYER.get)
+
+
+async def _as_player(cid, coro):
+    PLAYER.set(cid)  # tasks get a copy of the context, so this stays local to the task
+    return await coro
+
+
+def test_slow_listing_does_not_stall_other_tools(monkeypatch, fresh_server):
+    monkeypatch.setattr(mainmcp1, "_list_wav_paths_since", _slow_listing)
+
+    async def scenario():
+        idle = await _other_players_latency()
+
+        await asyncio.create_task(_as_player("validator", mainmcp1.start_baseline_recording.fn()))
+        validate = asyncio.create_task(_as_player("validator", _timed_reply(mainmcp1.validate_next_upload.fn(wait_seconds=0))))
+        await asyncio.sleep(0)
+        busy = await _other_players_latency()
+        validate_time, reply = await validate
+        return idle, busy, validate_time, reply
+
+    idle, busy, validate_time, reply = asyncio.run(scenario())
+
+    # The listing really was in flight the whole time...
+    assert "don’t see a new WAV" in reply
+    assert validate_time >= SLOW_LISTING_S
+    # ...and the other tools stayed as fast as with nothing in flight.
+    assert busy < idle + 0.05
+
+
+def test_session_write_lock_does_not_stall_other_tools(monkeypatch, tmp_path):
+    from session_store import SQLiteSessionStore
+
+    path = str(tmp_path / "sessions.db")
+    monkeypatch.setattr(mainmcp1, "SESSIONS", SQLiteSessionStore(path))
+    LOCK_S = 0.5
+
+    def other_worker_writes():
+        # Another process holding the write lock, e.g. a slow claim
+        conn = sqlite3.connect(path, isolation_level=None)
+        conn.execute("BEGIN IMMEDIATE")
+        time.sleep(LOCK_S)
+        conn.execute("COMMIT")
+        conn.close()
+
+    async def max_tick_lag(stop):
+        # How late a 10 ms timer fires while the lock is held: the loop's stall
+        loop = asyncio.get_running_loop()
+        lag = 0.0
+        while not stop.is_set():
+            t0 = loop.time()
+            await asyncio.sleep(0.01)
+            lag = max(lag, loop.time() - t0 - 0.01)
+        return lag
+
+    async def scenario():
+        locker = threading.Thread(target=other_worker_writes)
+        locker.start()
+        await asyncio.sleep(0.05)
+        stop = asyncio.Event()
+        ticker = asyncio.create_task(max_tick_lag(stop))
+        await asyncio.sleep(0.005)  # ticker is mid-sleep when the write starts
+        start_time = await _timed(mainmcp1.start_baseline_recording.fn())
+        stop.set()
+        locker.join()
+        return await ticker, start_time
+
+    lag, start_time = asyncio.run(scenario())
+    assert start_time >= LOCK_S - 0.1  # the write really waited for the lock...
+    assert lag < 0.05  # ...without holding up the loop
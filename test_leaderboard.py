@@ -0,0 +1,56 @@
+import random
+import time
+
+from leaderboard import Leaderboard, LeaderboardService
+
+READ_BUDGET_S = 100e-6  # one top() or standing() call
+
+
+def _round(scores):
+    return {p: {"bluff_score": s} for p, s in scores.items()}
+
+
+def test_cumulative_honesty_scores_and_ranks():
+    board = Leaderboard()
+    board.apply_round(1, _round({"a": 20, "b": 60, "c": None}), {"a": "Ann", "b": "Bob", "c": "Cat"})
+    assert board.apply_round(1, _round({"a": 0})) is False  # same round twice is ignored
+    board.apply_round(2, _round({"a": 80, "b": 20, "c": 10}))
+
+    # a: 80 + 20 = 100, b: 40 + 80 = 120, c: 90
+    assert board.top(3) == [
+        {"rank": 1, "player": "Bob", "score": 120},
+        {"rank": 2, "player": "Ann", "score": 100},
+        {"rank": 3, "player": "Cat", "score": 90},
+    ]
+    board.apply_round(3, _round({"a": 80}))
+    assert board.rank("a") == board.rank("b") == 1  # tie at 120
+    assert board.rank("c") == 3
+    assert board.rank("nobody") is None
+
+
+def test_snapshot_round_trip(tmp_path):
+    path = str(tmp_path / "board.json")
+    service = LeaderboardService(path)
+    service.apply_round("L1", 1, _round({"a": 30, "b": 10}), {"a": "Ann", "b": "Bob"})
+    assert service.save() is True
+    assert service.save() is False  # nothing changed
+
+    restored = LeaderboardService(path)
+    assert restored.top("L1") == service.top("L1")
+    assert restored.standing("L1", "a") == {"player": "Ann", "rank": 2, "score": 70, "of": 2, "rounds": 1}
+
+
+def test_reads_stay_fast_with_many_lobbies():
+    service = LeaderboardService()
+    rng = random.Random(0)
+    for lobby in range(2000):
+        players = [f"p{i}" for i in range(8)]
+        for rnd in range(1, 6):
+            service.apply_round(f"L{lobby}", rnd, _round({p: rng.randint(0, 100) for p in players}))
+
+    t0 = time.perf_counter()
+    for lobby in range(2000):
+        service.top(f"L{lobby}", 3)
+        service.standing(f"L{lobby}", "p3")
+    per_read = (time.perf_counter() - t0) / 4000
+    assert per_read < READ_BUDGET_S, f"leaderboard read took {per_read * 1e6:.1f} us"
@@ -0,0 +1,27 @@
+import copy
+import json
+
+import load_test
+
+
+def test_one_lobby_end_to_end(tmp_path):
+    runs = load_test.run_matrix([1], [30], min_players=3, max_players=3, rounds=1)
+    run = runs[0]
+    assert run["lobbies_failed"] == 0, run["errors"]
+    tools = run["tools"]
+    assert tools["validate_next_upload"]["count"] == 9
+    assert tools["get_round_results"]["count"] == 3
+    assert all(t["failures"] == 0 for t in tools.values())
+    assert tools["validate_next_upload"]["p50_ms"] <= tools["validate_next_upload"]["p99_ms"]
+    # Server-side view of the same run: Hub listing and Mistral calls were timed
+    assert run["server"]["external"]["hf.list_repo_files"]["count"] >= 1
+    assert run["server"]["external"]["mistral.transcriptions.complete"]["count"] == 3
+
+    path = load_test.save(runs, str(tmp_path), [])
+    assert json.load(open(path))["runs"][0]["config"]["dataset_files"] == 30
+
+    slower = copy.deepcopy(runs)
+    slower[0]["tools"]["validate_next_upload"]["p95_ms"] *= 2
+    regressions = load_test.compare(slower, load_test.previous_runs(str(tmp_path)), threshold_pct=20)
+    assert [r.split()[0] for r in regressions] == ["validate_next_upload"]
+    assert slower[0]["tools"]["validate_next_upload"]["p95_change_pct"] == 100.0
@@ -0,0 +1,128 @@
+import asyncio
+import time
+
+from lobby_scheduler import DeadlineHeap, RoundScheduler
+from round_engine import Lobby
+
+
+class FakeWatcher:
+    """Stands in for DatasetWatcher: records watch() subscriptions."""
+
+    def __init__(self):
+        self.callbacks = {}
+
+    def watch(self, on_entries):
+        key = len(self.callbacks)
+        self.callbacks[key] = on_entries
+        return lambda: self.callbacks.pop(key, None)
+
+    def push(self, entries):
+        for cb in list(self.callbacks.values()):
+            cb(entries)
+
+
+def test_deadline_heap_fires_in_order_with_one_task():
+    fired = []
+
+    async def main():
+        heap = DeadlineHeap()
+        loop = asyncio.get_running_loop()
+        now = loop.time()
+        for i in range(500):
+            heap.call_at(i, now + 0.2 + (i % 50) / 1000, lambda i=i: fired.append((loop.time(), i)))
+        heap.call_at("late", now + 0.5, lambda: fired.append((loop.time(), "late")))
+        heap.call_at("late", now + 0.05, lambda: fired.append((loop.time(), "early")))  # rescheduled sooner
+        heap.cancel(7)
+        tasks_before = len(asyncio.all_tasks())
+        await asyncio.sleep(0.4)
+        return tasks_before, len(heap)
+
+    tasks, pending = asyncio.run(main())
+    assert tasks == 2  # main + the single heap task
+    assert pending == 0
+    assert fired[0][1] == "early"
+    assert [t for t, _ in fired] == sorted(t for t, _ in fired)
+    assert len(fired) == 500 and 7 not in {i for _, i in fired}
+
+
+def test_rounds_auto_submit_by_token_and_close_at_deadline():
+    closed, uploads = [], []
+
+    async def main():
+        watcher = FakeWatcher()
+
+        def on_upload(lobby, rnd, player, path):
+            uploads.append((lobby.lobby_id, player, path))
+            rnd.submit(player, path)
+
+        sched = RoundScheduler(watcher, on_upload, lambda lobby, rnd: closed.append((lobby.lobby_id, time.time())), grace_s=0.0)
+        lobbies = []
+        for n in range(200):
+            lobby = Lobby(f"L{n}")
+            for p in ("a", "b", "c"):
+                lobby.join(p, p)
+            rnd = lobby.start_round("5", record_s=0.3)
+            sched.open(lobby, rnd, {p: f"{n:04x}{p * 4}" for p in ("a", "b", "c")})
+            lobbies.append((lobby, rnd))
+        assert len(watcher.callbacks) == 1  # one subscription for all lobbies
+
+        ts = int(time.time())
+        watcher.push([(ts, f"{ts}_cm-0000aaaa_recording.wav"), (ts, f"{ts}_cm-ffffffff_recording.wav")])
+        t0 = time.time()
+        await asyncio.sleep(0.6)
+        return sched, watcher, lobbies, t0
+
+    sched, watcher, lobbies, t0 = asyncio.run(main())
+    assert uploads == [("L0", "a", uploads[0][2])]
+    assert lobbies[0][1].submissions == {"a": uploads[0][2]}
+    assert len(closed) == 200
+    assert all(at - t0 < 0.5 for _, at in closed)
+    assert sched.open_rounds == 0 and not watcher.callbacks
+
+
+def test_raising_callback_does_not_stop_other_deadlines(caplog):
+    fired = []
+
+    def broken():
+        raise RuntimeError("lobby L1 is broken")
+
+    async def main():
+        heap = DeadlineHeap()
+        now = asyncio.get_running_loop().time()
+        heap.call_at("L1", now + 0.02, broken)
+        heap.call_at("L2", now + 0.04, lambda: fired.append("L2"))
+        await asyncio.sleep(0.1)
+        heap.call_at("L3", asyncio.get_running_loop().time() + 0.01, lambda: fired.append("L3"))
+        await asyncio.sleep(0.05)
+
+    asyncio.run(main())
+    assert fired == ["L2", "L3"]
+    assert "Deadline callback for 'L1' failed" in caplog.text
+
+
+def test_player_in_two_lobbies_is_offered_the_upload_in_both():
+    uploads = []
+
+    async def main():
+        watcher = FakeWatcher()
+        sched = RoundScheduler(watcher, lambda lobby, rnd, p, path: uploads.append((lobby.lobby_id, p)),
+                               lambda lobby, rnd: None, grace_s=0.0)
+        rounds = []
+        for lobby_id in ("L1", "L2"):
+            lobby = Lobby(lobby_id)
+            for p in ("a", "b", "c"):
+                lobby.join(p, p)
+            rnd = lobby.start_round("5", record_s=5)
+            sched.open(lobby, rnd, {"a": "0000aaaa", "b": f"{lobby_id.lower()}00bbbb", "c": f"{lobby_id.lower()}00cccc"})
+            rounds.append((lobby, rnd))
+
+        ts = int(time.time())
+        watcher.push([(ts, f"{ts}_cm-0000aaaa_recording.wav")])
+        sched.finish(*rounds[0])
+        watcher.push([(ts, f"{ts}_cm-0000aaaa_take2.wav")])
+        sched.finish(*rounds[1])
+        return sched
+
+    sched = asyncio.run(main())
+    assert uploads == [("L1", "a"), ("L2", "a"), ("L2", "a")]
+    assert sched._by_token == {}
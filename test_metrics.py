@@ -0,0 +1,78 @@
+import asyncio
+import json
+import time
+
+import pytest
+
+from metrics import Metrics
+
+
+def test_histogram_errors_and_in_flight():
+    m = Metrics(buckets=(0.01, 0.1, 1.0))
+    for s in (0.005, 0.05, 0.05, 0.5, 5.0):
+        m.observe("external", "hf.list_repo_files", s)
+    with pytest.raises(RuntimeError):
+        with m.track("external", "hf.list_repo_files"):
+            assert m.snapshot()["external"]["hf.list_repo_files"]["in_flight"] == 1
+            raise RuntimeError("hub down")
+
+    snap = m.snapshot()["external"]["hf.list_repo_files"]
+    assert (snap["count"], snap["errors"], snap["in_flight"]) == (6, 1, 0)
+    assert snap["p50_s"] == 0.1
+    assert snap["p99_s"] is None  # beyond the last bucket bound
+
+    text = m.render_prometheus()
+    assert 'catchmeow_external_seconds_bucket{name="hf.list_repo_files",le="0.1"} 4' in text
+    assert 'catchmeow_external_seconds_bucket{name="hf.list_repo_files",le="+Inf"} 6' in text
+    assert 'catchmeow_external_errors_total{name="hf.list_repo_files"} 1' in text
+
+
+def test_timed_async_and_instrument():
+    m = Metrics()
+
+    class Files:
+        def upload(self):
+            return "sync"
+
+        async def upload_async(self):
+            return "async"
+
+    files = m.instrument(Files(), "mistral.files", ("upload",))
+    assert files.upload() == "sync"
+    assert asyncio.run(files.upload_async()) == "async"
+    assert m.snapshot()["external"]["mistral.files.upload"]["count"] == 2
+
+    m.register_stats("audio_cache", lambda: {"hits": 3, "hit_ratio": 0.75, "note": "skipped"})
+    assert m.snapshot()["stats"] == {"audio_cache": {"hits": 3.0, "hit_ratio": 0.75}}
+    assert 'catchmeow_cache_hit_ratio{cache="audio_cache"} 0.75' in m.render_prometheus()
+
+
+def test_overhead_is_microseconds():
+    m = Metrics()
+    n = 20000
+    t0 = time.perf_counter()
+    for _ in range(n):
+        with m.track("tool", "start_game"):
+            pass
+    assert (time.perf_counter() - t0) / n < 50e-6
+
+
+def test_tool_calls_are_exposed(monkeypatch):
+    monkeypatch.setenv("SESSION_DB", ":memory:")
+    from fastmcp import Client
+    from starlette.testclient import TestClient
+
+    import mainmcp1
+
+    async def calls():
+        async with Client(mainmcp1.mcp) as client:
+            await client.call_tool("start_game")
+            await client.call_tool("get_recording_prompt", {"prompt_id": "3"})
+            return await client.read_resource("metrics://server")
+
+    snapshot = json.loads(asyncio.run(calls())[0].text)
+    assert snapshot["tool"]["start_game"]["count"] >= 1
+    assert "audio_cache" in snapshot["stats"]
+
+    text = TestClient(mainmcp1.mcp.http_app()).get("/metrics").text
+    assert 'catchmeow_tool_seconds_count{name="get_recording_prompt"}' in text
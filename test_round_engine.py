@@ -0,0 +1,176 @@
+import asyncio
+import time
+
+import numpy as np
+
+import audio_prep
+import round_engine
+from round_engine import Lobby, RoundEngine
+
+
+def _answer(tmp_path, name, f0, seconds=4, rate=16000):
+    t = np.arange(seconds * rate) / rate
+    voice = sum(np.sin(2 * np.pi * f0 * k * t) / k for k in range(1, 6))
+    envelope = 0.5 * (1 - np.cos(2 * np.pi * 4.0 * t))
+    path = tmp_path / name
+    path.write_bytes(audio_prep.encode_wav((0.2 * voice * envelope).astype(np.float32), rate))
+    return str(path)
+
+
+def _lobby(players):
+    lobby = Lobby("test")
+    for p in players:
+        lobby.join(p, p.title())
+    return lobby
+
+
+def test_round_reveal_waits_for_slowest_not_sum(tmp_path):
+    """Five players whose downloads take 0.3 s each reveal in ~0.3 s, all at once."""
+    players = [f"p{i}" for i in range(5)]
+    files = {f"{p}.wav": _answer(tmp_path, f"{p}.wav", 110 + 20 * i) for i, p in enumerate(players)}
+
+    async def fetch(path):
+        await asyncio.sleep(0.3)
+        return files[path]
+
+    async def main():
+        engine = RoundEngine(fetch, max_workers=2)
+        try:
+            lobby = _lobby(players)
+            # Warm the worker processes so the timing measures the round only
+            warm = lobby.start_round("5", record_s=30)
+            warm.submit("p0", "p0.wav")
+            await engine.score(warm, {})
+
+            rnd = lobby.start_round("5", record_s=30)
+            for p in players:
+                rnd.submit(p, f"{p}.wav")
+            seen = []
+
+            async def reader():
+                await rnd.revealed.wait()
+                seen.append(dict(rnd.results))
+
+            watcher = asyncio.create_task(reader())
+            t0 = time.perf_counter()
+            results = await engine.score(rnd, {})
+            elapsed = time.perf_counter() - t0
+            await watcher
+            return rnd, results, seen, elapsed
+        finally:
+            engine.shutdown()
+
+    rnd, results, seen, elapsed = asyncio.run(main())
+    assert rnd.status == "revealed"
+    assert set(results) == set(players)
+    assert seen == [dict(results)]  # readers only ever see the complete set
+    for r in results.values():
+        assert 0 <= r["bluff_score"] <= 100
+        assert 1 <= len(r["reasons"]) <= 3
+    assert elapsed < 5 * 0.3
+
+
+def test_round_deadline_and_failures_are_reported_per_player(tmp_path):
+    ok = _answer(tmp_path, "ok.wav", 150)
+    released = []
+
+    async def fetch(path):
+        if path == "slow.wav":
+            await asyncio.sleep(10)
+        if path == "broken.wav":
+            raise FileNotFoundError(path)
+        return ok
+
+    async def main():
+        engine = RoundEngine(fetch, release=released.append, max_workers=1, score_timeout_s=2.0)
+        try:
+            rnd = _lobby(["a", "b", "c", "d"]).start_round("5", record_s=30)
+            rnd.submit("a", "ok.wav")
+            rnd.submit("b", "slow.wav")
+            rnd.submit("c", "broken.wav")
+            t0 = time.perf_counter()
+            results = await engine.score(rnd, {})
+            return results, time.perf_counter() - t0
+        finally:
+            engine.shutdown()
+
+    results, elapsed = asyncio.run(main())
+    assert elapsed < 5
+    assert results["a"]["bluff_score"] is not None
+    assert "exceeded" in results["b"]["error"]
+    assert "failed" in results["c"]["error"]
+    assert released == [ok]  # only fetched files are handed back
+    assert results["d"]["error"] == "no answer submitted"
+
+
+def test_score_is_low_against_own_baseline():
+    features = np.array([[10.0, -25.0, 8.0, 160.0, 25.0, 0.02, 0.2, 4.0, 0.3]])
+    same = round_engine.score_features(features, round_engine.GENERIC_PROFILE)
+    far = round_engine.score_features(features * [1, 1, 1, 1.6, 3, 3, 2.5, 1, 1], round_engine.GENERIC_PROFILE)
+    assert same["bluff_score"] == 0 and same["band"] == "appears honest"
+    assert far["bluff_score"] > same["bluff_score"]
+    assert any("pitch" in r for r in far["reasons"])
+
+
+def test_known_features_skip_extraction(tmp_path):
+    path = _answer(tmp_path, "a.wav", 150)
+    fresh = round_engine.analyse_submission(path, None)
+    known = dict(fresh["features"], pitch_mean_hz=400.0)
+
+    reused = round_engine.analyse_submission(path, None, known)
+    assert reused["features"] == known  # taken as given, not recomputed
+    assert reused["embedding"] == fresh["embedding"]
+
+
+def test_round_is_revealed_even_if_post_processing_fails(tmp_path):
+    ok = _answer(tmp_path, "ok.wav", 150)
+
+    async def fetch(path):
+        return ok
+
+    class BrokenVoiceCheck(RoundEngine):
+        def _check_voices(self, rnd, results):
+            raise RuntimeError("index unavailable")
+
+    async def main():
+        engine = BrokenVoiceCheck(fetch, max_workers=1)
+        try:
+            lobby = _lobby(["a", "b"])
+            rnd = lobby.start_round("5", record_s=30)
+            rnd.submit("a", "ok.wav")
+            results = await engine.score(rnd, {})
+            lobby.start_round("5", record_s=30)  # the lobby is not stuck in "scoring"
+            return rnd, results
+        finally:
+            engine.shutdown()
+
+    rnd, results = asyncio.run(main())
+    assert rnd.status == "revealed" and rnd.revealed.is_set()
+    assert results["a"]["bluff_score"] is not None and "embedding" not in results["a"]
+    assert results["b"]["error"] == "no answer submitted"
+
+
+def test_score_round_reveals_a_failure_to_start_scoring(monkeypatch):
+    import os
+
+    os.environ.setdefault("SESSION_DB", ":memory:")
+    import mainmcp1
+
+    def broken_engine():
+        raise RuntimeError("no worker processes")
+
+    monkeypatch.setattr(mainmcp1, "_engine", broken_engine)
+    lobby = _lobby(["a", "b"])
+    rnd = lobby.start_round("5", record_s=30)
+    rnd.submit("a", "ok.wav")
+    rnd.close()
+
+    async def main():
+        try:
+            await mainmcp1._score_round(lobby, rnd)
+        except RuntimeError:
+            pass
+
+    asyncio.run(main())
+    assert rnd.status == "revealed"
+    assert rnd.results["a"]["error"] == "scoring failed: no worker processes"
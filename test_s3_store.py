@@ -0,0 +1,91 @@
+import datetime
+import os
+from urllib.parse import parse_qs, urlparse
+
+import pytest
+from botocore.stub import Stubber
+
+from s3_store import PART_SIZE, RecordingStore
+
+os.environ.setdefault("AWS_ACCESS_KEY_ID", "testing")
+os.environ.setdefault("AWS_SECRET_ACCESS_KEY", "testing")
+
+
+@pytest.fixture
+def store():
+    return RecordingStore("bucket", region="eu-north-1", endpoint_url="http://127.0.0.1:9000")
+
+
+def test_presigned_put_is_cached_and_keyed_by_day(store):
+    a = store.presign_put("../1700000000_cm-0badc0de_recording.wav")
+    b = store.presign_put("1700000000_cm-0badc0de_recording.wav")
+
+    assert a == b  # reused, not re-signed
+    today = datetime.datetime.now(datetime.timezone.utc)
+    assert a["s3_key"] == f"recordings/{today:%Y/%m/%d}/1700000000_cm-0badc0de_recording.wav"
+    url = urlparse(a["upload_url"])
+    assert url.netloc == "127.0.0.1:9000" and url.path == f"/bucket/{a['s3_key']}"
+    assert "X-Amz-Signature" in parse_qs(url.query)
+
+
+def test_multipart_presigns_one_url_per_part(store):
+    with Stubber(store.client) as stub:
+        stub.add_response("create_multipart_upload", {"UploadId": "up-1", "Bucket": "bucket", "Key": "k"})
+        stub.add_response("complete_multipart_upload", {"Bucket": "bucket", "Key": "k"})
+        up = store.presign_multipart("big.wav", 2 * PART_SIZE + 1)
+        done = store.complete_multipart(up["s3_key"], up["upload_id"], ["e1", "e2", "e3"])
+
+    assert len(up["part_urls"]) == 3
+    assert parse_qs(urlparse(up["part_urls"][2]).query)["partNumber"] == ["3"]
+    assert done == {"ok": True, "s3_key": up["s3_key"], "parts": 3}
+
+
+def test_list_recordings_is_one_prefixed_page(store):
+    modified = datetime.datetime(2025, 9, 14, tzinfo=datetime.timezone.utc)
+    with Stubber(store.client) as stub:
+        stub.add_response(
+            "list_objects_v2",
+            {"Contents": [{"Key": "recordings/2025/09/14/a.wav", "Size": 10, "LastModified": modified}],
+             "NextContinuationToken": "next"},
+            {"Bucket": "bucket", "Prefix": "recordings/2025/09/14/", "MaxKeys": 1},
+        )
+        stub.add_response(
+            "list_objects_v2",
+            {"Contents": []},
+            {"Bucket": "bucket", "Prefix": "recordings/2025/09/14/", "MaxKeys": 1, "ContinuationToken": "next"},
+        )
+        first = store.list_recordings("2025-09-14", limit=1)
+        second = store.list_recordings("2025-09-14", limit=1, page_token=first["next_page_token"])
+
+    assert first["recordings"] == [{"key": "recordings/2025/09/14/a.wav", "size": 10, "last_modified": modified.isoformat()}]
+    assert first["next_page_token"] == "next"
+    assert second == {"prefix": "recordings/2025/09/14/", "recordings": [], "next_page_token": None}
+
+
+def test_recorder_route_returns_presigned_url(monkeypatch):
+    monkeypatch.setenv("SESSION_DB", ":memory:")
+    from starlette.testclient import TestClient
+
+    import mainmcp1
+
+    client = TestClient(mainmcp1.mcp.http_app())
+    resp = client.post("/generate_upload_url", json={"filename": "1700000000_recording.wav"})
+    assert resp.status_code == 200
+    assert resp.headers["access-control-allow-origin"] == "*"
+    assert resp.json()["s3_key"].endswith("/1700000000_recording.wav")
+    assert client.post("/generate_upload_url", json={}).json() == {"error": "filename is required"}
+
+
+def test_recorder_route_rejects_bad_sizes(monkeypatch):
+    monkeypatch.setenv("SESSION_DB", ":memory:")
+    from starlette.testclient import TestClient
+
+    import mainmcp1
+
+    client = TestClient(mainmcp1.mcp.http_app())
+    for size in ("abc", "1.5e9", 1.5e9, -1, True, [1]):
+        resp = client.post("/generate_upload_url", json={"filename": "r.wav", "size_bytes": size})
+        assert resp.status_code == 400, size
+        assert resp.json() == {"error": "size_bytes must be a non-negative integer"}
+    assert client.post("/generate_upload_url", json=["r.wav"]).status_code == 400
+    assert client.post("/generate_upload_url", json={"filename": "r.wav", "size_bytes": 1024}).status_code == 200
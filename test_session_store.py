@@ -0,0 +1,114 @@
+import sqlite3
+import threading
+import time
+
+from session_store import MemorySessionStore, SQLiteSessionStore, open_session_store
+
+
+def _claim_all(store, client_id, candidates, claimed):
+    def claim(sess):
+        path = next((p for p in candidates if p not in sess["used_paths"]), None)
+        if path is not None:
+            time.sleep(0.001)  # widen the read-modify-write window
+            sess["used_paths"].add(path)
+            sess["claims"] += 1
+        return path
+
+    while (path := store.update(client_id, claim)) is not None:
+        claimed.append(path)
+
+
+def test_concurrent_claims_across_connections_never_share_a_path(tmp_path):
+    path = str(tmp_path / "sessions.db")
+    candidates = [f"{i}_a.wav" for i in range(40)]
+    stores = [SQLiteSessionStore(path), SQLiteSessionStore(path)]
+    stores[0].put("c1", {"claims": 0, "used_paths": set()})
+
+    claimed = [[] for _ in range(4)]
+    threads = [
+        threading.Thread(target=_claim_all, args=(stores[i % 2], "c1", candidates, claimed[i]))
+        for i in range(4)
+    ]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+
+    everything = [p for c in claimed for p in c]
+    assert sorted(everything) == sorted(candidates)  # each path claimed exactly once
+    sess = stores[1].get("c1")
+    assert sess["claims"] == 40
+    assert set(sess["used_paths"]) == set(candidates)
+
+
+def test_used_paths_round_trip(tmp_path):
+    store = SQLiteSessionStore(str(tmp_path / "sessions.db"))
+    store.put("c1", {"name": "Ann", "used_paths": {"1_a.wav", "2_b.wav"}})
+    store.put("c2", {"name": "Bob", "used_paths": set()})
+    store.put("c3", {"name": "Cat"})
+
+    def swap(sess):
+        sess["used_paths"].discard("1_a.wav")
+        sess["used_paths"].add("3_c.wav")
+
+    store.update("c1", swap)
+    c1 = store.get("c1")
+    assert c1["name"] == "Ann"
+    assert set(c1["used_paths"]) == {"2_b.wav", "3_c.wav"}
+    assert "3_c.wav" in c1["used_paths"] and "1_a.wav" not in c1["used_paths"]
+    assert len(c1["used_paths"]) == 2
+    assert set(store.get("c2")["used_paths"]) == set()  # empty set survives
+    assert "used_paths" not in store.get("c3")
+
+    # put() replaces the paths, including when given a loaded session back
+    store.put("c2", store.get("c1"))
+    store.put("c1", {"used_paths": {"9_z.wav"}})
+    assert set(store.get("c1")["used_paths"]) == {"9_z.wav"}
+    assert set(store.get("c2")["used_paths"]) == {"2_b.wav", "3_c.wav"}
+
+
+def test_membership_is_a_lookup_not_a_full_load(tmp_path):
+    store = SQLiteSessionStore(str(tmp_path / "sessions.db"))
+    store.put("c1", {"used_paths": {f"{i}_a.wav" for i in range(1000)}})
+    statements = []
+    store._conn().set_trace_callback(statements.append)
+
+    assert store.update("c1", lambda sess: "500_a.wav" in sess["used_paths"]) is True
+
+    store._conn().set_trace_callback(None)
+    assert not any(s.startswith("SELECT path FROM used_paths") for s in statements)
+    assert any(s.startswith("SELECT 1 FROM used_paths") for s in statements)
+
+
+def test_expired_sessions_are_hidden_and_evicted(tmp_path):
+    path = str(tmp_path / "sessions.db")
+    store = SQLiteSessionStore(path, ttl_s=0.2, evict_every_s=3600)
+    store.put("old", {"used_paths": {"1_a.wav"}})
+    time.sleep(0.3)
+    store.put("new", {"used_paths": {"2_b.wav"}})
+
+    assert store.get("old") is None
+    assert store.update("old", lambda sess: sess) is None
+    assert store.get("new") is not None
+    assert store.evict_expired() == 1
+    with sqlite3.connect(path) as conn:
+        assert conn.execute("SELECT client_id, path FROM used_paths").fetchall() == [("new", "2_b.wav")]
+
+
+def test_memory_store_is_the_in_process_option():
+    store = open_session_store(":memory:", ttl_s=60)
+    assert isinstance(store, MemorySessionStore)
+    store.put("c1", {"used_paths": set()})
+    store.update("c1", lambda sess: sess["used_paths"].add("1_a.wav"))
+    assert store.get("c1")["used_paths"] == {"1_a.wav"}
+
+
+def test_sessions_are_found_by_upload_token(tmp_path):
+    for store in (MemorySessionStore(ttl_s=0.2), SQLiteSessionStore(str(tmp_path / "sessions.db"), ttl_s=0.2)):
+        store.put("c1", {"upload_token": "0badc0de", "used_paths": set()})
+        store.put("c2", {"used_paths": set()})
+
+        assert store.client_for_token("0badc0de") == "c1"
+        assert store.client_for_token("feedf00d") is None
+        time.sleep(0.3)
+        assert store.client_for_token("0badc0de") is None  # expired sessions hold no tokens
@@ -0,0 +1,137 @@
+import time
+
+import numpy as np
+import pytest
+
+import voice_features
+from round_engine import Lobby, RoundEngine
+from speaker_index import LocalSpeakerIndex, open_speaker_index
+
+RATE = voice_features.RATE
+VOWELS = [(730, 1090, 2440), (270, 2290, 3010), (300, 870, 2240), (530, 1840, 2480), (570, 840, 2410), (660, 1720, 2410)]
+# (f0 Hz, vocal tract scale, spectral tilt) per synthetic speaker
+SPEAKERS = {"ann": (120, 1.0, 1.0), "bob": (210, 1.18, 0.6), "cat": (135, 0.92, 1.4), "dan": (180, 1.1, 1.0)}
+
+
+def _voice(f0, tract, tilt, seed, seconds=3.0):
+    """A sequence of random vowels from one synthetic vocal tract."""
+    rng = np.random.default_rng(seed)
+    seg = int(0.18 * RATE)
+    out = []
+    for _ in range(int(seconds * RATE) // seg):
+        formants = np.array(VOWELS[rng.integers(len(VOWELS))]) * tract
+        t = np.arange(seg) / RATE
+        f = f0 * (1 + 0.05 * rng.standard_normal())
+        h = f * np.arange(1, int(4000 / f))[:, None]
+        amp = sum(1 / (1 + ((h - F) / (60 + 0.06 * F)) ** 2) for F in formants) * (h / 100) ** -tilt
+        x = (amp * np.sin(2 * np.pi * h * t + rng.uniform(0, 6.28, size=h.shape))).sum(axis=0)
+        out.append(x * np.sin(np.pi * np.arange(seg) / seg))
+    x = np.concatenate(out)
+    return (0.3 * x / np.abs(x).max() + 0.002 * rng.standard_normal(len(x))).astype(np.float32)
+
+
+@pytest.fixture(scope="module")
+def enrolled():
+    index = LocalSpeakerIndex()
+    for n, (name, voice) in enumerate(SPEAKERS.items()):
+        clips = [_voice(*voice, seed=10 * n + k) for k in range(3)]
+        index.replace(name, voice_features.speaker_embeddings(clips), clip_ids=[f"{name}{k}.wav" for k in range(3)])
+    answers = voice_features.speaker_embeddings([_voice(*v, seed=1000 + n) for n, v in enumerate(SPEAKERS.values())])
+    return index, dict(zip(SPEAKERS, answers))
+
+
+def test_answers_match_their_own_baseline(enrolled):
+    index, answers = enrolled
+    checks = index.verify(list(answers.items()))
+    assert [c["verified"] for c in checks] == [True] * 4
+    assert [hits[0][0] for hits in index.search(np.stack(list(answers.values())), k=2)] == list(SPEAKERS)
+
+
+def test_someone_else_recording_is_flagged(enrolled):
+    index, answers = enrolled
+    (check,) = index.verify([("ann", answers["cat"])])
+    assert check["verified"] is False
+    assert check["closest"] == "cat"
+
+
+def test_too_few_voices_or_no_baseline_is_undecided():
+    index = LocalSpeakerIndex(dim=4)
+    index.replace("a", np.eye(4)[:2])
+    index.replace("b", np.eye(4)[2:])
+    checks = index.verify([("a", np.eye(4)[0]), ("nobody", np.eye(4)[1])])
+    assert [c["verified"] for c in checks] == [None, None]
+
+
+def test_memory_mapped_index_grows_and_persists(tmp_path):
+    path = str(tmp_path / "speakers" / "index.npy")
+    rng = np.random.default_rng(0)
+    index = open_speaker_index(path)
+    assert isinstance(index, LocalSpeakerIndex)
+    small = LocalSpeakerIndex(path, dim=8, capacity=2)
+    vectors = {s: rng.standard_normal((3, 8)).astype(np.float32) for s in "abcd"}
+    for s, v in vectors.items():
+        small.replace(s, v)
+    small.replace("b", vectors["b"][:2])  # re-enrolment moves b to the end
+    small.flush()
+    queries = rng.standard_normal((5, 8)).astype(np.float32)
+    expected = small.scores(queries, ["a", "b", "c", "d"])
+
+    reopened = LocalSpeakerIndex(path, dim=8)
+    assert reopened.speakers() == ["a", "c", "d", "b"] and len(reopened) == 11
+    np.testing.assert_allclose(reopened.scores(queries, ["a", "b", "c", "d"]), expected, rtol=1e-5)
+    np.testing.assert_array_equal(np.load(path, mmap_mode="r")[9:11], vectors["b"][:2])
+    with pytest.raises(ValueError):
+        open_speaker_index("qdrant://localhost:6333/voices")
+
+
+def test_round_verification_takes_milliseconds():
+    rng = np.random.default_rng(1)
+    index = LocalSpeakerIndex()
+    for i in range(2000):
+        index.replace(f"p{i}", rng.standard_normal((3, voice_features.EMBED_DIM)))
+    players = [f"p{i}" for i in range(8)]
+    claims = [(p, rng.standard_normal(voice_features.EMBED_DIM).astype(np.float32)) for p in players]
+    index.verify(claims, candidates=players)  # builds the centered matrix once
+    t0 = time.perf_counter()
+    for _ in range(20):
+        index.verify(claims, candidates=players)
+    assert (time.perf_counter() - t0) / 20 < 0.01
+
+
+def test_engine_flags_a_mismatched_voice(enrolled):
+    index, answers = enrolled
+    lobby = Lobby()
+    for p in ("ann", "bob", "cat"):
+        lobby.join(p, p)
+    rnd = lobby.start_round("5", 30)
+    results = {
+        p: {"bluff_score": 10, "reasons": ["delivery consistent with baseline"], "embedding": answers[e].tolist()}
+        for p, e in (("ann", "ann"), ("bob", "bob"), ("cat", "dan"))
+    }
+    RoundEngine(fetch=None, speaker_index=index)._check_voices(rnd, results)
+    assert all("embedding" not in r for r in results.values())
+    assert results["ann"]["voice_check"]["verified"] is True
+    assert results["cat"]["voice_check"]["verified"] is False
+    assert results["cat"]["reasons"][0] in ("voice differs from the baseline recordings", "voice matches another player's baseline")
+
+
+def test_in_memory_index_keeps_speakers_when_it_grows():
+    index = LocalSpeakerIndex(None, dim=4, capacity=2)
+    index.replace("a", np.eye(4)[:2])
+    index.replace("b", np.eye(4)[2:3])  # doubles the matrix
+
+    np.testing.assert_array_equal(index._matrix[:3], np.eye(4)[:3])
+    assert index._spans == {"a": (0, 2), "b": (2, 3)}
+
+
+def test_silent_clips_drop_their_ids_too():
+    index = LocalSpeakerIndex(dim=4)
+    index.replace("x", np.stack([np.eye(4)[0], np.zeros(4), np.eye(4)[1]]), ["first", "silent", "last"])
+    index.replace("y", np.eye(4)[2:3], ["y1"])
+
+    assert index._clips == ["first", "last", "y1"]
+    assert index._spans == {"x": (0, 2), "y": (2, 3)}
+    index.remove("x")
+    assert index._clips == ["y1"]
+    with pytest.raises(ValueError):
+        index.replace("z", np.eye(4)[:2], ["only-one"])
@@ -0,0 +1,35 @@
+import json
+import os
+import subprocess
+import sys
+
+# Generous on purpose: the fastmcp import alone is most of it on a cold interpreter
+BUDGET_S = float(os.environ.get("STARTUP_BUDGET_S", "1.5"))
+
+PROBE = """
+import asyncio, json, sys, time
+t0 = time.perf_counter()
+import mainmcp1
+imported = time.perf_counter() - t0
+heavy = [m for m in ("numpy", "mistralai", "boto3", "huggingface_hub.hf_api") if m in sys.modules]
+
+async def first_call():
+    from fastmcp import Client
+    async with Client(mainmcp1.mcp) as client:
+        return await client.call_tool("start_game")
+
+result = asyncio.run(first_call())
+print(json.dumps({"import_s": imported, "first_call_s": time.perf_counter() - t0,
+                  "heavy": heavy, "text": result.content[0].text}))
+"""
+
+
+def test_cold_start_stays_light():
+    env = dict(os.environ, SESSION_DB=":memory:")
+    out = subprocess.run([sys.executable, "-c", PROBE], env=env, capture_output=True, text=True,
+                         cwd=os.path.dirname(os.path.abspath(__file__)), timeout=60)
+    assert out.returncode == 0, out.stderr
+    probe = json.loads(out.stdout.strip().splitlines()[-1])
+    assert probe["heavy"] == []
+    assert "expect_tool" in probe["text"]
+    assert probe["first_call_s"] < BUDGET_S, probe
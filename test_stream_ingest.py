@@ -0,0 +1,165 @@
+import hashlib
+import os
+import shutil
+import threading
+import time
+import wave
+
+import numpy as np
+import pytest
+
+import audio_prep
+import stream_ingest
+import voice_features
+from audio_cache import AudioCache
+from stream_ingest import StreamIngest
+
+RATE = 48000
+
+
+def _speech_then_silence(seconds=6, silence_s=1.5):
+    t = np.arange(int(seconds * RATE)) / RATE
+    voice = sum(np.sin(2 * np.pi * 140 * k * t) / k for k in range(1, 6))
+    envelope = 0.5 * (1 - np.cos(2 * np.pi * 4.0 * t))
+    x = 0.2 * voice * envelope * (t < seconds - silence_s)
+    x += 0.002 * np.random.default_rng(0).standard_normal(len(t))
+    return (np.clip(x, -1, 1) * 32767).astype("<i2")
+
+
+NAME = "1700000000_cm-0badc0de_recording.wav"
+
+
+def _keep(monkeypatch, directory):
+    """Keep each finished WAV at directory/take.wav instead of deleting it."""
+    directory.mkdir()
+    monkeypatch.setattr(stream_ingest, "_remove", lambda path: shutil.move(path, directory / "take.wav"))
+    return directory / "take.wav"
+
+
+def test_stream_writes_wav_incrementally_and_tracks_speech(tmp_path, monkeypatch):
+    kept = str(_keep(monkeypatch, tmp_path / "kept"))
+    ingest = StreamIngest(str(tmp_path / "streams"))
+    pcm = _speech_then_silence()
+    sid = ingest.start(NAME, RATE)
+    stream = ingest.get(sid)
+
+    chunk = RATE // 4 * 2  # 250 ms, plus an odd byte split to exercise re-alignment
+    data = pcm.tobytes()
+    statuses = [stream.append(data[i : i + chunk + 1]) for i in range(0, len(data), chunk + 1)]
+
+    assert any(s["speaking"] for s in statuses[:8])
+    assert statuses[-1]["trailing_silence_s"] > 1.0
+    assert 3.5 < statuses[-1]["speech_s"] < 5.0
+
+    t0 = time.perf_counter()
+    result = ingest.finish(sid)
+    close_s = time.perf_counter() - t0
+
+    with wave.open(kept, "rb") as w:
+        assert (w.getframerate(), w.getnchannels(), w.getnframes()) == (RATE, 1, len(pcm))
+        assert w.readframes(w.getnframes()) == data
+    batch = voice_features.as_dicts(voice_features.extract_batch([kept]))[0]
+    assert result["name"] == NAME
+    assert result["features"]["pitch_mean_hz"] == pytest.approx(batch["pitch_mean_hz"], rel=1e-3)
+    assert result["features"]["pitch_mean_hz"] == pytest.approx(140, rel=0.05)
+    assert close_s < 0.2
+    assert len(ingest) == 0
+    digest = hashlib.sha256(open(kept, "rb").read()).hexdigest()
+    assert ingest.features(NAME, digest) == result["features"]
+    assert ingest.features(NAME, None) is None  # published file not seen yet
+    assert list((tmp_path / "streams").iterdir()) == []
+
+
+def test_untagged_tampered_and_expired_takes_are_not_trusted(tmp_path):
+    ingest = StreamIngest(str(tmp_path), features_ttl_s=0.1)
+    for name in ("1700000000_recording.wav", NAME):
+        sid = ingest.start(name, 16000)
+        ingest.get(sid).append(b"\0\0" * 16000)
+        ingest.finish(sid)
+    streamed = hashlib.sha256(audio_prep.encode_wav(np.zeros(16000, dtype=np.float32), 16000)).hexdigest()
+
+    assert ingest.features("1700000000_recording.wav", streamed) is None  # no token, no owner
+    assert ingest.features(NAME, streamed) is not None
+    assert ingest.features(NAME, hashlib.sha256(b"something else was published").hexdigest()) is None
+    assert list(tmp_path.iterdir()) == []  # WAVs are deleted on close
+    time.sleep(0.15)
+    assert ingest.features(NAME, streamed) is None
+    ingest.reap()
+    assert not ingest._finished
+
+
+def test_chunks_racing_close_never_tear_the_wav(tmp_path, monkeypatch):
+    kept = _keep(monkeypatch, tmp_path / "kept")
+    ingest = StreamIngest(str(tmp_path / "streams"))
+    sid = ingest.start(NAME, 16000)
+    stream = ingest.get(sid)
+    outcomes = []
+
+    def send():
+        for _ in range(2000):
+            try:
+                stream.append(b"\1\0" * 160)
+                outcomes.append("ok")
+            except KeyError:
+                outcomes.append("closed")
+                return
+
+    sender = threading.Thread(target=send)
+    sender.start()
+    time.sleep(0.01)
+    ingest.finish(sid)
+    sender.join()
+
+    with wave.open(str(kept), "rb") as w:
+        frames = w.getnframes()
+        assert len(w.readframes(frames)) == 2 * frames
+    assert frames == 160 * outcomes.count("ok")
+    assert os.path.getsize(kept) == 44 + 2 * frames
+
+
+def test_stream_limits(tmp_path):
+    ingest = StreamIngest(str(tmp_path), max_streams=1, idle_timeout_s=0.0)
+    with pytest.raises(ValueError):
+        ingest.start("x.wav", 1000)
+    sid = ingest.start("x.wav", 16000)
+    with pytest.raises(ValueError):
+        ingest.get(sid).append(b"\0\0" * (121 * 16000))
+    # Idle streams are reaped, freeing the slot and the file
+    path = ingest.get(sid).path
+    assert ingest.reap() == 1
+    assert not (tmp_path / path.rsplit("/", 1)[-1]).exists()
+    ingest.start("y.wav", 16000)
+
+
+def test_stream_routes(monkeypatch, tmp_path):
+    monkeypatch.setenv("SESSION_DB", ":memory:")
+    from starlette.testclient import TestClient
+
+    import mainmcp1
+
+    cache = AudioCache(str(tmp_path / "cache"), fetch=None)
+    ingest = StreamIngest(str(tmp_path / "streams"))
+    monkeypatch.setattr(mainmcp1, "_streams", lambda: ingest)
+    monkeypatch.setattr(mainmcp1, "_AUDIO", cache)
+    client = TestClient(mainmcp1.mcp.http_app())
+    sid = client.post("/stream/start", json={"filename": NAME, "sample_rate": RATE}).json()["stream_id"]
+    pcm = _speech_then_silence(seconds=2, silence_s=0.5)
+    live = client.post(f"/stream/{sid}/chunk", content=pcm.tobytes(), headers={"Content-Type": "application/octet-stream"}).json()
+    assert live["seconds"] == 2.0
+    done = client.post(f"/stream/{sid}/close").json()
+    assert done["features"]["duration_s"] > 1.0
+    assert client.post(f"/stream/{sid}/chunk", content=b"\0\0").status_code == 404
+    assert mainmcp1._streamed_features(NAME) is None  # nothing published under that name yet
+
+    # The recorder page uploads the same take as a WAV; once those bytes are
+    # the published file, the streamed features are reused
+    published = tmp_path / "published.wav"
+    published.write_bytes(stream_ingest._wav_header(RATE, 1, 2 * len(pcm)) + pcm.tobytes())
+    cache.put(NAME, str(published))
+    assert mainmcp1._streamed_features(NAME) == done["features"]
+
+    # Anything else published under the name (or a stream that lied) is not trusted
+    other = tmp_path / "other.wav"
+    other.write_bytes(audio_prep.encode_wav(np.zeros(RATE, dtype=np.float32), RATE))
+    cache.put(NAME, str(other))
+    assert mainmcp1._streamed_features(NAME) is None
@@ -0,0 +1,81 @@
+import math
+import time
+
+import numpy as np
+import pytest
+
+import transcript_features
+from transcript_features import TEXT_FEATURE_NAMES, TranscriptScorer
+
+ROUND_BUDGET_S = 0.005  # score_batch for one 8-player round
+
+READ = (
+    "On a typical Saturday, I wake up, drink water, and take a walk. The weather is mild and the streets are quiet."
+)
+HONEST = "Last night I cooked pasta with my sister, then I watched a film and went to bed around eleven."
+BLUFF = (
+    "Um, well, so they, uh, you know, it was kind of a party I guess, sorry, no wait, "
+    "it was at at a friend's place, someone brought, um, food and people were there, probably."
+)
+
+
+def _row(matrix, i):
+    return dict(zip(TEXT_FEATURE_NAMES, matrix[i]))
+
+
+def test_lexicon_counts_and_reasons():
+    scorer = TranscriptScorer()
+    m = scorer.score_batch([HONEST, BLUFF, None], durations=[5.0, 12.0, 3.0])
+    honest, bluff = _row(m, 0), _row(m, 1)
+
+    assert honest["words"] == 19 and honest["words_per_s"] == pytest.approx(19 / 5)
+    assert honest["filler_rate"] == 0 and honest["hedge_rate"] == 0
+    assert bluff["filler_rate"] > 0.1
+    assert bluff["hedge_rate"] > 0.05
+    assert bluff["self_corrections"] >= 3  # "sorry", "no wait", "at at"
+    assert bluff["distancing_ratio"] > honest["distancing_ratio"]
+    assert np.isnan(m[2]).all()
+
+    assert transcript_features.reasons(m[0]) == []
+    cues = transcript_features.reasons(m[1])
+    assert cues[:3] == ["hesitation patterns (fillers)", "hedging language", "self-corrections"]
+    assert transcript_features.as_dicts(m)[0]["read_accuracy"] is None
+
+
+def test_ordinary_like_and_well_are_not_fillers():
+    # Prompt 2: "What do you like to do in your free time?"
+    answer = ("I like to cook, and I like hiking as well. On weekends I like to go to the market, "
+              "then I read a book that I like in the park. It is a good way to rest.")
+    m = TranscriptScorer().score_batch([answer, "It was, like, fine. Well, I stayed home."], durations=[10.0, 3.0])
+    plain, filled = _row(m, 0), _row(m, 1)
+
+    assert plain["filler_rate"] == 0
+    assert plain["distancing_ratio"] == 0  # "that" and "it" are not distancing
+    assert transcript_features.reasons(m[0]) == []
+    assert filled["filler_rate"] == pytest.approx(2 / 8)
+
+
+def test_read_aloud_alignment():
+    scorer = TranscriptScorer({"3": READ})
+    faithful = READ.replace("Saturday,", "Saturday")
+    skipped = "On a Saturday I wake up and take a walk, the weather is nice."
+    m = scorer.score_batch([faithful, skipped, HONEST], prompt_ids=["3", "3", "5"])
+
+    assert _row(m, 0)["read_accuracy"] == 1.0
+    assert 0.5 < _row(m, 1)["read_accuracy"] < 0.8
+    assert math.isnan(_row(m, 2)["read_accuracy"])
+    assert "strayed from the read-aloud text" in transcript_features.reasons(m[1])
+
+
+def test_round_batch_benchmark():
+    """A full 8-player round of ~30 s transcripts scores in low milliseconds."""
+    scorer = TranscriptScorer({"3": READ, "4": READ})
+    transcripts = [(BLUFF + " " + HONEST) * 2 for _ in range(8)]
+    scorer.score_batch(transcripts)  # warm up
+
+    runs = 50
+    t0 = time.perf_counter()
+    for _ in range(runs):
+        scorer.score_batch(transcripts, durations=[30.0] * 8, prompt_ids=["3"] * 8)
+    per_round = (time.perf_counter() - t0) / runs
+    assert per_round < ROUND_BUDGET_S, f"8 transcripts took {per_round * 1000:.2f} ms"
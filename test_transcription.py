@@ -0,0 +1,235 @@
+import asyncio
+import json
+import threading
+import time
+import uuid
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import pytest
+
+from transcription import AudioTranscriber
+
+STUB_LATENCY_S = 0.2
+
+
+class MistralStub(BaseHTTPRequestHandler):
+    """
+    Local stand-in for the three Mistral endpoints AudioTranscriber uses.
+    Uploads whose bytes contain b"FAIL" always get a 500; b"FLAKY" gets a
+    500 on the first attempt only.
+    """
+
+    files = {}
+    attempts = {}
+    uploads = 0
+    lock = threading.Lock()
+
+    def log_message(self, *args):
+        pass
+
+    def _json(self, status, body):
+        data = json.dumps(body).encode()
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+    def do_POST(self):
+        body = self.rfile.read(int(self.headers.get("Content-Length", 0)))
+        time.sleep(STUB_LATENCY_S)
+        if self.path == "/v1/files":
+            with self.lock:
+                if b"FAIL" in body:
+                    return self._json(500, {"message": "upstream error"})
+                if b"FLAKY" in body:
+                    self.attempts["FLAKY"] = self.attempts.get("FLAKY", 0) + 1
+                    if self.attempts["FLAKY"] == 1:
+                        return self._json(503, {"message": "try again"})
+                file_id = str(uuid.uuid4())
+                self.files[file_id] = body
+                MistralStub.uploads += 1
+            return self._json(200, {
+                "id": file_id, "object": "file", "size_bytes": len(body), "created_at": 0,
+                "filename": "audio.wav", "purpose": "audio", "sample_type": "instruct", "source": "upload",
+            })
+        if self.path == "/v1/audio/transcriptions":
+            file_id = next(f for f in self.files if f.encode() in body)
+            return self._json(200, {
+                "model": "voxtral-mini-latest", "text": f"text for {file_id}", "language": "en", "usage": {},
+            })
+        self._json(404, {"message": "not found"})
+
+    def do_GET(self):
+        time.sleep(STUB_LATENCY_S)
+        # /v1/files/{id}/url?expiry=24
+        file_id = self.path.split("/")[3]
+        self._json(200, {"url": f"http://stub/{file_id}"})
+
+
+class StubServer(ThreadingHTTPServer):
+    # Default backlog (5) makes a burst of concurrent connects wait on SYN retries
+    request_queue_size = 64
+
+
+@pytest.fixture()
+def stub_url():
+    server = StubServer(("127.0.0.1", 0), MistralStub)
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    yield f"http://127.0.0.1:{server.server_port}"
+    server.shutdown()
+
+
+def test_transcribe_many_runs_files_concurrently(stub_url):
+    transcriber = AudioTranscriber(api_key="test", server_url=stub_url, max_concurrency=8, cache_dir="")
+    sources = [(f"p{i}.wav", f"audio-{i}".encode()) for i in range(8)]
+    transcriber.client  # built lazily; keep the SDK import out of the timing
+
+    t0 = time.perf_counter()
+    results = asyncio.run(transcriber.transcribe_many(sources))
+    elapsed = time.perf_counter() - t0
+
+    assert [r["source"] for r in results] == [f"p{i}.wav" for i in range(8)]
+    assert all(r["error"] is None and r["text"].startswith("text for") for r in results)
+    # 3 round trips per file; sequentially this would be 8 * 3 * latency
+    assert elapsed < 3 * STUB_LATENCY_S * 2
+
+
+def test_transcribe_many_retries_and_isolates_failures(stub_url):
+    transcriber = AudioTranscriber(api_key="test", server_url=stub_url, max_retries=2, backoff_s=0.01, cache_dir="")
+    sources = [("ok.wav", b"fine"), ("flaky.wav", b"FLAKY"), ("bad.wav", b"FAIL"), "missing.wav"]
+
+    ok, flaky, bad, missing = asyncio.run(transcriber.transcribe_many(sources))
+
+    assert ok["error"] is None
+    assert flaky["error"] is None
+    assert bad["text"] is None and "Transcription failed" in bad["error"]
+    assert missing["text"] is None and "not found" in missing["error"]
+
+
+def test_cache_serves_repeats_and_collapses_concurrent_misses(stub_url, tmp_path):
+    transcriber = AudioTranscriber(api_key="test", server_url=stub_url, cache_dir=str(tmp_path))
+    before = MistralStub.uploads
+
+    async def batch():
+        # Two identical uncached clips in one batch share one upstream call
+        return await transcriber.transcribe_many([("a.wav", b"same clip"), ("b.wav", b"same clip")])
+
+    first, second = asyncio.run(batch())
+    assert first["text"] == second["text"]
+    assert MistralStub.uploads == before + 1
+
+    # A later sync call for the same bytes is a cache hit, no upload
+    assert transcriber.transcribe_from_bytes(b"same clip", "c.wav") == first["text"]
+    assert MistralStub.uploads == before + 1
+
+    stats = transcriber.cache_stats()
+    assert stats["hits"] == 1 and stats["collapsed"] == 1 and stats["entries"] == 1
+
+    # Cached on disk: a fresh transcriber picks it up
+    again = AudioTranscriber(api_key="test", server_url=stub_url, cache_dir=str(tmp_path))
+    assert again.transcribe_from_bytes(b"same clip") == first["text"]
+    assert MistralStub.uploads == before + 1
+
+
+def test_transcribe_chunked_splits_long_recording_on_pauses(stub_url):
+    import numpy as np
+    import audio_prep
+
+    rate = 16000
+    t = np.arange(rate * 32) / rate
+    speech = np.zeros_like(t)
+    # 1 s of leading silence, then 4 s phrases separated by 0.5 s pauses
+    for k in range(6):
+        on = (t >= 1 + 4.5 * k) & (t < 5 + 4.5 * k)
+        speech[on] = 0.3 * np.sin(2 * np.pi * 180 * t[on])
+    data = audio_prep.encode_wav(speech.astype(np.float32), rate)
+
+    transcriber = AudioTranscriber(api_key="test", server_url=stub_url, max_concurrency=8, cache_dir="")
+    before = MistralStub.uploads
+    result = asyncio.run(transcriber.transcribe_chunked(("long.wav", data), max_segment_s=10))
+
+    segments = result["segments"]
+    assert result["error"] is None
+    assert len(segments) == 3 == MistralStub.uploads - before
+    assert segments[0]["start"] >= 0.9  # leading silence dropped
+    assert all(a["end"] <= b["start"] for a, b in zip(segments, segments[1:]))
+    assert all(s["end"] - s["start"] <= 10 for s in segments)
+    assert result["text"] == " ".join(s["text"] for s in segments)
+
+
+def test_preprocess_shrinks_uploads_and_reports_savings(stub_url):
+    import io
+    import wave
+
+    import numpy as np
+
+    rate = 48000
+    tone = (0.3 * np.sin(2 * np.pi * 220 * np.arange(rate * 3) / rate) * 32767).astype("<i2")
+    buf = io.BytesIO()
+    with wave.open(buf, "wb") as w:
+        w.setnchannels(2)
+        w.setsampwidth(2)
+        w.setframerate(rate)
+        w.writeframes(np.repeat(tone, 2).tobytes())
+    data = buf.getvalue()
+
+    transcriber = AudioTranscriber(api_key="test", server_url=stub_url, cache_dir="", preprocess=True)
+    result, = asyncio.run(transcriber.transcribe_many([("stereo48k.wav", data)]))
+    assert result["error"] is None
+
+    stats = transcriber.preprocess_stats
+    assert stats["files"] == 1 and stats["bytes_in"] == len(data)
+    # stereo 48 kHz -> mono 16 kHz is a 6x reduction
+    assert stats["bytes_out"] < len(data) / 5
+    assert stats["bytes_saved"] == stats["bytes_in"] - stats["bytes_out"]
+    assert stats["seconds"] > 0
+
+
+def test_failed_cache_write_still_releases_followers(stub_url, tmp_path):
+    transcriber = AudioTranscriber(api_key="test", server_url=stub_url, cache_dir=str(tmp_path))
+
+    def broken_put(key, text):
+        raise OSError("disk full")
+
+    transcriber.cache.put = broken_put
+
+    async def batch():
+        return await asyncio.wait_for(
+            transcriber.transcribe_many([("a.wav", b"full disk clip"), ("b.wav", b"full disk clip")]), 5
+        )
+
+    leader, follower = asyncio.run(batch())
+    assert leader["error"] is None and follower["text"] == leader["text"]
+    assert transcriber._inflight == {}
+
+
+def test_only_network_and_server_errors_are_retried():
+    import httpx
+
+    from transcription import _is_transient
+
+    class ApiError(Exception):
+        def __init__(self, status_code):
+            self.status_code = status_code
+
+    transcriber = AudioTranscriber(api_key="test", max_retries=3, backoff_s=0.001, cache_dir="")
+
+    def attempts(error):
+        calls = []
+
+        async def call():
+            calls.append(1)
+            raise error
+
+        with pytest.raises(type(error)):
+            asyncio.run(transcriber._retry(call))
+        return len(calls)
+
+    assert attempts(httpx.ConnectError("refused")) == 4
+    assert attempts(httpx.ReadTimeout("slow")) == 4
+    assert attempts(ApiError(503)) == 4 and attempts(ApiError(429)) == 4
+    assert attempts(ApiError(400)) == 1
+    assert attempts(ValueError("bug")) == 1 and attempts(TypeError("bug")) == 1
+    assert _is_transient(TimeoutError()) and _is_transient(ConnectionResetError())
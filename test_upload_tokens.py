@@ -0,0 +1,180 @@
+import asyncio
+import os
+import time
+from types import SimpleNamespace
+
+os.environ.setdefault("SESSION_DB", ":memory:")
+
+import pytest
+
+import mainmcp1
+from dataset_listing import DatasetListingCache, upload_token
+
+MINE, THEIRS = "0badc0de", "feedf00d"
+
+
+class FakeHub:
+    """HfApi stand-in: head SHA, file list and upload_file."""
+
+    def __init__(self, files=()):
+        self.files = list(files)
+        self.uploads = []
+
+    def repo_info(self, repo_id, repo_type, expand):
+        return SimpleNamespace(sha=f"{len(self.files):040d}")
+
+    def list_repo_files(self, repo_id, repo_type, revision):
+        return list(self.files)
+
+    def upload_file(self, path_or_fileobj, path_in_repo, repo_id, repo_type, commit_message):
+        self.uploads.append((path_in_repo, path_or_fileobj.read()))
+        self.files.append(path_in_repo)
+
+
+@pytest.fixture
+def hub(monkeypatch):
+    hub = FakeHub()
+    monkeypatch.setattr(mainmcp1, "_api", lambda: hub)
+    monkeypatch.setattr(mainmcp1, "_LISTING", DatasetListingCache("me/audio", lambda: hub))
+    return hub
+
+
+def test_tagged_name_parsing():
+    assert upload_token(f"1699999999_cm-{MINE}_recording.wav") == MINE
+    assert upload_token(f"1699999999_CM-{MINE.upper()}_recording.WAV") == MINE
+    assert upload_token("1699999999_recording.wav") is None
+    assert upload_token("1699999999_cm-0badc0d_recording.wav") is None  # 7 hex chars
+    assert upload_token(f"1699999999_cm-{MINE}_recording.mp3") is None
+    assert upload_token(f"cm-{MINE}_recording.wav") is None  # no epoch
+
+
+def test_client_only_sees_its_own_uploads(hub, monkeypatch):
+    now = int(time.time())
+    hub.files += [f"{now}_cm-{THEIRS}_recording.wav", f"{now + 1}_plain.wav", f"{now + 2}_cm-{MINE}_recording.wav",
+                  f"{now - 100}_cm-{MINE}_old.wav"]
+
+    assert mainmcp1._list_wav_paths_since(now, MINE) == [f"{now + 2}_cm-{MINE}_recording.wav"]
+    assert mainmcp1._list_wav_paths_since(now, "00000000") == []
+    assert not mainmcp1._owns_upload(MINE, f"{now + 1}_plain.wav")
+    assert not mainmcp1._owns_upload(MINE, f"{now}_cm-{THEIRS}_recording.wav")
+
+    monkeypatch.setattr(mainmcp1, "UNTAGGED_UPLOADS", True)
+    assert mainmcp1._list_wav_paths_since(now, MINE) == [f"{now + 2}_cm-{MINE}_recording.wav", f"{now + 1}_plain.wav"]
+    assert mainmcp1._owns_upload(MINE, f"{now + 1}_plain.wav")
+
+
+def test_validation_never_claims_another_clients_upload(hub, monkeypatch):
+    clients = iter(["ann", "bob", "ann", "bob"])
+    monkeypatch.setattr(mainmcp1, "_client_id", lambda: next(clients))
+
+    async def scenario():
+        await mainmcp1.start_baseline_recording.fn()
+        await mainmcp1.start_baseline_recording.fn()
+        tokens = {c: mainmcp1.SESSIONS.get(c)["upload_token"] for c in ("ann", "bob")}
+        now = int(time.time())
+        uploads = {c: f"{now + i}_cm-{t}_recording.wav" for i, (c, t) in enumerate(sorted(tokens.items(), reverse=True))}
+        # Bob's upload (and a stray untagged one) land before Ann's
+        hub.files += [uploads["bob"], f"{now}_plain.wav", uploads["ann"]]
+        await mainmcp1.validate_next_upload.fn(wait_seconds=0)
+        await mainmcp1.validate_next_upload.fn(wait_seconds=0)
+        return uploads
+
+    uploads = asyncio.run(scenario())
+    for c in ("ann", "bob"):
+        assert mainmcp1.SESSIONS.get(c)["answers"] == {"1": uploads[c]}
+
+
+def test_publish_copies_tagged_recordings_into_the_dataset(hub, monkeypatch, tmp_path):
+    from starlette.testclient import TestClient
+
+    from audio_cache import AudioCache
+    from session_store import MemorySessionStore
+
+    def download(key, out):
+        out.write(b"RIFF" + key.encode())
+
+    monkeypatch.setattr(mainmcp1.RECORDINGS, "download", download)
+    cache = AudioCache(str(tmp_path), fetch=None)
+    monkeypatch.setattr(mainmcp1, "_AUDIO", cache)
+    client = TestClient(mainmcp1.mcp.http_app())
+    key = f"recordings/2026/10/17/1700000000_cm-{MINE}_recording.wav"
+    monkeypatch.setattr(mainmcp1, "SESSIONS", MemorySessionStore())
+    mainmcp1.SESSIONS.put("me", {"upload_token": MINE, "used_paths": set()})
+
+    # Only the holder of the key's token may publish it
+    forged = client.post("/publish_recording", json={"s3_key": key, "upload_token": THEIRS})
+    untokened = client.post("/publish_recording", json={"s3_key": key})
+    orphan = f"recordings/2026/10/17/1700000000_cm-{THEIRS}_recording.wav"
+    unissued = client.post("/publish_recording", json={"s3_key": orphan, "upload_token": THEIRS})
+    assert forged.status_code == unissued.status_code == 403
+    assert untokened.status_code == 400
+    assert hub.uploads == []
+
+    done = client.post("/publish_recording", json={"s3_key": key, "upload_token": MINE}).json()
+    assert done == {"ok": True, "path": f"1700000000_cm-{MINE}_recording.wav"}
+    assert hub.uploads == [(done["path"], b"RIFF" + key.encode())]
+    assert mainmcp1._LISTING.entries_for(MINE, 0) == [(1700000000, done["path"])]
+    assert open(cache.get(done["path"]), "rb").read() == b"RIFF" + key.encode()  # kept, never downloaded back
+
+    untagged = client.post("/publish_recording", json={"s3_key": "recordings/2026/10/17/1700000000_x.wav", "upload_token": MINE})
+    outside = client.post("/publish_recording", json={"s3_key": f"private/1700000000_cm-{MINE}_x.wav", "upload_token": MINE})
+    assert untagged.status_code == outside.status_code == 400
+    assert client.post("/publish_recording", json=["nope"]).status_code == 400
+    assert len(hub.uploads) == 1
+
+
+def test_client_id_header_is_ignored_unless_trusted(monkeypatch):
+    monkeypatch.setattr(mainmcp1, "get_http_headers", lambda: {"x-client-id": "someone-else"})
+    assert mainmcp1._client_id() == "anonymous"
+
+    monkeypatch.setattr(mainmcp1, "TRUST_CLIENT_ID_HEADER", True)
+    assert mainmcp1._client_id() == "someone-else"
+
+
+def test_every_player_gets_their_own_round_link(hub, monkeypatch):
+    caller = {"cid": "ann"}
+    opened = {}
+    monkeypatch.setattr(mainmcp1, "_client_id", lambda: caller["cid"])
+    monkeypatch.setattr(mainmcp1, "_SCHEDULER", SimpleNamespace(open=lambda lobby, rnd, tokens: opened.update(tokens)))
+
+    async def as_player(cid, tool, **kwargs):
+        caller["cid"] = cid
+        return await tool.fn(**kwargs)
+
+    async def scenario():
+        lobby_id = eval(await as_player("ann", mainmcp1.create_lobby, name="Ann"))["lobby_id"]
+        for cid in ("bob", "cat"):
+            await as_player(cid, mainmcp1.join_lobby, lobby_id=lobby_id, name=cid.title())
+        host = await as_player("ann", mainmcp1.start_round, lobby_id=lobby_id, prompt_id="2")
+        guest = await as_player("bob", mainmcp1.get_round_link, lobby_id=lobby_id)
+        stranger = await as_player("dan", mainmcp1.get_round_link, lobby_id=lobby_id)
+        return host, guest, stranger
+
+    host, guest, stranger = asyncio.run(scenario())
+    assert f"token={opened['ann']}" in host and "Get Round Link" in host
+    assert f"token={opened['bob']}" in guest and opened["bob"] != opened["ann"]
+    assert mainmcp1.RECORDING_PROMPTS["2"] in guest
+    assert "joined after this round started" in stranger
+
+
+def test_a_second_upload_never_replaces_a_submitted_answer(hub, monkeypatch):
+    from round_engine import Lobby
+
+    lobby = Lobby("dup")
+    for p in ("ann", "bob", "cat"):
+        lobby.join(p, p)
+    rnd = lobby.start_round("5", record_s=30)
+    now = int(time.time())
+    first, second = f"{now}_cm-{MINE}_a.wav", f"{now + 1}_cm-{MINE}_b.wav"
+
+    async def scenario():
+        token = await mainmcp1._ensure_upload_token("ann")
+        assert token
+        # Two uploads from one watcher batch, both claimed before either submits
+        await asyncio.gather(mainmcp1._submit_upload(lobby, rnd, "ann", first),
+                             mainmcp1._submit_upload(lobby, rnd, "ann", second))
+
+    asyncio.run(scenario())
+    assert rnd.submissions == {"ann": first}
+    with pytest.raises(ValueError):
+        rnd.submit("ann", second)
@@ -0,0 +1,54 @@
+import time
+
+import numpy as np
+import pytest
+
+import audio_prep
+import voice_features
+
+RATE = 48000  # browser recorder rate
+ROUND_BUDGET_S = 1.0  # extract_batch for one 8-player round
+
+
+def _speech_like(seconds, f0, rate=RATE, syllables_per_s=4.0, pause_every_s=3.0, seed=0):
+    """Harmonic 'voice' at f0, amplitude-modulated into syllables, with 0.5 s pauses."""
+    rng = np.random.default_rng(seed)
+    t = np.arange(int(seconds * rate)) / rate
+    voice = sum(np.sin(2 * np.pi * f0 * k * t) / k for k in range(1, 6))
+    envelope = 0.5 * (1 - np.cos(2 * np.pi * syllables_per_s * t))
+    paused = (t % pause_every_s) > pause_every_s - 0.5
+    x = 0.2 * voice * envelope * ~paused + 0.002 * rng.standard_normal(len(t))
+    return x.astype(np.float32)
+
+
+def _write(tmp_path, name, samples, rate=RATE):
+    path = tmp_path / name
+    path.write_bytes(audio_prep.encode_wav(samples, rate))
+    return str(path)
+
+
+def test_features_track_pitch_pauses_and_rate(tmp_path):
+    low = _write(tmp_path, "low.wav", _speech_like(6, 120))
+    high = _write(tmp_path, "high.wav", _speech_like(6, 220, syllables_per_s=6))
+
+    low_f, high_f = voice_features.as_dicts(voice_features.extract_batch([low, high]))
+
+    assert low_f["pitch_mean_hz"] == pytest.approx(120, rel=0.05)
+    assert high_f["pitch_mean_hz"] == pytest.approx(220, rel=0.05)
+    assert 0.1 < low_f["pause_ratio"] < 0.35
+    assert high_f["speech_rate"] > low_f["speech_rate"]
+    assert low_f["jitter"] < 0.05
+
+
+def test_batch_round_benchmark(tmp_path):
+    """A whole 8-player round of 30 s answers scores within a second on one core."""
+    paths = [_write(tmp_path, f"p{i}.wav", _speech_like(30, 100 + 15 * i, seed=i)) for i in range(8)]
+    voice_features.extract_batch(paths[:1])  # warm up imports / FFT plans
+
+    t0 = time.perf_counter()
+    features = voice_features.extract_batch(paths)
+    elapsed = time.perf_counter() - t0
+
+    assert features.shape == (8, len(voice_features.FEATURE_NAMES))
+    assert np.isfinite(features).all()
+    assert elapsed < ROUND_BUDGET_S, f"8 x 30 s clips took {elapsed * 1000:.0f} ms"
@@ -0,0 +1,106 @@
+"""
+Content-addressed transcript cache.
+Transcripts are stored on disk under a hash of (model, language, audio bytes),
+so the same recording is only ever sent to Voxtral once.
+"""
+import hashlib
+import os
+import threading
+from collections import OrderedDict
+from typing import Dict, Optional
+
+
+class TranscriptCache:
+    """
+    On-disk transcript store with size-bounded LRU eviction.
+
+    One file per entry in `directory`; recency is tracked in memory (rebuilt
+    from file mtimes on start) and persisted by touching files on hits.
+    """
+
+    def __init__(self, directory: str, max_bytes: int = 64 * 1024 * 1024):
+        """
+        Args:
+            directory (str): Where entries live; created if missing
+            max_bytes (int): Total size above which least-recently-used entries go
+        """
+        self.directory = directory
+        self.max_bytes = max_bytes
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+        self._entries: "OrderedDict[str, int]" = OrderedDict()
+        self._bytes = 0
+        os.makedirs(directory, exist_ok=True)
+        self._load_index()
+
+    @staticmethod
+    def key(audio_bytes: bytes, model: str, language: str) -> str:
+        h = hashlib.sha256()
+        h.update(f"{model}\0{language}\0".encode())
+        h.update(audio_bytes)
+        return h.hexdigest()
+
+    def _path(self, key: str) -> str:
+        return os.path.join(self.directory, f"{key}.txt")
+
+    def _load_index(self) -> None:
+        found = []
+        for name in os.listdir(self.directory):
+            if not name.endswith(".txt"):
+                continue
+            st = os.stat(os.path.join(self.directory, name))
+            found.append((st.st_mtime, name[:-4], st.st_size))
+        for _, key, size in sorted(found):
+            self._entries[key] = size
+            self._bytes += size
+
+    def get(self, key: str) -> Optional[str]:
+        with self._lock:
+            if key not in self._entries:
+                self.misses += 1
+                return None
+            try:
+                with open(self._path(key), encoding="utf-8") as f:
+                    text = f.read()
+                os.utime(self._path(key))
+            except FileNotFoundError:
+                # Removed behind our back (another worker evicted it)
+                self._bytes -= self._entries.pop(key)
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return text
+
+    def put(self, key: str, text: str) -> None:
+        data = text.encode("utf-8")
+        tmp = f"{self._path(key)}.{os.getpid()}.{threading.get_ident()}.tmp"
+        with open(tmp, "wb") as f:
+            f.write(data)
+        os.replace(tmp, self._path(key))
+        with self._lock:
+            self._bytes -= self._entries.pop(key, 0)
+            self._entries[key] = len(data)
+            self._bytes += len(data)
+            self._evict()
+
+    def _evict(self) -> None:
+        while self._bytes > self.max_bytes and len(self._entries) > 1:
+            key, size = self._entries.popitem(last=False)
+            self._bytes -= size
+            try:
+                os.remove(self._path(key))
+            except FileNotFoundError:
+                pass
+
+    def stats(self) -> Dict[str, float]:
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_ratio": self.hits / lookups if lookups else 0.0,
+                "entries": len(self._entries),
+                "bytes": self._bytes,
+            }
@@ -0,0 +1,146 @@
+"""
+Deterministic text features for the bluff judge, from Voxtral transcripts.
+Lexicons are compiled once into a single regex, so a transcript is scanned in
+one pass; read-aloud answers are aligned word-by-word against the prompt text.
+A whole round's transcripts are scored in one call.
+"""
+import difflib
+import re
+from typing import Dict, List, Mapping, Optional, Sequence
+
+import numpy as np
+
+# Longer phrases are listed before their prefixes: the regex tries alternatives in order.
+# "like" and "well" are ordinary words too ("what do you like to do"): they only
+# count as fillers when set off by a comma, as in "it was, like, fine" or "well, ...".
+FILLERS = (
+    "you know", "i mean", "um+", "uh+", "u+m", "er+", "erm", "ah+", "hmm+", "mm+", "like(?=,)", "well(?=,)",
+)
+HEDGES = (
+    "to be honest", "to tell you the truth", "if i remember correctly", "as far as i know",
+    "i think", "i guess", "i suppose", "i believe", "kind of", "sort of", "more or less",
+    "maybe", "perhaps", "probably", "possibly", "honestly", "basically", "actually", "somewhat", "might",
+)
+CORRECTIONS = (
+    "no wait", "wait no", "let me rephrase", "or rather", "actually no", "sorry", "i meant",
+)
+FIRST_PERSON = ("i", "me", "my", "mine", "myself", "i'm", "i've", "i'd", "i'll")
+# Pronouns that put someone else in the speaker's place; "it", "that" and "one"
+# are in almost every sentence, so they say nothing about distancing
+DISTANCING = ("you", "he", "she", "they", "them", "someone", "somebody", "people")
+
+TEXT_FEATURE_NAMES = (
+    "words",
+    "words_per_s",       # NaN when the clip duration is unknown
+    "filler_rate",       # fillers per word
+    "hedge_rate",        # hedges per word
+    "self_corrections",  # repair phrases, repeated words and cut-off words
+    "first_person_rate",
+    "distancing_ratio",  # distancing / (distancing + first person) pronouns
+    "read_accuracy",     # word alignment ratio vs. the read-aloud prompt; NaN otherwise
+)
+
+
+def _alternation(phrases: Sequence[str]) -> str:
+    return "|".join(p.replace(" ", r"\s+") for p in phrases)
+
+
+_LEXICON = re.compile(
+    rf"\b(?:(?P<correction>{_alternation(CORRECTIONS)})"
+    rf"|(?P<hedge>{_alternation(HEDGES)})"
+    rf"|(?P<filler>{_alternation(FILLERS)}))\b"
+)
+_REPEAT = re.compile(r"\b(\w+)(?:[\s,]+\1\b)+")
+_CUT_OFF = re.compile(r"\b\w+-(?=\s|$)")
+_WORD = re.compile(r"[a-z0-9']+")
+_FIRST = frozenset(FIRST_PERSON)
+_DIST = frozenset(DISTANCING)
+
+
+def tokens(text: str) -> List[str]:
+    return _WORD.findall(text.lower())
+
+
+class TranscriptScorer:
+    """Scores transcripts; reference texts are tokenized once, up front."""
+
+    def __init__(self, references: Optional[Mapping[str, str]] = None):
+        """
+        Args:
+            references (dict): prompt_id -> text the player reads aloud
+        """
+        self._refs: Dict[str, List[str]] = {pid: tokens(text) for pid, text in (references or {}).items()}
+
+    def read_accuracy(self, words: List[str], prompt_id: str) -> float:
+        ref = self._refs.get(prompt_id)
+        if not ref:
+            return float("nan")
+        return difflib.SequenceMatcher(None, ref, words, autojunk=False).ratio()
+
+    def score_batch(self, transcripts: Sequence[Optional[str]], durations: Optional[Sequence[float]] = None,
+                    prompt_ids: Optional[Sequence[Optional[str]]] = None) -> np.ndarray:
+        """
+        TEXT_FEATURE_NAMES for a round's transcripts.
+
+        Args:
+            transcripts (list): One transcript per answer (None = no transcript)
+            durations (list): Speech seconds per answer, for words_per_s
+            prompt_ids (list): Prompt each answer responds to, for read_accuracy
+
+        Returns:
+            np.ndarray: float64 matrix of shape (len(transcripts), len(TEXT_FEATURE_NAMES))
+        """
+        out = np.full((len(transcripts), len(TEXT_FEATURE_NAMES)), np.nan)
+        for i, text in enumerate(transcripts):
+            if text is None:
+                continue
+            lower = text.lower()
+            words = _WORD.findall(lower)
+            n = max(len(words), 1)
+            counts = {"filler": 0, "hedge": 0, "correction": 0}
+            for m in _LEXICON.finditer(lower):
+                counts[m.lastgroup] += 1
+            repairs = counts["correction"] + len(_REPEAT.findall(lower)) + len(_CUT_OFF.findall(lower))
+            first = sum(w in _FIRST for w in words)
+            dist = sum(w in _DIST for w in words)
+            duration = durations[i] if durations is not None else None
+            prompt_id = prompt_ids[i] if prompt_ids is not None else None
+            out[i] = (
+                len(words),
+                len(words) / duration if duration else np.nan,
+                counts["filler"] / n,
+                counts["hedge"] / n,
+                repairs,
+                first / n,
+                dist / (dist + first) if dist + first else 0.0,
+                self.read_accuracy(words, prompt_id) if prompt_id else np.nan,
+            )
+        return out
+
+
+def reasons(row: np.ndarray) -> List[str]:
+    """Text cues worth reporting for one answer, strongest first."""
+    f = dict(zip(TEXT_FEATURE_NAMES, row))
+    if np.isnan(f["words"]):
+        return []
+    found = []
+    if f["read_accuracy"] < 0.8:
+        found.append("strayed from the read-aloud text")
+    if f["filler_rate"] > 0.05:
+        found.append("hesitation patterns (fillers)")
+    if f["hedge_rate"] > 0.04:
+        found.append("hedging language")
+    if f["self_corrections"] >= 2:
+        found.append("self-corrections")
+    if f["words"] >= 15 and np.isnan(f["read_accuracy"]) and f["first_person_rate"] < 0.02:
+        found.append("pronoun distancing")
+    if f["words_per_s"] > 3.8:
+        found.append("pace inconsistency (rushed wording)")
+    elif f["words_per_s"] < 1.2:
+        found.append("pace inconsistency (halting wording)")
+    return found
+
+
+def as_dicts(matrix: np.ndarray) -> List[Dict[str, Optional[float]]]:
+    """Rows as {name: value}, NaN -> None so they serialize as JSON."""
+    return [{k: (None if np.isnan(v) else float(v)) for k, v in zip(TEXT_FEATURE_NAMES, row)} for row in matrix]
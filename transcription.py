@@ -1,17 +1,36 @@
+import asyncio
+import concurrent.futures
 import os
-from mistralai import Mistral
+import random
+import threading
+import time
+
+from metrics import METRICS
+from transcript_cache import TranscriptCache
 ## Testing
 class AudioTranscriber:
     """
     A class to handle MP3 audio transcription using Mistral's Voxtral model.
     """
     
-    def __init__(self, api_key=None):
+    def __init__(self, api_key=None, server_url=None, max_concurrency=4, max_retries=3, backoff_s=0.5, timeout_s=60.0,
+                 cache_dir=None, cache_max_bytes=64 * 1024 * 1024, preprocess=False, target_rate=16000):
         """
         Initialize the AudioTranscriber with Mistral API key.
         
         Args:
             api_key (str): Mistral API key. If None, will try to get from environment.
+            server_url (str): API base URL. Defaults to MISTRAL_SERVER_URL or the public API.
+            max_concurrency (int): Max files in each stage (upload / transcribe) at once in transcribe_many
+            max_retries (int): Retries per stage on transient errors in transcribe_many
+            backoff_s (float): Base delay for exponential backoff between retries
+            timeout_s (float): Per-request timeout
+            cache_dir (str): Transcript cache directory. Defaults to TRANSCRIPT_CACHE_DIR
+                or ".transcript_cache"; "" disables the cache.
+            cache_max_bytes (int): Size bound of the transcript cache
+            preprocess (bool): Downmix WAVs to mono and resample to `target_rate`
+                16-bit PCM before upload (see preprocess_stats)
+            target_rate (int): Sample rate used by preprocess
         """
         if api_key is None:
             api_key = os.environ.get("MISTRAL_API_KEY", 'ddi3VI49KfMT0clWpxLImBwGDBOgB9tj')
@@ -23,8 +42,50 @@ class AudioTranscriber:
         
         self.api_key = api_key
         self.model = "voxtral-mini-latest"
-        self.client = Mistral(api_key=api_key)
+        self.max_concurrency = max_concurrency
+        self.max_retries = max_retries
+        self.backoff_s = backoff_s
+        self.server_url = server_url or os.environ.get("MISTRAL_SERVER_URL")
+        self.timeout_s = timeout_s
+        # The Mistral SDK is slow to import; the client is built on first use
+        self._client = None
+        self._client_lock = threading.Lock()
+        if cache_dir is None:
+            cache_dir = os.environ.get("TRANSCRIPT_CACHE_DIR", ".transcript_cache")
+        self.cache = TranscriptCache(cache_dir, max_bytes=cache_max_bytes) if cache_dir else None
+        # key -> Future of the upstream call currently running for it
+        self._inflight = {}
+        self._inflight_lock = threading.Lock()
+        self.collapsed = 0
+        self.preprocess = preprocess
+        self.target_rate = target_rate
+        self.preprocess_stats = {"files": 0, "bytes_in": 0, "bytes_out": 0, "bytes_saved": 0, "seconds": 0.0}
+        self._stats_lock = threading.Lock()
     
+    @property
+    def client(self):
+        if self._client is None:
+            with self._client_lock:
+                if self._client is None:
+                    import httpx
+                    from mistralai import Mistral
+
+                    # One pooled HTTP client per direction, reused by every call; the
+                    # pool is sized so a full transcribe_many batch never queues on it.
+                    n = 2 * self.max_concurrency
+                    limits = httpx.Limits(max_connections=n, max_keepalive_connections=n)
+                    client = Mistral(
+                        api_key=self.api_key,
+                        server_url=self.server_url,
+                        client=httpx.Client(limits=limits, timeout=self.timeout_s, follow_redirects=True),
+                        async_client=httpx.AsyncClient(limits=limits, timeout=self.timeout_s, follow_redirects=True),
+                    )
+                    # Every attempt is timed, so retried calls show up as extra samples
+                    METRICS.instrument(client.files, "mistral.files", ("upload", "get_signed_url"))
+                    METRICS.instrument(client.audio.transcriptions, "mistral.transcriptions", ("complete",))
+                    self._client = client
+        return self._client
+
     def transcribe_audio(self, audio_file_path):
         """
         Transcribe an MP3 audio file to text.
@@ -39,34 +100,8 @@ class AudioTranscriber:
             FileNotFoundError: If the audio file doesn't exist
             Exception: If transcription fails
         """
-        if not os.path.exists(audio_file_path):
-            raise FileNotFoundError(f"Audio file not found: {audio_file_path}")
-        
-        try:
-            # Upload the audio file
-            with open(audio_file_path, "rb") as f:
-                uploaded_audio = self.client.files.upload(
-                    file={
-                        "content": f,
-                        "file_name": os.path.basename(audio_file_path),
-                    },
-                    purpose="audio"
-                )
-            
-            # Get the signed URL
-            signed_url = self.client.files.get_signed_url(file_id=uploaded_audio.id)
-            
-            # Get the transcription
-            transcription_response = self.client.audio.transcriptions.complete(
-                model=self.model,
-                file_url=signed_url.url,
-                language="en"
-            )
-            
-            return transcription_response.text if hasattr(transcription_response, 'text') else str(transcription_response)
-            
-        except Exception as e:
-            raise Exception(f"Transcription failed: {str(e)}")
+        content = _read_bytes(audio_file_path)
+        return self._transcribe_cached(content, os.path.basename(audio_file_path))
     
     def transcribe_from_bytes(self, audio_bytes, filename="audio.mp3"):
         """
@@ -79,11 +114,59 @@ class AudioTranscriber:
         Returns:
             str: Transcribed text from the audio
         """
+        return self._transcribe_cached(audio_bytes, filename)
+
+    def cache_stats(self):
+        """Cache hit/miss counters plus how many calls were collapsed in flight."""
+        stats = self.cache.stats() if self.cache else {}
+        stats["collapsed"] = self.collapsed
+        return stats
+
+    def _transcribe_cached(self, content, filename, language="en"):
+        key = TranscriptCache.key(content, self._cache_model(), language)
+        if self.cache:
+            text = self.cache.get(key)
+            if text is not None:
+                return text
+        fut, leader = self._join_flight(key)
+        if not leader:
+            return fut.result()
+        try:
+            text = self._transcribe_upload(self._prepare(content), filename, language)
+        except BaseException as e:
+            self._finish_flight(key, fut, error=e)
+            raise
+        self._finish_flight(key, fut, text=text)
+        return text
+
+    def _cache_model(self):
+        # Preprocessed audio may transcribe slightly differently; keep it apart
+        return f"{self.model}@{self.target_rate}" if self.preprocess else self.model
+
+    def _prepare(self, content):
+        """Apply the optional size-reduction stage and record what it saved."""
+        if not self.preprocess:
+            return content
+        import audio_prep
+
+        t0 = time.perf_counter()
+        out = audio_prep.shrink_wav(content, self.target_rate)
+        elapsed = time.perf_counter() - t0
+        with self._stats_lock:
+            stats = self.preprocess_stats
+            stats["files"] += 1
+            stats["bytes_in"] += len(content)
+            stats["bytes_out"] += len(out)
+            stats["bytes_saved"] += len(content) - len(out)
+            stats["seconds"] += elapsed
+        return out
+
+    def _transcribe_upload(self, content, filename, language):
         try:
             # Upload the audio bytes
             uploaded_audio = self.client.files.upload(
                 file={
-                    "content": audio_bytes,
+                    "content": content,
                     "file_name": filename,
                 },
                 purpose="audio"
@@ -96,10 +179,195 @@ class AudioTranscriber:
             transcription_response = self.client.audio.transcriptions.complete(
                 model=self.model,
                 file_url=signed_url.url,
-                language="en"
+                language=language
             )
             
             return transcription_response.text if hasattr(transcription_response, 'text') else str(transcription_response)
             
         except Exception as e:
-            raise Exception(f"Transcription failed: {str(e)}")
\ No newline at end of file
+            raise Exception(f"Transcription failed: {str(e)}")
+
+    def _join_flight(self, key):
+        """
+        Single-flight: the first caller for an uncached key becomes the leader
+        and does the upstream call; everyone else (sync or async) waits on its
+        future instead of making their own.
+        """
+        with self._inflight_lock:
+            fut = self._inflight.get(key)
+            if fut is not None:
+                self.collapsed += 1
+                return fut, False
+            fut = concurrent.futures.Future()
+            self._inflight[key] = fut
+            return fut, True
+
+    def _finish_flight(self, key, fut, text=None, error=None):
+        # Followers must always be released, even if the cache write fails
+        try:
+            if error is None and self.cache:
+                self.cache.put(key, text)
+        except Exception:
+            pass  # the transcript is still good, it just isn't cached
+        finally:
+            with self._inflight_lock:
+                self._inflight.pop(key, None)
+            if error is None:
+                fut.set_result(text)
+            else:
+                fut.set_exception(error)
+
+    async def transcribe_many(self, sources, language="en"):
+        """
+        Transcribe a batch of audio files concurrently.
+
+        Cached transcripts are returned without any upstream call, and files
+        with identical content share one upstream call.
+
+        Each file goes through upload -> signed URL -> transcription. Every
+        stage has its own concurrency limit, so while some files are being
+        transcribed the next ones are already uploading. Transient failures
+        are retried with exponential backoff; a file that still fails gets an
+        error entry instead of aborting the batch.
+
+        Args:
+            sources (list): File paths, or (filename, bytes) tuples
+            language (str): Spoken language passed to Voxtral
+
+        Returns:
+            list[dict]: One result per source, in input order:
+                {"source": str, "text": str | None, "error": str | None}
+        """
+        upload_slots = asyncio.Semaphore(self.max_concurrency)
+        transcribe_slots = asyncio.Semaphore(self.max_concurrency)
+
+        async def one(source):
+            name = source if isinstance(source, str) else source[0]
+            try:
+                if isinstance(source, str):
+                    filename, content = os.path.basename(source), await asyncio.to_thread(_read_bytes, source)
+                else:
+                    filename, content = source
+                key = TranscriptCache.key(content, self._cache_model(), language)
+                text = self.cache.get(key) if self.cache else None
+                if text is not None:
+                    return {"source": name, "text": text, "error": None}
+                fut, leader = self._join_flight(key)
+                if not leader:
+                    text = await asyncio.wrap_future(fut)
+                    return {"source": name, "text": text, "error": None}
+            except Exception as e:
+                return {"source": name, "text": None, "error": f"Transcription failed: {str(e)}"}
+            try:
+                if self.preprocess:
+                    content = await asyncio.to_thread(self._prepare, content)
+                async with upload_slots:
+                    uploaded = await self._retry(lambda: self.client.files.upload_async(
+                        file={"content": content, "file_name": filename},
+                        purpose="audio",
+                    ))
+                    signed_url = await self._retry(lambda: self.client.files.get_signed_url_async(file_id=uploaded.id))
+                async with transcribe_slots:
+                    response = await self._retry(lambda: self.client.audio.transcriptions.complete_async(
+                        model=self.model,
+                        file_url=signed_url.url,
+                        language=language,
+                    ))
+                text = response.text if hasattr(response, 'text') else str(response)
+            except BaseException as e:
+                # Followers must be released even if we were cancelled
+                self._finish_flight(key, fut, error=e)
+                if not isinstance(e, Exception):
+                    raise
+                return {"source": name, "text": None, "error": f"Transcription failed: {str(e)}"}
+            self._finish_flight(key, fut, text=text)
+            return {"source": name, "text": text, "error": None}
+
+        return await asyncio.gather(*(one(s) for s in sources))
+
+    async def transcribe_chunked(self, source, max_segment_s=15.0, language="en", segment_retries=1):
+        """
+        Transcribe a long WAV as silence-delimited segments in parallel.
+
+        The recording is trimmed of leading/trailing silence and cut at pauses
+        into segments of at most `max_segment_s`, which go through
+        transcribe_many together. Segments that still fail are retried on
+        their own (up to `segment_retries` more passes); segments that worked
+        are never resent.
+
+        Args:
+            source (str | tuple): WAV path, or (filename, bytes)
+            max_segment_s (float): Upper bound on segment length in seconds
+            language (str): Spoken language passed to Voxtral
+            segment_retries (int): Extra passes over failed segments
+
+        Returns:
+            dict: {"text": str, "segments": [{"start": s, "end": s, "text", "error"}],
+                   "error": str | None}; text joins the successful segments in order
+        """
+        if isinstance(source, str):
+            filename, data = os.path.basename(source), await asyncio.to_thread(_read_bytes, source)
+        else:
+            filename, data = source
+        stem = os.path.splitext(filename)[0]
+
+        import audio_prep
+
+        samples, rate = audio_prep.decode_wav(data)
+        mono = audio_prep.to_mono(samples)
+        if self.preprocess:
+            # Resample once here so the segments are already compact
+            mono, rate = audio_prep.resample(mono, rate, self.target_rate), self.target_rate
+        bounds = audio_prep.split_on_silence(mono, rate, max_segment_s=max_segment_s)
+        clips = [(f"{stem}_{i:03d}.wav", audio_prep.encode_wav(mono[a:b], rate)) for i, (a, b) in enumerate(bounds)]
+
+        results = await self.transcribe_many(clips, language=language)
+        for _ in range(segment_retries):
+            failed = [i for i, r in enumerate(results) if r["error"]]
+            if not failed:
+                break
+            retried = await self.transcribe_many([clips[i] for i in failed], language=language)
+            for i, r in zip(failed, retried):
+                results[i] = r
+
+        segments = [
+            {"start": a / rate, "end": b / rate, "text": r["text"], "error": r["error"]}
+            for (a, b), r in zip(bounds, results)
+        ]
+        failed = [i for i, seg in enumerate(segments) if seg["error"]]
+        return {
+            "text": " ".join(seg["text"].strip() for seg in segments if seg["text"]),
+            "segments": segments,
+            "error": f"{len(failed)} of {len(segments)} segments failed: {failed}" if failed else None,
+        }
+
+    async def _retry(self, call):
+        """Await call(), retrying transient errors with jittered exponential backoff."""
+        for attempt in range(self.max_retries + 1):
+            try:
+                return await call()
+            except Exception as e:
+                if attempt == self.max_retries or not _is_transient(e):
+                    raise
+                delay = self.backoff_s * (2 ** attempt)
+                await asyncio.sleep(delay * random.uniform(0.5, 1.5))
+
+
+def _read_bytes(path):
+    if not os.path.exists(path):
+        raise FileNotFoundError(f"Audio file not found: {path}")
+    with open(path, "rb") as f:
+        return f.read()
+
+
+def _is_transient(error):
+    """
+    Network errors, timeouts, 429 and 5xx are worth retrying; other 4xx and
+    anything else (e.g. a ValueError from our own code) are not.
+    """
+    import httpx
+
+    status = getattr(error, "status_code", None)
+    if status is not None:
+        return status == 429 or status >= 500
+    return isinstance(error, (httpx.TransportError, ConnectionError, TimeoutError))
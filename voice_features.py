@@ -0,0 +1,299 @@
+"""
+Acoustic features for the bluff judge.
+Batched, NumPy-vectorized: a whole round's clips are framed into one
+(clips, frames, window) array and every feature is computed across all of
+them at once. WAVs are read through memory maps, not loaded up front.
+"""
+import functools
+import struct
+from typing import Dict, List, Sequence, Tuple
+
+import numpy as np
+
+import audio_prep
+
+RATE = 16000        # analysis sample rate
+WIN = 400           # 25 ms analysis window
+HOP = 160           # 10 ms hop -> 100 frames per second
+# Pitch is tracked on a low-passed 4 kHz copy: F0 lives well below 1 kHz and
+# the autocorrelation FFTs get 4x shorter.
+PITCH_RATE = 4000
+PITCH_WIN = WIN * PITCH_RATE // RATE
+PITCH_HOP = HOP * PITCH_RATE // RATE
+PITCH_NFFT = 256    # >= PITCH_WIN + max lag, so the FFT autocorrelation is not circular
+MIN_F0, MAX_F0 = 60.0, 400.0
+VOICING_THRESHOLD = 0.35  # normalized autocorrelation peak needed to call a frame pitched
+PITCH_BLOCK = 8192  # frames per FFT block, bounds peak memory
+
+FEATURE_NAMES = (
+    "duration_s",       # trimmed speech span
+    "energy_mean_db",
+    "energy_std_db",
+    "pitch_mean_hz",
+    "pitch_std_hz",
+    "jitter",           # mean |period delta| / mean period over consecutive pitched frames
+    "pause_ratio",      # silent share of the speech span
+    "speech_rate",      # syllable-like energy peaks per second of speech span
+    "rate_variability", # coefficient of variation of peaks per 2 s window
+)
+
+
+def read_wav_mmap(path: str) -> Tuple[np.ndarray, int]:
+    """
+    Open a WAV through a read-only memory map.
+
+    16-bit PCM (what the recorder produces) is mapped directly, so only the
+    pages actually touched are read. Other sample formats fall back to a
+    regular decode.
+
+    Returns:
+        (samples, rate): int16 memmap of shape (n, channels), or float32 array
+    """
+    with open(path, "rb") as f:
+        header = f.read(12)
+        if header[:4] != b"RIFF" or header[8:12] != b"WAVE":
+            raise ValueError(f"Not a WAV file: {path}")
+        fmt = None
+        while True:
+            chunk = f.read(8)
+            if len(chunk) < 8:
+                raise ValueError(f"WAV has no data chunk: {path}")
+            cid, size = chunk[:4], struct.unpack("<I", chunk[4:])[0]
+            if cid == b"fmt ":
+                fmt = struct.unpack("<HHIIHH", f.read(16))
+                f.seek(size - 16 + (size & 1), 1)
+            elif cid == b"data":
+                offset = f.tell()
+                break
+            else:
+                f.seek(size + (size & 1), 1)
+
+    audio_format, channels, rate, _, _, bits = fmt
+    if audio_format == 1 and bits == 16:
+        frames = size // (2 * channels)
+        return np.memmap(path, dtype="<i2", mode="r", offset=offset, shape=(frames, channels)), rate
+    with open(path, "rb") as f:
+        return audio_prep.decode_wav(f.read())
+
+
+def load_signal(path: str) -> np.ndarray:
+    """A WAV as mono float32 at RATE."""
+    samples, rate = read_wav_mmap(path)
+    if np.issubdtype(samples.dtype, np.integer):
+        mono = samples.mean(axis=1, dtype=np.float32) / 32768.0
+    else:
+        mono = audio_prep.to_mono(samples)
+    # A short filter is plenty for analysis (transcription uploads use the default)
+    return audio_prep.resample(mono, rate, RATE, taps=31)
+
+
+def _frame(signals: Sequence[np.ndarray]) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+    """
+    Pad clips to a common length and frame them.
+
+    Returns:
+        (padded, frames, valid): (clips, samples) array, its (clips, frames, WIN)
+        strided view, and the mask of frames that lie inside each clip
+    """
+    counts = [max(0, (len(s) - WIN) // HOP + 1) for s in signals]
+    n_frames = max(max(counts), 1)
+    padded = np.zeros((len(signals), (n_frames - 1) * HOP + WIN), dtype=np.float32)
+    for i, s in enumerate(signals):
+        n = min(len(s), padded.shape[1])
+        padded[i, :n] = s[:n]
+    frames = np.lib.stride_tricks.sliding_window_view(padded, WIN, axis=1)[:, ::HOP]
+    valid = np.arange(n_frames)[None, :] < np.asarray(counts)[:, None]
+    return padded, frames, valid
+
+
+def _pitch(padded: np.ndarray, voiced: np.ndarray) -> np.ndarray:
+    """F0 per frame in Hz via FFT autocorrelation; 0 where unvoiced or aperiodic."""
+    f0 = np.zeros(voiced.shape, dtype=np.float32)
+    idx = np.flatnonzero(voiced.ravel())
+    if len(idx) == 0:
+        return f0
+    low = np.stack([audio_prep.resample(row, RATE, PITCH_RATE, taps=31) for row in padded])
+    frames = np.lib.stride_tricks.sliding_window_view(low, PITCH_WIN, axis=1)[:, ::PITCH_HOP][:, : voiced.shape[1]]
+    flat = frames.reshape(-1, PITCH_WIN)
+    window = np.hanning(PITCH_WIN).astype(np.float32)
+    lo, hi = int(PITCH_RATE / MAX_F0), int(PITCH_RATE / MIN_F0)
+    out = f0.ravel()
+    for start in range(0, len(idx), PITCH_BLOCK):
+        block = idx[start : start + PITCH_BLOCK]
+        x = flat[block] * window
+        x = x - x.mean(axis=1, keepdims=True)
+        spec = np.fft.rfft(x, n=PITCH_NFFT, axis=1)
+        ac = np.fft.irfft(spec.real ** 2 + spec.imag ** 2, n=PITCH_NFFT, axis=1)[:, : hi + 2]
+        ac = ac / (ac[:, :1] + 1e-9)
+        rows = np.arange(len(block))
+        lag = lo + np.argmax(ac[:, lo : hi + 1], axis=1)
+        peak = ac[rows, lag]
+        # Parabolic interpolation around the peak for sub-sample lag precision
+        left, right = ac[rows, lag - 1], ac[rows, lag + 1]
+        denom = left - 2 * peak + right
+        shift = np.where(np.abs(denom) > 1e-9, 0.5 * (left - right) / np.where(denom == 0, 1, denom), 0.0)
+        out[block] = np.where(peak > VOICING_THRESHOLD, PITCH_RATE / (lag + np.clip(shift, -0.5, 0.5)), 0.0)
+    return f0
+
+
+def _masked_mean_std(x: np.ndarray, mask: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+    n = np.maximum(mask.sum(axis=1), 1)
+    mean = np.where(mask, x, 0).sum(axis=1) / n
+    var = np.where(mask, (x - mean[:, None]) ** 2, 0).sum(axis=1) / n
+    return mean, np.sqrt(var)
+
+
+def extract_batch(paths: Sequence[str]) -> np.ndarray:
+    """
+    Compute FEATURE_NAMES for a batch of WAV files in one vectorized pass.
+
+    Returns:
+        np.ndarray: float32 matrix of shape (len(paths), len(FEATURE_NAMES))
+    """
+    return extract_signals([load_signal(p) for p in paths])
+
+
+def extract_signals(signals: Sequence[np.ndarray]) -> np.ndarray:
+    """Same as extract_batch, for mono float32 signals already at RATE."""
+    out = np.zeros((len(signals), len(FEATURE_NAMES)), dtype=np.float32)
+    if not signals:
+        return out
+    padded, frames, valid = _frame(signals)
+    n_clips, n_frames = valid.shape
+
+    # Energy and speech/silence split (per-clip adaptive threshold)
+    energy = 20.0 * np.log10(np.sqrt(np.mean(frames * frames, axis=2) + 1e-12))
+    silent = np.zeros_like(valid)
+    for i in range(n_clips):
+        silent[i, valid[i]] = audio_prep.silent_frames(energy[i, valid[i]])
+    speech = valid & ~silent
+
+    # Trim leading/trailing silence: the speech span is first..last speech frame
+    has_speech = speech.any(axis=1)
+    first = np.where(has_speech, np.argmax(speech, axis=1), 0)
+    last = np.where(has_speech, n_frames - np.argmax(speech[:, ::-1], axis=1), 0)
+    pos = np.arange(n_frames)[None, :]
+    span = (pos >= first[:, None]) & (pos < last[:, None])
+    span_frames = np.maximum(span.sum(axis=1), 1)
+    duration = span.sum(axis=1) * HOP / RATE
+
+    e_mean, e_std = _masked_mean_std(energy, speech)
+
+    f0 = _pitch(padded, speech)
+    pitched = f0 > 0
+    p_mean, p_std = _masked_mean_std(f0, pitched)
+
+    # Jitter: relative change of the pitch period between consecutive pitched frames
+    period = np.where(pitched, 1.0 / np.maximum(f0, 1e-6), 0.0)
+    both = pitched[:, 1:] & pitched[:, :-1]
+    d_period = np.abs(np.diff(period, axis=1))
+    jitter = np.where(both, d_period, 0).sum(axis=1) / np.maximum(both.sum(axis=1), 1)
+    mean_period = np.where(pitched, period, 0).sum(axis=1) / np.maximum(pitched.sum(axis=1), 1)
+    jitter = np.where(mean_period > 0, jitter / np.maximum(mean_period, 1e-9), 0.0)
+
+    pause_ratio = (span & silent).sum(axis=1) / span_frames
+
+    # Syllable nuclei: local maxima of the smoothed energy envelope inside speech,
+    # at least 6 dB above the clip's speech floor
+    kernel = np.hanning(7)
+    kernel /= kernel.sum()
+    smooth = np.apply_along_axis(np.convolve, 1, np.where(valid, energy, -120.0), kernel, mode="same")
+    floor = np.array([np.percentile(smooth[i, speech[i]], 20) if speech[i].any() else 0.0 for i in range(n_clips)])
+    peaks = np.zeros_like(speech)
+    peaks[:, 1:-1] = (
+        (smooth[:, 1:-1] > smooth[:, :-2]) & (smooth[:, 1:-1] >= smooth[:, 2:])
+        & speech[:, 1:-1] & (smooth[:, 1:-1] > floor[:, None] + 6.0)
+    )
+    speech_rate = peaks.sum(axis=1) / np.maximum(duration, 1e-3)
+
+    # Pace inconsistency: spread of peak counts over 2 s windows of the span
+    win = 2 * RATE // HOP
+    n_win = n_frames // win
+    if n_win:
+        per_win = (peaks & span)[:, : n_win * win].reshape(n_clips, n_win, win).sum(axis=2).astype(np.float32)
+        in_span = span[:, : n_win * win].reshape(n_clips, n_win, win).all(axis=2)
+        w_mean, w_std = _masked_mean_std(per_win, in_span)
+        rate_var = np.where(w_mean > 0, w_std / np.maximum(w_mean, 1e-9), 0.0)
+    else:
+        rate_var = np.zeros(n_clips)
+
+    out[:] = np.stack([
+        duration, e_mean, e_std, p_mean, p_std, jitter, pause_ratio, speech_rate, rate_var,
+    ], axis=1)
+    return out
+
+
+# Speaker embedding: long-term cepstrum of the speech frames (mean and spread
+# of liftered MFCCs c1..c{EMBED_CEPS}); c0 (loudness) is left out
+EMBED_NFFT = 512
+EMBED_BANDS = 40
+EMBED_CEPS = 20
+EMBED_DIM = 2 * EMBED_CEPS
+
+
+@functools.lru_cache(maxsize=1)
+def _cepstral_basis() -> np.ndarray:
+    """Mel filterbank, DCT and lifter folded into one (EMBED_NFFT // 2 + 1) -> bands -> ceps chain."""
+    mel = lambda f: 2595.0 * np.log10(1.0 + f / 700.0)
+    hz = lambda m: 700.0 * (10 ** (m / 2595.0) - 1.0)
+    edges = hz(np.linspace(mel(60.0), mel(7600.0), EMBED_BANDS + 2))
+    bins = np.fft.rfftfreq(EMBED_NFFT, 1.0 / RATE)
+    lo, mid, hi = edges[:-2, None], edges[1:-1, None], edges[2:, None]
+    fbank = np.maximum(0.0, np.minimum((bins - lo) / (mid - lo), (hi - bins) / (hi - mid)))
+    n = np.arange(1, EMBED_CEPS + 1)[:, None]
+    dct = np.cos(np.pi * n * (np.arange(EMBED_BANDS) + 0.5) / EMBED_BANDS)
+    lifter = 1.0 + (EMBED_CEPS / 2.0) * np.sin(np.pi * np.arange(1, EMBED_CEPS + 1) / EMBED_CEPS)
+    return fbank.astype(np.float32), (dct * lifter[:, None]).astype(np.float32)
+
+
+def speaker_embeddings(signals: Sequence[np.ndarray]) -> np.ndarray:
+    """
+    Fixed-size, L2-normalized voice embeddings for mono float32 signals at
+    RATE, comparable by cosine similarity. Clips without speech get zeros.
+
+    Returns:
+        np.ndarray: float32 matrix of shape (len(signals), EMBED_DIM)
+    """
+    out = np.zeros((len(signals), EMBED_DIM), dtype=np.float32)
+    if not signals:
+        return out
+    _, frames, valid = _frame(signals)
+    energy = 20.0 * np.log10(np.sqrt(np.mean(frames * frames, axis=2) + 1e-12))
+    speech = np.zeros_like(valid)
+    for i in range(len(signals)):
+        speech[i, valid[i]] = ~audio_prep.silent_frames(energy[i, valid[i]])
+    clip, frame = np.nonzero(speech)
+    if len(clip) == 0:
+        return out
+
+    fbank, dct = _cepstral_basis()
+    # Every speech frame of the batch in one FFT and two matrix products
+    spec = np.fft.rfft(frames[clip, frame] * np.hamming(WIN).astype(np.float32), n=EMBED_NFFT, axis=1)
+    power = (spec.real ** 2 + spec.imag ** 2).astype(np.float32)
+    ceps = np.log(power @ fbank.T + 1e-8) @ dct.T
+
+    counts = np.bincount(clip, minlength=len(signals)).astype(np.float32)[:, None]
+    mean = np.zeros((len(signals), EMBED_CEPS), dtype=np.float32)
+    sq = np.zeros_like(mean)
+    np.add.at(mean, clip, ceps)
+    np.add.at(sq, clip, ceps * ceps)
+    mean /= np.maximum(counts, 1)
+    std = np.sqrt(np.maximum(sq / np.maximum(counts, 1) - mean * mean, 0.0))
+    out[:] = np.concatenate([mean, std], axis=1)
+    norm = np.linalg.norm(out, axis=1, keepdims=True)
+    return np.where(norm > 0, out / np.maximum(norm, 1e-12), 0.0).astype(np.float32)
+
+
+def embed_batch(paths: Sequence[str]) -> np.ndarray:
+    """speaker_embeddings for WAV files."""
+    return speaker_embeddings([load_signal(p) for p in paths])
+
+
+def as_dicts(matrix: np.ndarray) -> List[Dict[str, float]]:
+    """Feature matrix rows as {name: value} dicts, e.g. for tool output."""
+    return [dict(zip(FEATURE_NAMES, map(float, row))) for row in matrix]
+
+
+def from_dicts(rows: Sequence[Dict[str, float]]) -> np.ndarray:
+    """Inverse of as_dicts: {name: value} dicts back to a float32 feature matrix."""
+    return np.array([[row[name] for name in FEATURE_NAMES] for row in rows], dtype=np.float32).reshape(-1, len(FEATURE_NAMES))